@@ -0,0 +1,137 @@
+import pandas as pd
+from pathlib import Path
+import argparse
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from features.aggregation import (
+    GROUP_KEYS, add_role_gaps, call_level_metrics, prepare, role_level_metrics
+)
+from utils import storage
+
+# The baseline lambda-based aggregate_for_powerbi.py (copied unchanged) vs the
+# shared vectorized engine, with a byte-for-byte check of the CSV output:
+#   python benchmarks/bench_aggregation.py --scale 10
+
+IN_PATH = Path("data/processed/speaker_blocks_with_sentiment.csv")
+# clean_text only for the baseline, which counts blocks with it
+COLUMNS = GROUP_KEYS + [
+    "speaker_role", "clean_text", "block_length", "sentiment_vader", "finbert_sentiment", "finbert_confidence"
+]
+
+def finbert_to_score(label: str) -> int:
+    # Simple numeric mapping for charts + correlations
+    if label == "positive":
+        return 1
+    if label == "negative":
+        return -1
+    return 0
+
+def legacy(df):
+    """The baseline aggregate_for_powerbi.py, verbatim minus the file reads and writes."""
+    # Ensure types
+    df["sentiment_vader"] = pd.to_numeric(df["sentiment_vader"], errors="coerce").fillna(0.0)
+    df["finbert_confidence"] = pd.to_numeric(df["finbert_confidence"], errors="coerce").fillna(0.0)
+    df["finbert_score"] = df["finbert_sentiment"].astype(str).apply(finbert_to_score)
+
+    group_keys = ["symbol", "company_name", "year", "quarter", "date"]
+
+    # Role-level metrics (per call + role)
+    role_level = (
+        df.groupby(group_keys + ["speaker_role"])
+          .agg(
+              blocks=("clean_text", "count"),
+              avg_block_len=("block_length", "mean"),
+              vader_mean=("sentiment_vader", "mean"),
+              vader_median=("sentiment_vader", "median"),
+              finbert_mean=("finbert_score", "mean"),
+              finbert_pos=("finbert_sentiment", lambda x: (x == "positive").mean()),
+              finbert_neg=("finbert_sentiment", lambda x: (x == "negative").mean()),
+              finbert_neu=("finbert_sentiment", lambda x: (x == "neutral").mean()),
+              finbert_avg_conf=("finbert_confidence", "mean"),
+          )
+          .reset_index()
+    )
+
+    # Call-level metrics (all roles combined)
+    call_level = (
+        df.groupby(group_keys)
+          .agg(
+              total_blocks=("clean_text", "count"),
+              avg_block_len=("block_length", "mean"),
+              vader_mean=("sentiment_vader", "mean"),
+              finbert_mean=("finbert_score", "mean"),
+              finbert_pos=("finbert_sentiment", lambda x: (x == "positive").mean()),
+              finbert_neg=("finbert_sentiment", lambda x: (x == "negative").mean()),
+              finbert_neu=("finbert_sentiment", lambda x: (x == "neutral").mean()),
+              finbert_avg_conf=("finbert_confidence", "mean"),
+          )
+          .reset_index()
+    )
+
+    # Management vs Analyst gap (will be weak right now because analysts are under-labeled)
+    pivot = role_level.pivot_table(
+        index=group_keys,
+        columns="speaker_role",
+        values=["vader_mean", "finbert_mean"],
+        aggfunc="first"
+    )
+
+    # Flatten columns
+    pivot.columns = [f"{a}__{b}" for a, b in pivot.columns]
+    pivot = pivot.reset_index()
+
+    # Compute gaps if both exist
+    if "vader_mean__management" in pivot.columns and "vader_mean__analyst" in pivot.columns:
+        pivot["vader_gap_mgmt_minus_analyst"] = pivot["vader_mean__management"] - pivot["vader_mean__analyst"]
+    else:
+        pivot["vader_gap_mgmt_minus_analyst"] = None
+
+    if "finbert_mean__management" in pivot.columns and "finbert_mean__analyst" in pivot.columns:
+        pivot["finbert_gap_mgmt_minus_analyst"] = pivot["finbert_mean__management"] - pivot["finbert_mean__analyst"]
+    else:
+        pivot["finbert_gap_mgmt_minus_analyst"] = None
+
+    call_level = call_level.merge(
+        pivot[group_keys + ["vader_gap_mgmt_minus_analyst", "finbert_gap_mgmt_minus_analyst"]],
+        on=group_keys,
+        how="left"
+    )
+    return role_level, call_level
+
+def vectorized(df):
+    df = prepare(df)
+    role_level, role_sums = role_level_metrics(df, ["speaker_role"])
+    call_level = call_level_metrics(df, role_sums)
+    return role_level, add_role_gaps(call_level, role_level, "speaker_role", aggfunc="first")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Power BI aggregation benchmark.")
+    parser.add_argument("--scale", type=int, default=1, help="Tile the input N times (distinct symbols per copy).")
+    args = parser.parse_args()
+
+    if not storage.exists(IN_PATH):
+        raise FileNotFoundError(f"Missing {IN_PATH}. Run merge first.")
+
+    base = storage.read_table(IN_PATH, columns=COLUMNS)
+    copies = []
+    for i in range(args.scale):
+        copy = base.copy()
+        copy["symbol"] = copy["symbol"].astype(str) + ("" if i == 0 else f"_{i}")
+        copies.append(copy)
+    df = pd.concat(copies, ignore_index=True)
+    print(f"Rows: {len(df):,}")
+
+    outputs = {}
+    for name, fn in [("legacy", legacy), ("vectorized", vectorized)]:
+        t0 = time.perf_counter()
+        role_level, call_level = fn(df.copy())
+        elapsed = time.perf_counter() - t0
+        outputs[name] = (role_level.to_csv(index=False), call_level.to_csv(index=False))
+        print(f"{name:>10}: {elapsed:.3f}s ({len(df) / elapsed:,.0f} rows/sec)")
+
+    identical = outputs["legacy"] == outputs["vectorized"]
+    print("Byte-identical CSV output:", "✅ yes" if identical else "❌ NO")
+    if not identical:
+        sys.exit(1)
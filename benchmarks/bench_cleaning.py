@@ -0,0 +1,58 @@
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from etl.cleaning import PROFILES, regex_clean_series, raw_profile, light_profile
+from etl.preprocess_speaker_blocks import RAW_PATH, extract_blocks, lemmatize, load_nlp
+
+# Blocks/sec of each cleaning profile on the first N transcripts (nothing is
+# written; regex cleaning is included in every profile's time):
+#   python benchmarks/bench_cleaning.py --calls 200
+
+def load_sample(n_calls):
+    texts = []
+    with open(RAW_PATH, "rb") as fh:
+        for i, line in enumerate(fh):
+            if i >= n_calls:
+                break
+            if line.strip():
+                r = json.loads(line)
+                texts.extend(text for _, text in extract_blocks(r.get("structured_content")))
+    return pd.Series(texts, dtype=object)
+
+def run_profile(profile, texts, batch_size):
+    regexed = regex_clean_series(texts)
+    if profile == "raw":
+        return raw_profile(regexed)
+    if profile == "light":
+        return light_profile(regexed)
+    docs = load_nlp().pipe(regexed.tolist(), batch_size=batch_size)
+    return pd.Series([lemmatize(doc) for doc in docs], dtype=object)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cleaning profile throughput benchmark.")
+    parser.add_argument("--calls", type=int, default=200, help="Transcripts to sample.")
+    parser.add_argument("--batch-size", type=int, default=256, help="nlp.pipe batch size (full).")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    args = parser.parse_args()
+
+    if not RAW_PATH.exists():
+        raise FileNotFoundError(f"Missing {RAW_PATH}. Run etl/load_transcripts.py first.")
+
+    texts = load_sample(args.calls)
+    print(f"▶️ {len(texts)} blocks from the first {args.calls} transcripts")
+    load_nlp()      # model load isn't part of the per-block cost
+
+    print(f"{'profile':<8} {'seconds':>8} {'blocks/sec':>11} {'mean tokens':>12}")
+    for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        t0 = time.perf_counter()
+        cleaned = run_profile(profile, texts, args.batch_size)
+        seconds = time.perf_counter() - t0
+        rate = len(texts) / seconds if seconds > 0 else float("inf")
+        tokens = cleaned.str.split().str.len().mean() if len(cleaned) else 0.0
+        print(f"{profile:<8} {seconds:8.2f} {rate:11,.0f} {tokens:12.1f}")
@@ -0,0 +1,72 @@
+import pandas as pd
+from pathlib import Path
+import argparse
+import sys
+import time
+import torch
+from transformers import AutoTokenizer
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from models.sentiment_finbert import IN_PATH, MAX_LEN, MODEL_NAME, finbert_score_texts, load_model
+
+# Throughput of the ONNX Runtime backends against torch eager on CPU, plus an
+# agreement check (label match rate, confidence delta) against torch:
+#   python benchmarks/bench_finbert_backends.py --sample 2000
+# Exits non-zero if a backend's label agreement is below --min-agreement.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FinBERT backend benchmark + agreement check.")
+    parser.add_argument("--input", type=Path, default=IN_PATH)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"])
+    parser.add_argument("--min-agreement", type=float, default=0.97)
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        raise FileNotFoundError(f"Missing {args.input}. Run preprocessing first.")
+
+    df = pd.read_csv(args.input, usecols=["clean_text"])
+    df = df.sample(n=min(args.sample, len(df)), random_state=args.seed)
+    texts = [t for t in df["clean_text"].fillna("").astype(str) if t.strip()]
+
+    device = torch.device("cpu")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    n_tokens = sum(len(ids) for ids in tokenizer(texts, truncation=True, max_length=MAX_LEN)["input_ids"])
+    print(f"Sample: {len(texts)} blocks, {n_tokens} tokens, device={device}, threads={torch.get_num_threads()}")
+
+    results = {}
+    for backend in ["torch"] + args.backends:
+        model = load_model(device, backend)
+        # Warm-up so the first measured run doesn't pay for lazy init
+        finbert_score_texts(texts[:32], tokenizer, model, device)
+
+        t0 = time.perf_counter()
+        labels, confs = finbert_score_texts(texts, tokenizer, model, device)
+        elapsed = time.perf_counter() - t0
+
+        results[backend] = (labels, confs, elapsed)
+        print(
+            f"{backend:>10}: {n_tokens / elapsed:,.0f} tokens/sec | "
+            f"{len(texts) / elapsed:,.1f} blocks/sec | {elapsed:.1f}s"
+        )
+
+    base_labels, base_confs, base_elapsed = results["torch"]
+    failed = []
+    print("\nAgreement vs torch:")
+    for backend in args.backends:
+        labels, confs, elapsed = results[backend]
+        match = sum(a == b for a, b in zip(base_labels, labels)) / len(texts)
+        deltas = [abs(a - b) for a, b in zip(base_confs, confs)]
+        print(
+            f"{backend:>10}: labels match {match:.2%} | "
+            f"confidence delta mean {sum(deltas) / len(deltas):.4f}, max {max(deltas):.4f} | "
+            f"speed-up x{base_elapsed / elapsed:.2f}"
+        )
+        if match < args.min_agreement:
+            failed.append(backend)
+
+    if failed:
+        print(f"❌ Below {args.min_agreement:.0%} label agreement: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"✅ All backends at or above {args.min_agreement:.0%} label agreement")
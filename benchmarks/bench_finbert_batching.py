@@ -0,0 +1,61 @@
+import pandas as pd
+from pathlib import Path
+import argparse
+import sys
+import time
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from models.batching import padding_stats
+from models.sentiment_finbert import (
+    IN_PATH, MODEL_NAME, MAX_LEN, finbert_score_texts, plan_batches
+)
+
+# Compares the old fixed-size batching against the token-budget scheduler on
+# a random sample of speaker_blocks_cleaned.csv:
+#   python benchmarks/bench_finbert_batching.py --sample 2000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FinBERT batching benchmark.")
+    parser.add_argument("--input", type=Path, default=IN_PATH)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        raise FileNotFoundError(f"Missing {args.input}. Run preprocessing first.")
+
+    df = pd.read_csv(args.input, usecols=["clean_text"])
+    df = df.sample(n=min(args.sample, len(df)), random_state=args.seed)
+    texts = [t for t in df["clean_text"].fillna("").astype(str) if t.strip()]
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).to(device)
+    model.eval()
+
+    lengths = [len(ids) for ids in tokenizer(texts, truncation=True, max_length=MAX_LEN)["input_ids"]]
+    print(f"Sample: {len(texts)} blocks, {sum(lengths)} tokens, device={device}")
+
+    # Warm-up so the first measured run doesn't pay for lazy init
+    finbert_score_texts(texts[:32], tokenizer, model, device, scheduler="fixed")
+
+    results = {}
+    for scheduler in ["fixed", "token_budget"]:
+        stats = padding_stats(plan_batches(lengths, scheduler), lengths)
+
+        t0 = time.perf_counter()
+        labels, _ = finbert_score_texts(texts, tokenizer, model, device, scheduler=scheduler)
+        elapsed = time.perf_counter() - t0
+
+        results[scheduler] = labels
+        print(
+            f"{scheduler:>12}: {stats['batches']:5d} batches | "
+            f"padding ratio {stats['padding_ratio']:.1%} | "
+            f"{stats['real_tokens'] / elapsed:,.0f} tokens/sec | "
+            f"{len(texts) / elapsed:,.1f} blocks/sec | {elapsed:.1f}s"
+        )
+
+    agree = sum(a == b for a, b in zip(results["fixed"], results["token_budget"]))
+    print(f"Label agreement fixed vs token_budget: {agree}/{len(texts)}")
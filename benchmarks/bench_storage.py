@@ -0,0 +1,69 @@
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils import storage
+
+# Disk footprint and load time of the CSV intermediates vs the Parquet
+# storage mode (written to a temp dir, the CSVs are left untouched):
+#   python benchmarks/bench_storage.py
+
+PROCESSED = Path("data/processed")
+INTERMEDIATES = [
+    "speaker_blocks_cleaned.csv",
+    "speaker_blocks_with_vader.csv",
+    "speaker_blocks_with_finbert.csv",
+    "speaker_blocks_with_sentiment.csv",
+]
+# What the aggregation stages actually read
+PROJECTION = ["symbol", "year", "quarter", "speaker_role", "block_length"]
+
+def disk_size(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV vs Parquet intermediate benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N load timings.")
+    args = parser.parse_args()
+
+    print(f"{'file':<36} {'csv MB':>8} {'pq MB':>8} {'csv load':>9} {'pq load':>9} {'pq cols':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in INTERMEDIATES:
+            csv_path = PROCESSED / name
+            if not csv_path.exists():
+                print(f"{name:<36} (missing, skipped)")
+                continue
+
+            csv_time, df = timed(lambda: storage.read_table(csv_path, fmt="csv"), args.repeat)
+
+            pq_path = Path(tmp) / name
+            storage.write_table(df, pq_path, fmt="parquet")
+
+            pq_time, pq_df = timed(lambda: storage.read_table(pq_path, fmt="parquet"), args.repeat)
+            cols = [c for c in PROJECTION if c in df.columns]
+            proj_time, _ = timed(lambda: storage.read_table(pq_path, columns=cols, fmt="parquet"), args.repeat)
+
+            if len(pq_df) != len(df):
+                raise SystemExit(f"Row count mismatch for {name}: {len(df)} vs {len(pq_df)}")
+
+            print(
+                f"{name:<36} "
+                f"{disk_size(csv_path) / 1e6:8.1f} "
+                f"{disk_size(storage.dataset_path(pq_path, 'parquet')) / 1e6:8.1f} "
+                f"{csv_time:8.2f}s {pq_time:8.2f}s {proj_time:8.2f}s"
+            )
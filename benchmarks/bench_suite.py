@@ -0,0 +1,343 @@
+from pathlib import Path
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmarks import synthetic
+from etl.cleaning import light_profile, regex_clean_series
+from etl.preprocess_speaker_blocks import MIN_BLOCK_LEN, extract_blocks, infer_role, make_block_id
+from features.aggregation import add_role_gaps, call_level_metrics, prepare, role_level_metrics
+from utils import storage
+from utils.checkpoint import Checkpoint
+from utils.instrument import REPORT_DIR, TimedModel, host_info, latency_summary, write_report
+
+# Offline, reproducible pipeline benchmarks on synthetic calls
+# (benchmarks/synthetic.py), no Hugging Face download needed:
+#   python benchmarks/bench_suite.py --calls 1000
+#   python benchmarks/bench_suite.py --calls 100000 --repeat 1 --compare data/reports/benchmarks/latest.json
+#
+# Results (best of --repeat, plus every run) go to
+# data/reports/benchmarks/<timestamp>.json and latest.json. clean_text,
+# VADER (NLTK and batch engines) and FinBERT run on the first --sample
+# blocks; extract_blocks, the merge and the aggregations (in memory, and
+# --chunked with sketch medians) run on every block. A benchmark whose dependency is missing (spaCy model, VADER
+# lexicon, torch) is recorded as skipped instead of failing the suite.
+
+BENCHMARKS = [
+    "extract_blocks", "clean_text", "vader", "vader_batch", "finbert_batching", "merge", "aggregate_v1", "aggregate_v2",
+    "aggregate_chunked",
+]
+SAMPLE_BLOCKS = 2000
+BUILD_CALLS = 1000        # synthetic calls per chunk when building the scored tables
+TINY_BERT = dict(hidden_size=64, num_hidden_layers=2, num_attention_heads=2, intermediate_size=128)
+
+def best_of(repeat, fn):
+    """Run fn() `repeat` times; returns (best seconds, all seconds, last result)."""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    return min(runs), runs, result
+
+def result(items, unit, seconds, runs, **extra):
+    return {
+        "items": items,
+        "unit": unit,
+        "seconds": seconds,
+        "per_sec": items / seconds if seconds > 0 else None,
+        "runs": runs,
+        **extra,
+    }
+
+def sample_blocks(path, n):
+    texts = []
+    with open(path, "rb") as fh:
+        for line in fh:
+            for _, text in extract_blocks(json.loads(line).get("structured_content")):
+                texts.append(text)
+                if len(texts) == n:
+                    return texts
+    return texts
+
+# ---------------- benchmarks ----------------
+def bench_extract_blocks(ctx):
+    def run():
+        blocks = 0
+        elapsed = 0.0
+        with open(ctx["jsonl"], "rb") as fh:
+            for line in fh:
+                structured = json.loads(line).get("structured_content")
+                t0 = time.perf_counter()
+                blocks += len(extract_blocks(structured))
+                elapsed += time.perf_counter() - t0
+        return elapsed, blocks
+
+    # Only extract_blocks() itself is timed, not the JSON parsing around it
+    timings = [run() for _ in range(ctx["repeat"])]
+    runs = [t for t, _ in timings]
+    return result(timings[0][1], "blocks", min(runs), runs)
+
+def bench_clean_text(ctx):
+    from etl.preprocess_speaker_blocks import clean_text, load_nlp
+
+    load_nlp()      # model load is not part of the per-block cost
+    texts = ctx["sample"]
+    seconds, runs, _ = best_of(ctx["repeat"], lambda: [clean_text(t) for t in texts])
+    return result(len(texts), "blocks", seconds, runs)
+
+def bench_vader(ctx):
+    from models.sentiment_vader import vader_score_texts
+
+    texts = ctx["sample_clean"]
+    seconds, runs, _ = best_of(ctx["repeat"], lambda: vader_score_texts(texts, engine="nltk"))
+    return result(len(texts), "blocks", seconds, runs)
+
+def bench_vader_batch(ctx):
+    from models.sentiment_vader import vader_score_texts
+
+    texts = ctx["sample_clean"]
+    seconds, runs, scores = best_of(ctx["repeat"], lambda: vader_score_texts(texts, engine="batch"))
+    reference = vader_score_texts(texts, engine="nltk")
+    max_diff = float(np.max(np.abs(np.subtract(scores, reference)))) if texts else 0.0
+    return result(len(texts), "blocks", seconds, runs, max_abs_diff_vs_nltk=max_diff)
+
+def tiny_finbert(tmp, seed):
+    """Random-weight 2-layer BERT + WordPiece vocab of the synthetic words (no download)."""
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + synthetic.vocabulary()
+    vocab_path = Path(tmp) / "vocab.txt"
+    vocab_path.write_text("\n".join(vocab) + "\n")
+    tokenizer = BertTokenizerFast(vocab_file=str(vocab_path), do_lower_case=True)
+
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(vocab), num_labels=3, **TINY_BERT)
+    model = BertForSequenceClassification(config).eval()
+    return tokenizer, model
+
+def bench_finbert_batching(ctx):
+    import torch
+    from models import sentiment_finbert as fb
+
+    tokenizer, model = tiny_finbert(ctx["tmp"], ctx["seed"])
+    device = torch.device("cpu")
+    texts = ctx["sample_clean"]
+
+    schedulers = {}
+    for scheduler in ["fixed", "token_budget"]:
+        latencies = []
+        timed = TimedModel(model, latencies.append)
+
+        def run():
+            latencies.clear()       # keep the last run's batch latencies
+            return fb.finbert_score_texts(texts, tokenizer, timed, device, scheduler=scheduler)
+
+        seconds, runs, _ = best_of(ctx["repeat"], run)
+        schedulers[scheduler] = result(len(texts), "blocks", seconds, runs, batches=latency_summary(latencies))
+
+    best = min(schedulers.values(), key=lambda r: r["seconds"])
+    return result(len(texts), "blocks", best["seconds"], best["runs"], schedulers=schedulers, model=TINY_BERT)
+
+def build_scored(ctx):
+    """Write VADER / FinBERT scorer outputs for every synthetic block (random scores)."""
+    rng = np.random.default_rng(ctx["seed"])
+    vader_path = Path(ctx["tmp"]) / "speaker_blocks_with_vader.csv"
+    finbert_path = Path(ctx["tmp"]) / "speaker_blocks_with_finbert.csv"
+
+    def flush(rows, texts, part):
+        df = pd.DataFrame(rows)
+        df["clean_text"] = light_profile(regex_clean_series(pd.Series(texts, dtype=object))).values
+        df["block_length"] = df["clean_text"].str.split().str.len()
+        df = df[df["block_length"] >= MIN_BLOCK_LEN]
+        df["speaker_role"] = df["speaker"].map(infer_role)
+        vader = df.assign(sentiment_vader=rng.uniform(-1, 1, len(df)).round(4))
+        finbert = df.assign(
+            finbert_sentiment=rng.choice(["positive", "neutral", "negative"], len(df), p=[0.45, 0.4, 0.15]),
+            finbert_confidence=rng.uniform(0.34, 1.0, len(df)),
+        )
+        storage.write_chunk(vader, vader_path, part=part, header=part == 0)
+        storage.write_chunk(finbert, finbert_path, part=part, header=part == 0)
+        return len(df)
+
+    n_rows = 0
+    rows, texts, part = [], [], 0
+    with open(ctx["jsonl"], "rb") as fh:
+        for call_idx, line in enumerate(fh):
+            r = json.loads(line)
+            meta = {k: r.get(k) for k in ["symbol", "company_name", "year", "quarter", "date"]}
+            for ordinal, (speaker, text) in enumerate(extract_blocks(r.get("structured_content"))):
+                rows.append({"block_id": make_block_id(call_idx, ordinal), **meta, "speaker": speaker})
+                texts.append(text)
+            if (call_idx + 1) % BUILD_CALLS == 0:
+                n_rows += flush(rows, texts, part)
+                rows, texts, part = [], [], call_idx + 1
+    if rows:
+        n_rows += flush(rows, texts, part)
+    return vader_path, finbert_path, n_rows
+
+def bench_merge(ctx):
+    from features.merge_sentiments import CHUNK_ROWS, FINBERT_COLS, sorted_merge
+
+    vader_path, finbert_path, _ = ctx["scored"]
+    out_path = Path(ctx["tmp"]) / "speaker_blocks_with_sentiment.csv"
+
+    def run():
+        storage.remove(out_path)
+        stats = {"vader_unmatched": 0, "finbert_unmatched": 0}
+        merged_rows = 0
+        finbert_chunks = storage.iter_chunks(
+            finbert_path, CHUNK_ROWS, Checkpoint(),
+            columns=list(dict.fromkeys(FINBERT_COLS + storage.order_columns()))
+        )
+        vader_chunks = storage.iter_chunks(vader_path, CHUNK_ROWS, Checkpoint())
+        for merged in sorted_merge(vader_chunks, finbert_chunks, stats):
+            storage.write_chunk(merged, out_path, part=merged_rows, header=merged_rows == 0)
+            merged_rows += len(merged)
+        return merged_rows
+
+    seconds, runs, merged_rows = best_of(ctx["repeat"], run)
+    ctx["merged"] = out_path
+    return result(merged_rows, "rows", seconds, runs)
+
+def bench_aggregate_v1(ctx):
+    from features.aggregate_for_powerbi import COLUMNS
+
+    df = storage.read_table(ctx["merged"], columns=COLUMNS)
+
+    def run():
+        d = prepare(df.copy())
+        role_level, role_sums = role_level_metrics(d, ["speaker_role"])
+        call_level = call_level_metrics(d, role_sums)
+        return add_role_gaps(call_level, role_level, "speaker_role", aggfunc="first")
+
+    seconds, runs, call_level = best_of(ctx["repeat"], run)
+    return result(len(df), "rows", seconds, runs, calls=len(call_level))
+
+def bench_aggregate_v2(ctx):
+    from features.relabeled_roles_aggregation import COLUMNS, relabel_roles_and_sections
+
+    df = storage.read_table(ctx["merged"], columns=COLUMNS)
+
+    def run():
+        d = df.copy()
+        d["clean_text"] = d["clean_text"].fillna("").astype(str)
+        d = prepare(d)
+        d["speaker_role_v2"], d["section"] = relabel_roles_and_sections(d["speaker"].astype(str), d["clean_text"])
+        role_level, role_sums = role_level_metrics(d, ["speaker_role_v2", "section"])
+        call_level = call_level_metrics(d, role_sums)
+        return add_role_gaps(call_level, role_level, "speaker_role_v2", aggfunc="mean", suffix="_v2")
+
+    seconds, runs, call_level = best_of(ctx["repeat"], run)
+    return result(len(df), "rows", seconds, runs, calls=len(call_level))
+
+def bench_aggregate_chunked(ctx):
+    """v1 aggregation out of core; reports the sketch median error against the exact groupby median."""
+    from features import chunked_aggregation
+    from features.aggregate_for_powerbi import COLUMNS
+
+    options = argparse.Namespace(
+        chunk_rows=chunked_aggregation.CHUNK_ROWS, median="sketch", compression=chunked_aggregation.COMPRESSION,
+        memory_mb=chunked_aggregation.MEMORY_MB, percentiles=[]
+    )
+    seconds, runs, (role_level, _, rows) = best_of(
+        ctx["repeat"], lambda: chunked_aggregation.run(ctx["merged"], COLUMNS, ["speaker_role"], options)
+    )
+    exact, _ = role_level_metrics(prepare(storage.read_table(ctx["merged"], columns=COLUMNS)), ["speaker_role"])
+    error = float((role_level["vader_median"] - exact["vader_median"]).abs().max()) if len(exact) else 0.0
+    return result(rows, "rows", seconds, runs, groups=len(role_level), max_abs_median_error=error)
+
+def versions():
+    out = {"pandas": pd.__version__, "numpy": np.__version__}
+    for name in ["spacy", "nltk", "torch", "transformers", "pyarrow"]:
+        try:
+            out[name] = getattr(__import__(name), "__version__", None)
+        except ImportError:
+            out[name] = None
+    return out
+
+def compare(old, new):
+    lines = [f"   {'benchmark':<18} {'before/s':>12} {'after/s':>12} {'change':>8}"]
+    for name, r in new["results"].items():
+        before = old.get("results", {}).get(name, {}).get("per_sec")
+        after = r.get("per_sec")
+        if before and after:
+            lines.append(f"   {name:<18} {before:12,.0f} {after:12,.0f} {after / before - 1:+8.1%}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark suite on synthetic earnings calls.")
+    parser.add_argument("--calls", type=int, default=1000, help="Synthetic calls (100 - 100k).")
+    parser.add_argument("--seed", type=int, default=synthetic.SEED)
+    parser.add_argument("--sample", type=int, default=SAMPLE_BLOCKS, help="Blocks for clean_text / VADER / FinBERT.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timings.")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Comma-separated subset to run.")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier results JSON to compare against.")
+    args = parser.parse_args()
+
+    only = [b.strip() for b in args.only.split(",") if b.strip()]
+    unknown = sorted(set(only) - set(BENCHMARKS))
+    if unknown:
+        parser.error(f"Unknown benchmarks {unknown}; choose from {BENCHMARKS}")
+    old = json.loads(args.compare.read_text()) if args.compare else None
+
+    started = datetime.now()
+    t0 = time.perf_counter()
+    jsonl = synthetic.cached_jsonl(args.calls, args.seed)
+    print(f"▶️ {args.calls:,} synthetic calls ({time.perf_counter() - t0:.1f}s) -> {jsonl}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = sample_blocks(jsonl, args.sample)
+        ctx = {
+            "jsonl": jsonl,
+            "tmp": tmp,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "sample": sample,
+            "sample_clean": light_profile(regex_clean_series(pd.Series(sample, dtype=object))).tolist(),
+        }
+        if {"merge", "aggregate_v1", "aggregate_v2", "aggregate_chunked"} & set(only):
+            t0 = time.perf_counter()
+            ctx["scored"] = build_scored(ctx)
+            print(f"▶️ {ctx['scored'][2]:,} scored blocks for merge/aggregation ({time.perf_counter() - t0:.1f}s)")
+
+        for name in BENCHMARKS:
+            if name not in only:
+                continue
+            if name.startswith("aggregate") and "merged" not in ctx:
+                bench_merge(ctx)        # aggregations read the merged table
+            try:
+                r = globals()[f"bench_{name}"](ctx)
+            except (ImportError, LookupError, OSError) as e:
+                # Missing optional piece: spaCy model, VADER lexicon, torch/transformers
+                results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+                print(f"⏭️ {name:<18} skipped ({type(e).__name__})")
+                continue
+            results[name] = r
+            print(f"✅ {name:<18} {r['items']:>10,} {r['unit']:<7} {r['seconds']:8.3f}s  {r['per_sec']:12,.0f} {r['unit']}/sec")
+
+    report = {
+        "suite": "bench_suite",
+        "started": started.isoformat(timespec="seconds"),
+        "params": {"calls": args.calls, "seed": args.seed, "sample": args.sample, "repeat": args.repeat},
+        "storage": storage.STORAGE_FORMAT,
+        "host": host_info(),
+        "versions": versions(),
+        "results": results,
+    }
+    path = write_report(REPORT_DIR / "benchmarks", started, json.dumps(report, indent=2))
+
+    if old is not None:
+        print(f"\n📊 vs {args.compare}:")
+        print(compare(old, report))
+    print(f"\n🎉 Results -> {path}")
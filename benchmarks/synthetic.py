@@ -0,0 +1,207 @@
+from pathlib import Path
+import argparse
+import json
+
+import numpy as np
+
+# Offline stand-in for the Hugging Face transcripts, for benchmarks and for
+# running the pipeline without a download:
+#   python benchmarks/synthetic.py --calls 1000 --out data/raw/transcripts_raw.jsonl
+#
+# Same seed + same --calls -> byte-identical file. Every structured_content
+# shape extract_blocks() accepts is used (segments / blocks / content /
+# dialogue dicts and bare lists, "speaker"/"name" and "text"/"content" keys),
+# with a few blank and non-dict items mixed in. A call is an operator intro,
+# a safe-harbor statement, prepared remarks, analyst Q&A and a close; block
+# lengths are log-normal per kind of block, so there is a long tail of blocks
+# well over FinBERT's MAX_LEN. Analyst questions open with one of the phrases
+# the v2 section split looks for (QA_CUES), so the Q&A side of the pipeline
+# gets exercised too; the operator hand-offs are below MIN_BLOCK_LEN.
+
+SEED = 7
+VERSION = 2                # bump when the output changes, so cached files are regenerated
+SHAPES = ["segments", "blocks", "content", "dialogue", "list"]
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David",
+    "Elizabeth", "William", "Susan", "Richard", "Jessica", "Thomas", "Sarah", "Wei", "Priya",
+    "Carlos", "Aisha", "Kenji", "Olga", "Mateo", "Fatima", "Ravi", "Ingrid",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+    "Martinez", "Chen", "Patel", "Kim", "Nguyen", "Mueller", "Rossi", "Tanaka", "Cohen",
+    "Okafor", "Silva", "Novak", "Larsen",
+]
+EXEC_TITLES = [
+    "Chief Executive Officer", "Chief Financial Officer", "President and CEO", "EVP and CFO",
+    "Chief Operating Officer", "Vice President, Investor Relations", "Chairman",
+]
+BANKS = [
+    "Goldman Sachs", "Morgan Stanley", "JPMorgan", "Barclays", "Citi", "UBS", "Bank of America",
+    "Wells Fargo Securities", "Evercore ISI", "Bernstein Research", "Jefferies", "RBC Capital Markets",
+]
+NAME_PARTS = [
+    "Apex", "Summit", "Harbor", "Northwind", "Blue Ridge", "Pioneer", "Cascade", "Meridian",
+    "Granite", "Silverline", "Redwood", "Atlas", "Beacon", "Crescent", "Keystone", "Frontier",
+]
+NAME_SUFFIXES = ["Inc.", "Corp.", "Holdings", "Group", "Technologies", "Industries", "Brands, Inc."]
+
+FINANCE_WORDS = (
+    "revenue growth margin quarter guidance demand pipeline customers strong record headwinds "
+    "inflation pricing volume backlog bookings outlook operating expenses cash flow capital "
+    "allocation buyback dividend segment organic acquisition synergies leverage debt liquidity "
+    "supply chain inventory costs productivity investment innovation platform subscription "
+    "retention churn consumer enterprise cloud services products international currency "
+    "tailwinds softness momentum execution improvement decline pressure uncertainty recovery "
+    "profitability earnings share basis points sequential year-over-year expansion contraction"
+).split()
+COMMON_WORDS = (
+    "the and to of we in that our a is for this on as with are be it have you from at "
+    "was were will would can could think see about more which very also so but continue "
+    "expect believe really going well just there some what over into than remain look"
+).split()
+# First / follow-up openers of an analyst turn. Each contains a QA_CUES phrase
+# and the word "question", which survives stopword removal in every profile.
+QUESTION_OPENERS = [
+    "Thank you for taking my question.", "Thanks for taking my questions.", "My first question is on",
+    "I have a question on", "Two questions, if I may.", "Just one question, can you talk about",
+]
+FOLLOW_UP_OPENERS = [
+    "My next question is on", "A follow-up question, could you elaborate on",
+    "Last question, can you discuss", "One more question on", "Question on what is the outlook for",
+]
+SAFE_HARBOR = (
+    "Before we begin, please note that today's discussion contains forward-looking statements "
+    "within the meaning of the safe harbor provisions. Actual results may differ materially."
+)
+
+# (median words, log-normal sigma) per kind of block
+LENGTHS = {
+    "operator": (28, 0.4),
+    "prepared": (420, 0.6),
+    "question": (70, 0.6),
+    "answer": (160, 0.8),
+}
+
+def vocabulary():
+    """Every word the generator can emit (the tiny FinBERT stand-in's vocab is built from it)."""
+    openers = " ".join(QUESTION_OPENERS + FOLLOW_UP_OPENERS).lower().replace(".", "").replace(",", "")
+    return sorted(set(FINANCE_WORDS + COMMON_WORDS + openers.split()))
+
+def person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+def companies(n, rng):
+    out = []
+    for i in range(n):
+        symbol = "".join(rng.choice(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"), size=int(rng.integers(2, 5))))
+        out.append((f"{symbol}{i}", f"{rng.choice(NAME_PARTS)} {rng.choice(NAME_SUFFIXES)}"))
+    return out
+
+class TextMaker:
+    """Zipf-weighted word salad with numbers and punctuation, like transcript prose."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.words = np.array(FINANCE_WORDS + COMMON_WORDS)
+        ranks = np.arange(1, len(self.words) + 1)
+        weights = 1 / ranks ** 0.8
+        self.p = weights / weights.sum()
+
+    def length(self, kind):
+        median, sigma = LENGTHS[kind]
+        return int(np.clip(self.rng.lognormal(np.log(median), sigma), 3, 4000))
+
+    def text(self, kind):
+        n = self.length(kind)
+        words = self.rng.choice(self.words, size=n, p=self.p).tolist()
+        # Figures and sentence breaks every so often
+        for i in range(7, n, 11):
+            words[i] = f"{words[i]}." if i % 3 else f"${self.rng.integers(1, 999)}.{self.rng.integers(0, 9)} million"
+        words[0] = words[0].capitalize()
+        return " ".join(words) + "."
+
+def make_call(rng, maker, symbol, company_name, year, quarter):
+    executives = [f"{person(rng)} -- {title}" for title in rng.choice(EXEC_TITLES, size=int(rng.integers(2, 4)), replace=False)]
+    analysts = [
+        f"{person(rng)} -- Analyst, {bank}" if rng.random() < 0.7 else f"{person(rng)} - {bank}"
+        for bank in rng.choice(BANKS, size=int(rng.integers(3, 9)), replace=False)
+    ]
+    operator = "Operator" if rng.random() < 0.9 else "Conference Call Moderator"
+
+    blocks = [
+        (operator, f"Good day and welcome to the {company_name} Q{quarter} {year} earnings call. " + maker.text("operator")),
+        (executives[-1], SAFE_HARBOR + " " + maker.text("operator")),
+    ]
+    for executive in executives[:2]:
+        blocks.append((executive, maker.text("prepared")))
+    for analyst in analysts:
+        bank = analyst.split(", ")[-1].split(" - ")[-1]
+        blocks.append((operator, f"Our next question comes from {analyst.split(' -')[0]} with {bank}. Please go ahead."))
+        for turn in range(int(rng.integers(1, 3))):
+            opener = rng.choice(FOLLOW_UP_OPENERS if turn else QUESTION_OPENERS)
+            text = maker.text("question")
+            blocks.append((analyst, f"{opener} {text[0].lower()}{text[1:]}?"))
+            blocks.append((executives[int(rng.integers(0, len(executives)))], maker.text("answer")))
+    blocks.append((operator, "This concludes today's conference call. You may now disconnect."))
+    return blocks
+
+def structure(blocks, rng):
+    """Wrap blocks in one of the structured_content shapes extract_blocks() accepts."""
+    speaker_key = "speaker" if rng.random() < 0.8 else "name"
+    text_key = "text" if rng.random() < 0.8 else "content"
+    items = [{speaker_key: s, text_key: t} for s, t in blocks]
+    # A few items extract_blocks() has to skip
+    if rng.random() < 0.2:
+        items.insert(int(rng.integers(0, len(items))), {speaker_key: "Operator", text_key: "  "})
+    if rng.random() < 0.05:
+        items.insert(int(rng.integers(0, len(items))), "[technical difficulty]")
+
+    shape = SHAPES[int(rng.integers(0, len(SHAPES)))]
+    return items if shape == "list" else {shape: items}
+
+def iter_transcripts(n_calls, seed=SEED):
+    """Transcript records in the dataset's layout (structured_content as native JSON)."""
+    rng = np.random.default_rng(seed)
+    maker = TextMaker(rng)
+    firms = companies(max(1, n_calls // 20), rng)
+    for i in range(n_calls):
+        symbol, company_name = firms[i % len(firms)]
+        year = 2015 + (i // len(firms)) // 4 % 10
+        quarter = (i // len(firms)) % 4 + 1
+        blocks = make_call(rng, maker, symbol, company_name, year, quarter)
+        yield {
+            "symbol": symbol,
+            "company_name": company_name,
+            "year": year,
+            "quarter": quarter,
+            "date": f"{year}-{quarter * 3 - 1:02d}-{int(rng.integers(1, 29)):02d}",
+            "structured_content": structure(blocks, rng),
+        }
+
+def write_jsonl(path, n_calls, seed=SEED):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        for record in iter_transcripts(n_calls, seed):
+            fh.write(json.dumps(record, ensure_ascii=False))
+            fh.write("\n")
+    return path
+
+def cached_jsonl(n_calls, seed=SEED, cache_dir=Path("data/synthetic")):
+    """Generate once per (calls, seed) and reuse the file afterwards."""
+    path = Path(cache_dir) / f"transcripts_{n_calls}_seed{seed}_v{VERSION}.jsonl"
+    if not path.exists():
+        tmp = write_jsonl(path.with_name(path.name + ".tmp"), n_calls, seed)
+        tmp.replace(path)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic earnings-call transcripts as JSONL.")
+    parser.add_argument("--calls", type=int, default=1000, help="Number of calls (100 - 100k).")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", type=Path, default=Path("data/synthetic/transcripts.jsonl"))
+    args = parser.parse_args()
+
+    path = write_jsonl(args.out, args.calls, args.seed)
+    print(f"✅ {args.calls:,} synthetic calls (seed {args.seed}) -> {path.resolve()}")
@@ -0,0 +1,95 @@
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmarks import synthetic
+from benchmarks.bench_suite import sample_blocks
+from etl.cleaning import regex_clean_series
+from models.sentiment_vader import vader_score_texts
+from utils import storage
+from utils.checkpoint import Checkpoint
+
+# Batch VADER (models/vader_batch.py) against NLTK's polarity_scores, text by
+# text, on hand-written edge cases, synthetic raw blocks (caps, punctuation),
+# the same blocks regex-cleaned, and a sample of the real cleaned file if it
+# exists. Exits 1 if any compound differs by more than --tolerance:
+#   python benchmarks/vader_parity.py --rows 20000
+
+TOLERANCE = 1e-4        # NLTK rounds compound to 4 places
+
+EDGE_CASES = [
+    "The quarter was good.",
+    "The quarter was not good.",
+    "The quarter was not very good.",
+    "Margins were never so good, never this strong.",
+    "It was kind of a good quarter, sort of strong.",
+    "Growth was at least good; the very least good; least good.",
+    "Demand was strong but margins were terrible.",
+    "Demand was STRONG and pricing was GREAT, really GREAT!!!",
+    "VERY GOOD. EXTREMELY BAD.",
+    "Why was guidance cut?? Was it bad???",
+    "That product is the bomb, the shit, bad ass. Yeah right.",
+    "The new line cut the mustard; the recall was the kiss of death.",
+    "We live hand to mouth, don't we? It isn't great, wasn't awful.",
+    "(good) 'great' \"fine\" -bad- good!! bad?!? :) :( a I",
+    "Hardly a record, barely profitable, slightly better, kinda ok.",
+    "",
+    "   ",
+]
+
+def cleaned_sample(path, rows):
+    texts = []
+    for chunk, _ in storage.iter_chunks(path, min(rows, 50_000), Checkpoint(), columns=["clean_text"]):
+        texts.extend(chunk["clean_text"].fillna("").astype(str).tolist())
+        if len(texts) >= rows:
+            break
+    return texts[:rows]
+
+def compare(name, texts, tolerance):
+    t0 = time.perf_counter()
+    reference = vader_score_texts(texts, engine="nltk")
+    t1 = time.perf_counter()
+    batch = vader_score_texts(texts, engine="batch")
+    t2 = time.perf_counter()
+
+    diff = np.abs(np.subtract(batch, reference)) if texts else np.zeros(0)
+    worst = int(diff.argmax()) if len(diff) else None
+    bad = int((diff > tolerance).sum())
+    speedup = (t1 - t0) / (t2 - t1) if t2 > t1 else float("inf")
+    print(
+        f"{name:<14} {len(texts):>8,} {int((diff == 0).sum()):>8,} {bad:>6,} {diff.max() if len(diff) else 0.0:>10.2e} "
+        f"{t1 - t0:>8.2f} {t2 - t1:>8.2f} {speedup:>7.1f}x"
+    )
+    if bad:
+        print(f"   worst: nltk={reference[worst]} batch={batch[worst]} text={texts[worst][:200]!r}")
+    return bad
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check batch VADER against NLTK.")
+    parser.add_argument("--rows", type=int, default=5000, help="Blocks per synthetic / cleaned sample.")
+    parser.add_argument("--seed", type=int, default=synthetic.SEED)
+    parser.add_argument("--input", type=Path, default=storage.cleaned_path(),
+                        help="Cleaned blocks to sample (skipped if missing).")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    calls = max(10, args.rows // 20)
+    raw = sample_blocks(synthetic.cached_jsonl(calls, args.seed), args.rows)
+    samples = [
+        ("edge cases", EDGE_CASES),
+        ("synthetic raw", raw),
+        ("synthetic clean", regex_clean_series(pd.Series(raw, dtype=object)).str.split().str.join(" ").tolist()),
+    ]
+    if storage.exists(args.input):
+        samples.append((args.input.stem.replace("speaker_blocks_", ""), cleaned_sample(args.input, args.rows)))
+
+    print(f"{'sample':<14} {'texts':>8} {'exact':>8} {'> tol':>6} {'max diff':>10} {'nltk s':>8} {'batch s':>8} {'speedup':>8}")
+    failures = sum(compare(name, texts, args.tolerance) for name, texts in samples)
+    if failures:
+        raise SystemExit(f"❌ {failures} texts differ from NLTK by more than {args.tolerance}")
+    print(f"✅ Batch VADER matches NLTK within {args.tolerance}")
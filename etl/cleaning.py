@@ -0,0 +1,53 @@
+"""
+Text cleaning profiles for speaker blocks.
+
+- "raw":   lowercase, drop forward-looking / safe-harbor boilerplate and
+           non-letters, collapse whitespace
+- "light": raw, then drop stopwords and tokens of 2 letters or fewer
+           (set lookups, no spaCy pipeline)
+- "full":  spaCy lemmas, as preprocessing has always produced
+
+raw and light run over a whole chunk of blocks at once with pandas string
+operations and set lookups; full needs nlp.pipe and lives in
+preprocess_speaker_blocks.
+Each profile is written to its own file (utils.storage.cleaned_path).
+"""
+
+import re
+
+import pandas as pd
+from spacy.lang.en.stop_words import STOP_WORDS
+
+from utils.storage import CLEANING_PROFILES as PROFILES
+
+FORWARD_LOOKING_RE = re.compile(r"forward[- ]looking statements.*", flags=re.I)
+SAFE_HARBOR_RE = re.compile(r"safe harbor.*", flags=re.I)
+NON_ALPHA_RE = re.compile(r"[^a-z\s]")
+
+def regex_clean(text):
+    text = text.lower()
+    text = FORWARD_LOOKING_RE.sub(" ", text)
+    text = SAFE_HARBOR_RE.sub(" ", text)
+    text = NON_ALPHA_RE.sub(" ", text)
+    return text
+
+def regex_clean_series(texts):
+    """regex_clean over a Series of block texts."""
+    s = texts.str.lower()
+    s = s.str.replace(FORWARD_LOOKING_RE, " ", regex=True)
+    s = s.str.replace(SAFE_HARBOR_RE, " ", regex=True)
+    s = s.str.replace(NON_ALPHA_RE, " ", regex=True)
+    return s
+
+def raw_profile(regexed):
+    """Regex output with whitespace collapsed."""
+    return regexed.str.split().str.join(" ")
+
+def light_profile(regexed):
+    """Same token filter as the spaCy lemmatizer (stopword, length > 2), without lemmas."""
+    # A per-block comprehension with set lookups beats explode/groupby by ~10x
+    return pd.Series(
+        [" ".join(w for w in text.split() if len(w) > 2 and w not in STOP_WORDS) for text in regexed],
+        index=regexed.index,
+        dtype=object,
+    )
@@ -0,0 +1,98 @@
+from pathlib import Path
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils import near_duplicates as nd
+from utils import storage
+from utils.checkpoint import Checkpoint
+from utils.instrument import RunReport, size_of
+
+# Near-duplicate clusters of cleaned blocks (operator scripts, analyst
+# thank-yous, prepared remarks recycled across quarters), so FinBERT can
+# score one block per cluster:
+#   python etl/dedup_blocks.py --threshold 0.9
+#   python models/sentiment_finbert.py --dedup
+# See utils/near_duplicates.py for the method and the output files.
+
+CHUNK_ROWS = 5000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate speaker blocks with MinHash/LSH.")
+    parser.add_argument("--threshold", type=float, default=nd.THRESHOLD,
+                        help="Estimated Jaccard similarity (word 3-shingles) to count as a duplicate.")
+    parser.add_argument("--num-perm", type=int, default=nd.NUM_PERM, help="MinHash permutations per block.")
+    parser.add_argument("--profile", choices=storage.CLEANING_PROFILES, default="full",
+                        help="Cleaned input to cluster (the one the scorer will read).")
+    args = parser.parse_args()
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be in (0, 1]")
+    report = RunReport("dedup_blocks", vars(args))
+
+    IN_PATH = storage.cleaned_path(args.profile)
+    if not storage.exists(IN_PATH):
+        raise FileNotFoundError(f"Missing {IN_PATH}. Run preprocessing first.")
+    bands, rows = nd.lsh_params(args.threshold, args.num_perm)
+    print(f"▶️ MinHash {args.num_perm} perms, LSH {bands} bands x {rows} rows, threshold {args.threshold}")
+
+    hasher = nd.MinHasher(args.num_perm)
+    signatures, block_ids, eligible = [], [], []
+    with report.stage("signatures", reads=[IN_PATH]) as signing:
+        for chunk, _ in storage.iter_chunks(IN_PATH, CHUNK_ROWS, Checkpoint(), columns=["block_id", "clean_text"]):
+            texts = chunk["clean_text"].fillna("").astype(str).tolist()
+            signatures.append(hasher.signatures(texts))
+            block_ids.append(chunk["block_id"].to_numpy())
+            eligible.append(np.array([bool(t.strip()) for t in texts], dtype=bool))
+            signing.chunk(len(chunk))
+    signatures = np.concatenate(signatures) if signatures else np.zeros((0, args.num_perm), dtype=np.uint32)
+    block_ids = np.concatenate(block_ids) if block_ids else np.zeros(0, dtype=np.int64)
+    eligible = np.concatenate(eligible) if eligible else np.zeros(0, dtype=bool)
+
+    with report.stage("cluster") as clustering:
+        rep, sims = nd.cluster(signatures, eligible, args.threshold)
+        clustering.rows_in = len(rep)
+
+    members = np.flatnonzero(rep != np.arange(len(rep)))
+    out = pd.DataFrame({
+        "block_id": block_ids[members],
+        "rep_block_id": block_ids[rep[members]],
+        "row": members,
+        "rep_row": rep[members],
+        "similarity": np.round(sims[members], 4),
+    })
+    map_path = nd.map_path(IN_PATH)
+    with report.stage("write", rewrites=[map_path]) as writing:
+        out.to_csv(map_path, index=False)
+        writing.rows_out = len(out)
+
+    scored = int(eligible.sum())
+    clusters = int(len(np.unique(rep[members])))
+    exact = int((sims[members] == 1.0).sum())
+    summary = {
+        "threshold": args.threshold,
+        "num_perm": args.num_perm,
+        "bands": bands,
+        "rows_per_band": rows,
+        "shingle_words": nd.SHINGLE_WORDS,
+        "input": str(storage.dataset_path(IN_PATH)),
+        "input_bytes": size_of(IN_PATH),
+        "input_sha256": nd.input_digest(IN_PATH),
+        "blocks": int(len(rep)),
+        "non_blank": scored,
+        "clusters": clusters,
+        "members": int(len(members)),
+        "identical_signatures": exact,
+    }
+    nd.summary_path(IN_PATH).write_text(json.dumps(summary, indent=2))
+    report.note(**{k: v for k, v in summary.items() if k in ("clusters", "members", "identical_signatures")})
+
+    saved = len(members) / scored if scored else 0.0
+    print(f"✅ {len(rep):,} blocks -> {clusters:,} clusters with {len(members):,} near-duplicate members")
+    print(f"♻️ Model calls saved with --dedup: {len(members):,} of {scored:,} non-blank blocks ({saved:.1%})")
+    print(f"   {exact:,} of them have a signature identical to their representative's")
+    print("🎉 DONE. Saved ->", map_path.resolve())
+    report.finish()
@@ -1,23 +1,108 @@
-from datasets import load_dataset
 import pandas as pd
 from pathlib import Path
+import argparse
+import ast
+import json
+import math
+import os
+import sys
 
 DATASET_NAME = "kurry/sp500_earnings_transcripts"
 
+OUT_PATH = Path("data/raw/transcripts_raw.jsonl")
+LEGACY_CSV_PATH = Path("data/raw/transcripts_raw.csv")
+REPORT_EVERY = 10_000     # transcripts per progress line / run report chunk
+
+BATCH_ROWS = 500          # transcripts per Arrow batch
+
+# One transcript per line, structured_content kept as native JSON lists/dicts
+# (no stringified blob to re-parse). The dataset is iterated in batches from
+# the Arrow files in the local Hugging Face cache, so the whole split is
+# never held in memory.
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.instrument import RunReport
+
+def native_structure(x):
+    """structured_content as lists/dicts; some exports ship it as a JSON string."""
+    if isinstance(x, str):
+        try:
+            return json.loads(x)
+        except ValueError:
+            return None
+    return x
+
+def iter_dataset(batch_rows):
+    from datasets import load_dataset
+
+    ds = load_dataset(DATASET_NAME, split="train")
+    print("Rows:", ds.num_rows, "| Columns:", ds.column_names)
+    for batch in ds.iter(batch_size=batch_rows):
+        columns = list(batch.keys())
+        for i in range(len(batch[columns[0]])):
+            yield {c: batch[c][i] for c in columns}
+
+def iter_legacy_csv(path, batch_rows):
+    """Old transcripts_raw.csv (stringified JSON or Python repr), converted once."""
+    for chunk in pd.read_csv(path, chunksize=batch_rows):
+        for record in chunk.to_dict("records"):
+            x = record["structured_content"]
+            if isinstance(x, str):
+                try:
+                    x = json.loads(x)
+                except ValueError:
+                    try:
+                        x = ast.literal_eval(x)
+                    except (ValueError, SyntaxError):
+                        x = None
+            record["structured_content"] = x
+            yield {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in record.items()}
+
+def to_json(value):
+    # numpy scalars -> Python, dates -> ISO strings
+    return value.item() if hasattr(value, "item") else str(value)
+
 if __name__ == "__main__":
-    out_path = Path("data/raw/transcripts_raw.csv")
-    out_path.parent.mkdir(parents=True, exist_ok=True)
+    parser = argparse.ArgumentParser(description="Download transcripts to JSONL.")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--from-csv", action="store_true",
+                        help=f"Convert an existing {LEGACY_CSV_PATH} instead of downloading.")
+    args = parser.parse_args()
+    report = RunReport("load_transcripts", vars(args))
 
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
     print("CWD:", Path.cwd())
-    print("Loading dataset:", DATASET_NAME)
 
-    ds = load_dataset(DATASET_NAME)
-    print("Dataset splits:", list(ds.keys()))
+    if args.from_csv:
+        print("Converting:", LEGACY_CSV_PATH)
+        records = iter_legacy_csv(LEGACY_CSV_PATH, args.batch_rows)
+    else:
+        print("Loading dataset:", DATASET_NAME)
+        records = iter_dataset(args.batch_rows)
 
-    df = pd.DataFrame(ds["train"])
-    print("Loaded shape:", df.shape)
-    print("Columns:", df.columns.tolist())
+    # Write to a temp file and rename, so a partial download never looks complete
+    tmp_path = OUT_PATH.with_name(OUT_PATH.name + ".tmp")
+    n = 0
+    unparsed = 0
+    written = 0
+    export = report.stage("export", reads=[LEGACY_CSV_PATH] if args.from_csv else [])
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        for record in records:
+            record["structured_content"] = native_structure(record.get("structured_content"))
+            unparsed += record["structured_content"] is None
+            fh.write(json.dumps(record, ensure_ascii=False, default=to_json))
+            fh.write("\n")
+            n += 1
+            if n % REPORT_EVERY == 0:
+                export.chunk(REPORT_EVERY, bytes_written=fh.tell() - written)
+                written = fh.tell()
+                print(f"   {n:,} transcripts written")
+        if n % REPORT_EVERY:
+            export.chunk(n % REPORT_EVERY, bytes_written=fh.tell() - written)
+    os.replace(tmp_path, OUT_PATH)
+    export.stop()
+    report.note(transcripts=n, unparsed=unparsed)
 
-    df.to_csv(out_path, index=False)
-    print("Saved file exists?", out_path.exists())
-    print("Saved ->", out_path.resolve())
+    print(f"Transcripts: {n:,} ({unparsed} without parseable structured_content)")
+    print("Saved ->", OUT_PATH.resolve())
+    report.finish()
\ No newline at end of file
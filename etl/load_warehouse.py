@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from features.call_baselines import call_keys
+from features.relabeled_roles_aggregation import add_roles_and_sections, speaker_flags
+from utils import storage
+from utils import warehouse as wh
+from utils.checkpoint import Checkpoint
+from utils.instrument import RunReport
+
+# Bulk load of the scored speaker blocks and the v2 Power BI tables into a
+# warehouse star schema (see utils/warehouse.py), so the report can use
+# DirectQuery / incremental refresh instead of importing the CSVs:
+#   python etl/load_warehouse.py                                        # local SQLite file
+#   WAREHOUSE_URL=postgresql://etl:***@db/earnings python etl/load_warehouse.py
+#
+# A call is rewritten (its metrics, role rows and blocks) when it is new or
+# when any of those rows changed since the last load: its stored row_hash
+# covers the call-level row plus digests of its role rows and its blocks,
+# the latter from a first streaming pass over the blocks. Calls that left
+# the CSVs are deleted. --full rewrites every call.
+
+CALL_PATH = Path("data/processed/powerbi_call_level_metrics_v2.csv")
+ROLE_PATH = Path("data/processed/powerbi_role_level_metrics_v2.csv")
+BLOCKS_PATH = Path("data/processed/speaker_blocks_with_sentiment.csv")
+RECEIPT_PATH = Path("data/warehouse/last_load.json")
+
+CHUNK_ROWS = 100_000
+
+BLOCK_COLUMNS = [
+    "block_id", "symbol", "year", "quarter", "date", "speaker", "speaker_role", "clean_text",
+    "block_length", "sentiment_vader", "finbert_sentiment", "finbert_confidence",
+]
+
+def speaker_rows(speakers, ids):
+    flags = speaker_flags(speakers)
+    return pd.DataFrame({
+        "speaker_id": ids,
+        "speaker": speakers,
+        "is_operator": flags["operator"],
+        "is_management": flags["management"],
+        "is_bank": flags["bank"],
+    })
+
+def block_digests(chunk_rows):
+    """call_key -> digest of the call's block rows (ids and scores included), in one pass."""
+    parts = []
+    for chunk, _ in storage.iter_chunks(BLOCKS_PATH, chunk_rows, Checkpoint(), columns=BLOCK_COLUMNS):
+        parts.append(wh.sum_by_key(call_keys(chunk), wh.row_hashes(chunk)))
+    if not parts:
+        return pd.Series(dtype=np.uint64)
+    digests = pd.concat(parts)
+    return wh.sum_by_key(digests.index, digests.to_numpy())
+
+def write_receipt(url, loaded_at, **counts):
+    """What the last load did; also the output run_pipeline.py tracks for this stage."""
+    RECEIPT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    RECEIPT_PATH.write_text(json.dumps({"url": wh.masked(url), "loaded_at": loaded_at, **counts}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load blocks and v2 metrics into the warehouse star schema.")
+    parser.add_argument("--url", default=os.environ.get("WAREHOUSE_URL", wh.DEFAULT_URL),
+                        help="sqlite:///..., duckdb:///... or postgresql://... (default: $WAREHOUSE_URL).")
+    parser.add_argument("--full", action="store_true", help="Rewrite every call, not only the changed ones.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Blocks read per chunk.")
+    args = parser.parse_args()
+    report = RunReport("load_warehouse", {**vars(args), "url": wh.masked(args.url)})
+
+    for path in (CALL_PATH, ROLE_PATH):
+        if not path.exists():
+            raise FileNotFoundError(f"Missing {path}. Run relabeled_roles_aggregation.py first.")
+    if not storage.exists(BLOCKS_PATH):
+        raise FileNotFoundError(f"Missing {BLOCKS_PATH}. Run merge first.")
+
+    with report.stage("read", reads=[CALL_PATH, ROLE_PATH]) as read:
+        calls = pd.read_csv(CALL_PATH)
+        roles = pd.read_csv(ROLE_PATH)
+        call_rows = pd.Series(wh.row_hashes(calls), index=call_keys(calls).to_numpy())
+        role_rows = wh.sum_by_key(call_keys(roles), wh.row_hashes(roles))
+        calls["call_key"] = call_rows.index
+        roles["call_key"] = call_keys(roles)
+        read.rows_out = len(calls) + len(roles)
+
+    with report.stage("hash", reads=[BLOCKS_PATH]) as hashing:
+        calls["row_hash"] = wh.call_hashes(call_rows, role_rows, block_digests(args.chunk_rows)).to_numpy()
+        hashing.rows_out = len(calls)
+
+    db = wh.connect(args.url)
+    db.create_schema()
+    loaded = db.loaded()
+    changed = calls if args.full else calls[calls["call_key"].map(loaded) != calls["row_hash"]]
+    removed = sorted(set(loaded) - set(calls["call_key"]))
+    loaded_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"▶️ {wh.masked(args.url)}: {len(calls):,} calls, {len(changed):,} new or changed, {len(removed):,} removed")
+
+    if changed.empty and not removed:
+        write_receipt(args.url, loaded_at, calls=0, removed=0, blocks=0, tables=db.counts())
+        db.close()
+        print("✅ Warehouse is up to date.")
+        report.finish("up-to-date")
+        sys.exit(0)
+
+    keys = set(changed["call_key"])
+    db.begin()
+    try:
+        with report.stage("calls") as stage:
+            if removed:
+                db.stage_calls(removed)
+                stage.rows_in += db.delete_calls(wh.CALL_FACTS + ["fact_call_metrics", "dim_call"])
+            db.stage_calls(sorted(keys))
+            changed = changed.assign(loaded_at=loaded_at)
+            stage.rows_out = db.write("dim_call", changed) + db.write("fact_call_metrics", changed)
+
+        with report.stage("roles") as stage:
+            stage.rows_in = db.delete_calls(["fact_role_metrics"])
+            stage.rows_out = db.write("fact_role_metrics", roles[roles["call_key"].isin(keys)])
+
+        with report.stage("blocks", reads=[BLOCKS_PATH]) as stage:
+            db.delete_calls(["fact_block"])
+            for chunk, _ in storage.iter_chunks(BLOCKS_PATH, args.chunk_rows, Checkpoint(), columns=BLOCK_COLUMNS):
+                n = len(chunk)
+                key = call_keys(chunk)
+                wanted = key.isin(keys).to_numpy()
+                if not wanted.any():
+                    stage.chunk(n, 0)
+                    continue
+                chunk = add_roles_and_sections(chunk[wanted].assign(call_key=key[wanted]))
+                chunk["speaker_id"], speakers, ids = wh.speaker_ids(chunk["speaker"])
+                db.write("dim_speaker", speaker_rows(speakers, ids))
+                stage.chunk(n, db.write("fact_block", chunk))
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    counts = db.counts()
+    db.close()
+    blocks = report.stages[-1].rows_out
+    write_receipt(args.url, loaded_at, calls=len(changed), removed=len(removed), blocks=blocks, tables=counts)
+    report.note(calls_loaded=len(changed), calls_removed=len(removed), tables=counts)
+
+    print(f"✅ Loaded {len(changed):,} calls ({blocks:,} blocks), removed {len(removed):,}")
+    print("\n".join(f"   {table:<18} {rows:>12,} rows" for table, rows in counts.items()))
+    print("🎉 DONE. Receipt ->", RECEIPT_PATH.resolve())
+    report.finish()
@@ -1,17 +1,32 @@
 import pandas as pd
+import argparse
 import sys
-import re
+import time
+from collections import deque
+from functools import lru_cache
 import json
-import ast
 from pathlib import Path
 import spacy
 
-RAW_PATH = Path("data/raw/transcripts_raw.csv")
-OUT_PATH = Path("data/processed/speaker_blocks_cleaned.csv")
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils import storage
+from utils.instrument import RunReport
+from utils.keywords import KeywordMatcher
+from etl.cleaning import PROFILES, regex_clean, regex_clean_series, raw_profile, light_profile
+
+RAW_PATH = Path("data/raw/transcripts_raw.jsonl")   # see etl/load_transcripts.py
+OUT_PATH = storage.cleaned_path()     # "full" profile; others get their own file
 CHECKPOINT_PATH = Path("data/processed/preprocess_checkpoint.txt")
 
-CHUNK_SIZE = 25
+CHUNK_SIZE = 25           # transcripts per checkpointed chunk
 MIN_BLOCK_LEN = 30
+BATCH_SIZE = 256          # speaker blocks per nlp.pipe batch
+N_PROCESS = 1             # spaCy worker processes (-1 = one per CPU)
+
+# block_id = transcript row index * BLOCKS_PER_CALL + block ordinal within the
+# transcript (counted before MIN_BLOCK_LEN filtering, so ids never shift).
+# It increases in file order, which the sorted merge downstream relies on.
+BLOCKS_PER_CALL = 10_000
 
 MGMT_KEYWORDS = [
     "ceo", "cfo", "chief", "president", "coo", "cto",
@@ -23,43 +38,37 @@ ANALYST_KEYWORDS = [
 ]
 OPERATOR_KEYWORDS = ["operator", "moderator", "coordinator"]
 
-nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
-
 # ---------------- helpers ----------------
-def safe_parse(x):
-    if pd.isna(x):
-        return None
-    if isinstance(x, (list, dict)):
-        return x
-    try:
-        return json.loads(x)
-    except Exception:
-        try:
-            return ast.literal_eval(x)
-        except Exception:
-            return None
+OPERATOR_MATCH = KeywordMatcher(OPERATOR_KEYWORDS)
+MGMT_MATCH = KeywordMatcher(MGMT_KEYWORDS)
+ANALYST_MATCH = KeywordMatcher(ANALYST_KEYWORDS)
 
+@lru_cache(maxsize=None)
 def infer_role(speaker):
+    # Cached per speaker string: the same names repeat in every block of a call
     s = (speaker or "").lower()
-    if any(k in s for k in OPERATOR_KEYWORDS):
+    if OPERATOR_MATCH.search(s):
         return "operator"
-    if any(k in s for k in MGMT_KEYWORDS):
+    if MGMT_MATCH.search(s):
         return "management"
-    if any(k in s for k in ANALYST_KEYWORDS):
+    if ANALYST_MATCH.search(s):
         return "analyst"
     return "other"
 
-def clean_text(text):
-    text = text.lower()
-    text = re.sub(r"forward[- ]looking statements.*", " ", text, flags=re.I)
-    text = re.sub(r"safe harbor.*", " ", text, flags=re.I)
-    text = re.sub(r"[^a-z\s]", " ", text)
-    doc = nlp(text)
+@lru_cache(maxsize=None)
+def load_nlp():
+    # Only the "full" profile needs the spaCy model
+    return spacy.load("en_core_web_sm", disable=["parser", "ner"])
+
+def lemmatize(doc):
     return " ".join(
         tok.lemma_ for tok in doc
         if tok.is_alpha and not tok.is_stop and len(tok) > 2
     )
 
+def clean_text(text):
+    return lemmatize(load_nlp()(regex_clean(text)))
+
 def extract_blocks(structured):
     if not structured:
         return []
@@ -81,11 +90,129 @@ def extract_blocks(structured):
             blocks.append((speaker, text))
     return blocks
 
+
+def make_block_id(call_idx, ordinal):
+    if ordinal >= BLOCKS_PER_CALL:
+        raise ValueError(f"Transcript {call_idx} has more than {BLOCKS_PER_CALL} blocks.")
+    return call_idx * BLOCKS_PER_CALL + ordinal
+
+def count_lines(path):
+    with open(path, "rb") as fh:
+        return sum(1 for _ in fh)
+
+def iter_transcripts(path, start_idx):
+    """(transcript index, raw JSON line) from start_idx on; earlier lines aren't parsed."""
+    with open(path, "rb") as fh:
+        for call_idx, line in enumerate(fh):
+            if call_idx >= start_idx and line.strip():
+                yield call_idx, line
+
+def iter_blocks(transcripts, contexts, timings):
+    """
+    Yield regex-cleaned block texts for nlp.pipe, in transcript order.
+
+    The matching context for each text (with the text itself under "text",
+    for the raw/light profiles) is appended to `contexts`; nlp.pipe returns
+    docs in input order (also with n_process > 1), so the consumer pops them
+    in step without shipping metadata to the worker processes.
+    After the last block of every CHUNK_SIZE transcripts an empty text with an
+    end-of-chunk context is yielded, so the consumer knows when it can flush
+    rows and advance the checkpoint. Time spent here is the "parse" stage.
+    """
+    def flush(chunk_start, chunk_end, raw, ctxs):
+        t0 = time.perf_counter()
+        texts = regex_clean_series(pd.Series(raw, dtype=object)).tolist()
+        for ctx, text in zip(ctxs, texts):
+            ctx["text"] = text
+        contexts.extend(ctxs)
+        contexts.append({"chunk_start": chunk_start, "chunk_end": chunk_end})
+        timings["parse"] += time.perf_counter() - t0
+        timings["parse_blocks"] += len(texts)
+        return texts + [""]
+
+    chunk_start = None
+    call_idx = None
+    raw, ctxs = [], []
+    for call_idx, line in transcripts:
+        if chunk_start is None:
+            chunk_start = call_idx
+
+        t0 = time.perf_counter()
+        r = json.loads(line)     # structured_content is already native lists/dicts
+        meta = {k: r.get(k) for k in ["symbol", "company_name", "year", "quarter", "date"]}
+        for ordinal, (speaker, text) in enumerate(extract_blocks(r.get("structured_content"))):
+            raw.append(text)
+            ctxs.append({
+                "block_id": make_block_id(call_idx, ordinal),
+                "meta": meta,
+                "speaker": speaker
+            })
+        timings["parse"] += time.perf_counter() - t0
+
+        # Regex cleaning runs once per chunk as pandas string operations
+        if call_idx + 1 - chunk_start == CHUNK_SIZE:
+            yield from flush(chunk_start, call_idx + 1, raw, ctxs)
+            chunk_start = None
+            raw, ctxs = [], []
+
+    if chunk_start is not None:
+        yield from flush(chunk_start, call_idx + 1, raw, ctxs)
+
+def profile_rows(profile, ctxs, lemmas):
+    """Output rows of one chunk for a cleaning profile, MIN_BLOCK_LEN applied."""
+    if profile == "full":
+        cleaned = pd.Series(lemmas, dtype=object)
+    else:
+        regexed = pd.Series([ctx["text"] for ctx in ctxs], dtype=object)
+        cleaned = raw_profile(regexed) if profile == "raw" else light_profile(regexed)
+    lengths = cleaned.str.split().str.len()
+
+    rows = []
+    for ctx, text, n in zip(ctxs, cleaned.tolist(), lengths.tolist()):
+        if n < MIN_BLOCK_LEN:
+            continue
+        speaker = ctx["speaker"]
+        rows.append({
+            "block_id": ctx["block_id"],
+            **ctx["meta"],
+            "speaker": speaker,
+            "speaker_role": infer_role(speaker),
+            "clean_text": text,
+            "block_length": n
+        })
+    return rows
+
+def rate(n, seconds):
+    return n / seconds if seconds > 0 else float("inf")
+
 # ---------------- main ----------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean speaker blocks with spaCy.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--n-process", type=int, default=N_PROCESS)
+    parser.add_argument(
+        "--profiles", default="full",
+        help=f"Comma-separated cleaning profiles to write ({', '.join(PROFILES)}); "
+             "spaCy only runs for full. See etl/cleaning.py."
+    )
+    args = parser.parse_args()
+    report = RunReport("preprocess_speaker_blocks", vars(args))
+
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    unknown = sorted(set(profiles) - set(PROFILES))
+    if unknown or not profiles:
+        parser.error(f"--profiles must be a comma list of {PROFILES}, got {args.profiles!r}")
+    profiles = [p for p in PROFILES if p in profiles]
+    use_spacy = "full" in profiles
+
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    calls = pd.read_csv(RAW_PATH)
+    if not RAW_PATH.exists():
+        raise FileNotFoundError(
+            f"Missing {RAW_PATH}. Run etl/load_transcripts.py "
+            "(or `--from-csv` to convert an old transcripts_raw.csv)."
+        )
+    n_calls = count_lines(RAW_PATH)
 
     # Load checkpoint
     start_idx = 0
@@ -93,50 +220,108 @@ if __name__ == "__main__":
         start_idx = int(CHECKPOINT_PATH.read_text().strip())
         print(f"🔁 Resuming from transcript index {start_idx}")
 
-    file_exists = OUT_PATH.exists()
-
-try:
-    for i in range(start_idx, len(calls), CHUNK_SIZE):
-        chunk = calls.iloc[i:i + CHUNK_SIZE]
-        rows = []
-
-        for _, r in chunk.iterrows():
-            structured = safe_parse(r["structured_content"])
-            blocks = extract_blocks(structured)
-
-            for speaker, text in blocks:
-                cleaned = clean_text(text)
-                if len(cleaned.split()) < MIN_BLOCK_LEN:
-                    continue
-
-                rows.append({
-                    "symbol": r["symbol"],
-                    "company_name": r["company_name"],
-                    "year": r["year"],
-                    "quarter": r["quarter"],
-                    "date": r["date"],
-                    "speaker": speaker,
-                    "speaker_role": infer_role(speaker),
-                    "clean_text": cleaned,
-                    "block_length": len(cleaned.split())
-                })
-
-        if rows:
-            pd.DataFrame(rows).to_csv(
-                OUT_PATH,
-                mode="a",
-                header=not file_exists,
-                index=False
+    # One checkpoint covers every profile, so a resume must ask for the same set
+    file_exists = {p: storage.exists(storage.cleaned_path(p)) for p in profiles}
+    missing = [p for p in profiles if start_idx > 0 and not file_exists[p]]
+    if missing:
+        raise SystemExit(
+            f"Checkpoint is at transcript {start_idx} but there is no output for "
+            f"profile(s) {missing}. Rerun with the profiles of the interrupted run, "
+            f"or delete {CHECKPOINT_PATH} to start over."
+        )
+
+    print(f"▶️ Profiles: {', '.join(profiles)}")
+    if use_spacy:
+        print(f"▶️ spaCy batch_size={args.batch_size}, n_process={args.n_process}")
+
+    timings = {"parse": 0.0, "parse_blocks": 0, "profiles": 0.0, "write": 0.0, "written": 0}
+    run_start = time.perf_counter()
+    chunk_start = run_start
+    chunk_blocks = 0
+    total_blocks = 0
+    ctxs = []
+    lemmas = []
+    out_paths = [storage.cleaned_path(p) for p in profiles]
+    clean = report.stage("clean", reads=[RAW_PATH], writes=out_paths)
+
+    try:
+        # One pipe (and one worker pool) for the whole run; rows come back in
+        # transcript order so the checkpoint stays a plain transcript index.
+        contexts = deque()
+        blocks = iter_blocks(iter_transcripts(RAW_PATH, start_idx), contexts, timings)
+        if use_spacy:
+            docs = load_nlp().pipe(blocks, batch_size=args.batch_size, n_process=args.n_process)
+        else:
+            docs = blocks
+
+        for doc in docs:
+            ctx = contexts.popleft()
+            if "chunk_end" not in ctx:
+                chunk_blocks += 1
+                ctxs.append(ctx)
+                if use_spacy:
+                    lemmas.append(lemmatize(doc))
+                continue
+
+            chunk_written = 0
+            for profile in profiles:
+                t0 = time.perf_counter()
+                rows = profile_rows(profile, ctxs, lemmas)
+                t1 = time.perf_counter()
+                if profile != "full":
+                    timings["profiles"] += t1 - t0
+                    report.latency(f"{profile}_chunk", t1 - t0)
+                if rows:
+                    storage.write_chunk(
+                        pd.DataFrame(rows),
+                        storage.cleaned_path(profile),
+                        part=ctx["chunk_start"],
+                        header=not file_exists[profile]
+                    )
+                    file_exists[profile] = True
+                timings["write"] += time.perf_counter() - t1
+                timings["written"] += len(rows)
+                chunk_written += len(rows)
+
+            # Save checkpoint AFTER successfully finishing this chunk
+            CHECKPOINT_PATH.write_text(str(ctx["chunk_end"]))
+            clean.chunk(rows_in=chunk_blocks, rows_out=chunk_written)
+
+            now = time.perf_counter()
+            total_blocks += chunk_blocks
+            print(
+                f"✅ Processed {ctx['chunk_end']}/{n_calls} transcripts "
+                f"({chunk_blocks} blocks, {rate(chunk_blocks, now - chunk_start):.1f} blocks/sec)"
             )
-            file_exists = True
-
-        # Save checkpoint AFTER successfully finishing this chunk
-        CHECKPOINT_PATH.write_text(str(i + CHUNK_SIZE))
-        print(f"✅ Processed {min(i + CHUNK_SIZE, len(calls))}/{len(calls)} transcripts")
-
-except KeyboardInterrupt:
-    # Clean, expected exit
-    last = CHECKPOINT_PATH.read_text().strip() if CHECKPOINT_PATH.exists() else str(start_idx)
-    print("\n🛑 Stopped by user (CTRL+C).")
-    print(f"✅ Progress saved. Next run will resume from transcript index {last}.")
-    sys.exit(0)
\ No newline at end of file
+            ctxs = []
+            lemmas = []
+            chunk_blocks = 0
+            chunk_start = now
+
+    except KeyboardInterrupt:
+        # Clean, expected exit
+        last = CHECKPOINT_PATH.read_text().strip() if CHECKPOINT_PATH.exists() else str(start_idx)
+        print("\n🛑 Stopped by user (CTRL+C).")
+        print(f"✅ Progress saved. Next run will resume from transcript index {last}.")
+        report.finish("interrupted")
+        sys.exit(0)
+
+    clean.stop()
+
+    # With n_process > 1 spaCy runs in the workers while parse/write run here,
+    # so the stage times overlap; "spacy" is whatever the main loop waited on.
+    elapsed = time.perf_counter() - run_start
+    print("\n⏱️ Throughput by stage:")
+    print(f"   parse+regex : {rate(timings['parse_blocks'], timings['parse']):,.1f} blocks/sec")
+    if use_spacy:
+        spacy_time = max(elapsed - timings["parse"] - timings["profiles"] - timings["write"], 0.0)
+        print(f"   spaCy       : {rate(total_blocks, spacy_time):,.1f} blocks/sec")
+    if profiles != ["full"]:
+        n_fast = total_blocks * len([p for p in profiles if p != "full"])
+        print(f"   raw/light   : {rate(n_fast, timings['profiles']):,.1f} blocks/sec")
+    print(f"   write       : {rate(timings['written'], timings['write']):,.1f} rows/sec")
+    print(f"   overall     : {rate(total_blocks, elapsed):,.1f} blocks/sec ({total_blocks} blocks in {elapsed:.1f}s)")
+    for profile in profiles:
+        print(f"🎉 {profile:<5} -> {storage.dataset_path(storage.cleaned_path(profile))}")
+    report.note(**timings)
+    report.finish()
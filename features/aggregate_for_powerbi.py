@@ -1,100 +1,93 @@
-import pandas as pd
 from pathlib import Path
+import argparse
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from features import chunked_aggregation, incremental
+from features.aggregation import GROUP_KEYS, add_role_gaps, call_level_metrics, prepare, role_level_metrics
+from utils import storage
+from utils.instrument import RunReport
 
 IN_PATH = Path("data/processed/speaker_blocks_with_sentiment.csv")
 CALL_OUT = Path("data/processed/powerbi_call_level_metrics.csv")
 ROLE_OUT = Path("data/processed/powerbi_role_level_metrics.csv")
+STATE_PATH = Path("data/processed/powerbi_refresh_state.json")
 
-def finbert_to_score(label: str) -> int:
-    # Simple numeric mapping for charts + correlations
-    if label == "positive":
-        return 1
-    if label == "negative":
-        return -1
-    return 0
+# Only what the aggregation touches (clean_text is not needed, blocks are counted by size)
+COLUMNS = [
+    "symbol", "company_name", "year", "quarter", "date", "speaker_role",
+    "block_length", "sentiment_vader", "finbert_sentiment", "finbert_confidence"
+]
 
 if __name__ == "__main__":
-    if not IN_PATH.exists():
+    parser = argparse.ArgumentParser(description="Aggregate speaker blocks into Power BI tables.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only recompute calls with rows appended since the last run.")
+    chunked_aggregation.add_arguments(parser)
+    args = parser.parse_args()
+    chunked_aggregation.check_arguments(parser, args)
+    report = RunReport("aggregate_for_powerbi", vars(args))
+
+    if not storage.exists(IN_PATH):
         raise FileNotFoundError(f"Missing {IN_PATH}. Run merge first.")
 
-    df = pd.read_csv(IN_PATH)
-
-    # Ensure types
-    df["sentiment_vader"] = pd.to_numeric(df["sentiment_vader"], errors="coerce").fillna(0.0)
-    df["finbert_confidence"] = pd.to_numeric(df["finbert_confidence"], errors="coerce").fillna(0.0)
-    df["finbert_score"] = df["finbert_sentiment"].astype(str).apply(finbert_to_score)
+    if args.chunked:
+        # Out of core: bounded chunks into mergeable per-group state
+        with report.stage("aggregate", reads=[IN_PATH]) as aggregate:
+            role_level, call_level, rows = chunked_aggregation.run(
+                IN_PATH, COLUMNS, ["speaker_role"], args, record=aggregate
+            )
+            call_level = add_role_gaps(call_level, role_level, "speaker_role", aggfunc="first")
+            aggregate.rows_out = len(role_level) + len(call_level)
+        touched, state = None, None
+    else:
+        with report.stage("read", reads=[IN_PATH]) as read:
+            df, touched, state = incremental.read_changes(
+                IN_PATH, COLUMNS, STATE_PATH, [ROLE_OUT, CALL_OUT], args.incremental
+            )
+            read.rows_out = 0 if df is None else len(df)
+        if touched is not None and not touched:
+            state.save(STATE_PATH)
+            print("✅ No new rows since the last run, outputs are up to date.")
+            report.finish("up-to-date")
+            sys.exit(0)
 
-    group_keys = ["symbol", "company_name", "year", "quarter", "date"]
+        aggregate = report.stage("aggregate")
+        aggregate.rows_in = len(df)
 
-    # Role-level metrics (per call + role)
-    role_level = (
-        df.groupby(group_keys + ["speaker_role"])
-          .agg(
-              blocks=("clean_text", "count"),
-              avg_block_len=("block_length", "mean"),
-              vader_mean=("sentiment_vader", "mean"),
-              vader_median=("sentiment_vader", "median"),
-              finbert_mean=("finbert_score", "mean"),
-              finbert_pos=("finbert_sentiment", lambda x: (x == "positive").mean()),
-              finbert_neg=("finbert_sentiment", lambda x: (x == "negative").mean()),
-              finbert_neu=("finbert_sentiment", lambda x: (x == "neutral").mean()),
-              finbert_avg_conf=("finbert_confidence", "mean"),
-          )
-          .reset_index()
-    )
+        # Ensure types + one-hot FinBERT labels
+        df = prepare(df)
 
-    ROLE_OUT.parent.mkdir(parents=True, exist_ok=True)
-    role_level.to_csv(ROLE_OUT, index=False)
+        # Role-level metrics (per call + role)
+        role_level, role_sums = role_level_metrics(df, ["speaker_role"])
 
-    # Call-level metrics (all roles combined)
-    call_level = (
-        df.groupby(group_keys)
-          .agg(
-              total_blocks=("clean_text", "count"),
-              avg_block_len=("block_length", "mean"),
-              vader_mean=("sentiment_vader", "mean"),
-              finbert_mean=("finbert_score", "mean"),
-              finbert_pos=("finbert_sentiment", lambda x: (x == "positive").mean()),
-              finbert_neg=("finbert_sentiment", lambda x: (x == "negative").mean()),
-              finbert_neu=("finbert_sentiment", lambda x: (x == "neutral").mean()),
-              finbert_avg_conf=("finbert_confidence", "mean"),
-          )
-          .reset_index()
-    )
+        # Call-level metrics (all roles combined)
+        call_level = call_level_metrics(df, role_sums)
 
-    # Management vs Analyst gap (will be weak right now because analysts are under-labeled)
-    pivot = role_level.pivot_table(
-        index=group_keys,
-        columns="speaker_role",
-        values=["vader_mean", "finbert_mean"],
-        aggfunc="first"
-    )
+        # Management vs Analyst gap (will be weak right now because analysts are under-labeled)
+        call_level = add_role_gaps(call_level, role_level, "speaker_role", aggfunc="first")
 
-    # Flatten columns
-    pivot.columns = [f"{a}__{b}" for a, b in pivot.columns]
-    pivot = pivot.reset_index()
+        if touched is not None:
+            role_level = incremental.upsert(ROLE_OUT, role_level, touched, GROUP_KEYS + ["speaker_role"])
+            call_level = incremental.upsert(CALL_OUT, call_level, touched, GROUP_KEYS)
 
-    # Compute gaps if both exist
-    if "vader_mean__management" in pivot.columns and "vader_mean__analyst" in pivot.columns:
-        pivot["vader_gap_mgmt_minus_analyst"] = pivot["vader_mean__management"] - pivot["vader_mean__analyst"]
-    else:
-        pivot["vader_gap_mgmt_minus_analyst"] = None
+        aggregate.rows_out = len(role_level) + len(call_level)
+        aggregate.stop()
+        rows = len(df)
 
-    if "finbert_mean__management" in pivot.columns and "finbert_mean__analyst" in pivot.columns:
-        pivot["finbert_gap_mgmt_minus_analyst"] = pivot["finbert_mean__management"] - pivot["finbert_mean__analyst"]
+    ROLE_OUT.parent.mkdir(parents=True, exist_ok=True)
+    with report.stage("write", rewrites=[ROLE_OUT, CALL_OUT]) as write:
+        role_level.to_csv(ROLE_OUT, index=False)
+        call_level.to_csv(CALL_OUT, index=False)
+        write.rows_in = write.rows_out = len(role_level) + len(call_level)
+    if state is not None:
+        state.save(STATE_PATH)
     else:
-        pivot["finbert_gap_mgmt_minus_analyst"] = None
-
-    call_level = call_level.merge(
-        pivot[group_keys + ["vader_gap_mgmt_minus_analyst", "finbert_gap_mgmt_minus_analyst"]],
-        on=group_keys,
-        how="left"
-    )
-
-    call_level.to_csv(CALL_OUT, index=False)
+        STATE_PATH.unlink(missing_ok=True)      # the next --incremental run starts from a full build
 
-    print("Rows (merged speaker blocks):", df.shape)
+    print("Rows (merged speaker blocks" + (", touched calls" if touched else "") + "):", rows)
     print("Rows (role-level):", role_level.shape)
     print("Rows (call-level):", call_level.shape)
     print("Saved ->", ROLE_OUT.resolve())
-    print("Saved ->", CALL_OUT.resolve())
\ No newline at end of file
+    print("Saved ->", CALL_OUT.resolve())
+    report.finish()
\ No newline at end of file
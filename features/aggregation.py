@@ -0,0 +1,110 @@
+"""
+Shared Power BI aggregation for aggregate_for_powerbi.py (v1) and
+relabeled_roles_aggregation.py (v2).
+
+FinBERT labels are one-hot encoded once, every metric is a built-in groupby
+reduction (size/sum/median) and means are sum / blocks, which is exactly what
+pandas' groupby mean computes, so outputs match the old lambda-based code
+byte for byte.
+
+Call-level counts and integer sums (blocks, block length, label counts,
+FinBERT score) are added up from the role-level partial sums. The two float
+sums (VADER, confidence) are summed over the rows once more: re-adding
+float partial sums changes the last digit of about half the means.
+"""
+
+import pandas as pd
+
+GROUP_KEYS = ["symbol", "company_name", "year", "quarter", "date"]
+LABELS = ["positive", "negative", "neutral"]
+
+def prepare(df):
+    """Coerce score columns and add one-hot label / numeric score columns."""
+    df["sentiment_vader"] = pd.to_numeric(df["sentiment_vader"], errors="coerce").fillna(0.0)
+    df["finbert_confidence"] = pd.to_numeric(df["finbert_confidence"], errors="coerce").fillna(0.0)
+
+    labels = df["finbert_sentiment"]
+    for label in LABELS:
+        df[f"is_{label}"] = (labels == label).astype("int64")
+    # positive -> 1, negative -> -1, anything else -> 0
+    df["finbert_score"] = df["is_positive"] - df["is_negative"]
+    return df
+
+def _finish(sums, count_col):
+    """Turn partial sums into the published mean/share columns."""
+    n = sums[count_col]
+    out = pd.DataFrame(index=sums.index)
+    out[count_col] = n
+    out["avg_block_len"] = sums["len_sum"] / n
+    out["vader_mean"] = sums["vader_sum"] / n
+    if "vader_median" in sums.columns:
+        out["vader_median"] = sums["vader_median"]
+    out["finbert_mean"] = sums["score_sum"] / n
+    for label, col in zip(LABELS, ["finbert_pos", "finbert_neg", "finbert_neu"]):
+        out[col] = sums[f"{label}_sum"] / n
+    out["finbert_avg_conf"] = sums["conf_sum"] / n
+    return out.reset_index()
+
+def role_level_metrics(df, role_cols):
+    """
+    One groupby over the rows for (call, *role_cols).
+
+    Returns (published role-level table, partial sums for call_level_metrics).
+    """
+    sums = df.groupby(GROUP_KEYS + role_cols).agg(
+        blocks=("block_length", "size"),
+        len_sum=("block_length", "sum"),
+        vader_sum=("sentiment_vader", "sum"),
+        vader_median=("sentiment_vader", "median"),
+        score_sum=("finbert_score", "sum"),
+        positive_sum=("is_positive", "sum"),
+        negative_sum=("is_negative", "sum"),
+        neutral_sum=("is_neutral", "sum"),
+        conf_sum=("finbert_confidence", "sum"),
+    )
+    return _finish(sums, "blocks"), sums
+
+def call_level_metrics(df, role_sums, float_sums=None):
+    """
+    Call-level metrics from role-level partial sums (see module docstring).
+    `float_sums` (vader_sum, conf_sum per call) replaces the pass over `df`.
+    """
+    int_cols = ["blocks", "len_sum", "score_sum", "positive_sum", "negative_sum", "neutral_sum"]
+    sums = role_sums[int_cols].groupby(level=GROUP_KEYS).sum()
+    sums = sums.rename(columns={"blocks": "total_blocks"})
+
+    if float_sums is None:
+        float_sums = df.groupby(GROUP_KEYS).agg(
+            vader_sum=("sentiment_vader", "sum"),
+            conf_sum=("finbert_confidence", "sum"),
+        )
+    return _finish(sums.join(float_sums), "total_blocks")
+
+def add_role_gaps(call_level, role_level, role_col, aggfunc, suffix=""):
+    """Management minus analyst gap columns (NaN/None when a role is missing)."""
+    pivot = role_level.pivot_table(
+        index=GROUP_KEYS,
+        columns=role_col,
+        values=["vader_mean", "finbert_mean"],
+        aggfunc=aggfunc
+    )
+
+    # Flatten columns
+    pivot.columns = [f"{a}__{b}" for a, b in pivot.columns]
+    pivot = pivot.reset_index()
+
+    gap_cols = []
+    for metric in ["vader", "finbert"]:
+        gap = f"{metric}_gap_mgmt_minus_analyst{suffix}"
+        mgmt, analyst = f"{metric}_mean__management", f"{metric}_mean__analyst"
+        if mgmt in pivot.columns and analyst in pivot.columns:
+            pivot[gap] = pivot[mgmt] - pivot[analyst]
+        else:
+            pivot[gap] = None
+        gap_cols.append(gap)
+
+    return call_level.merge(
+        pivot[GROUP_KEYS + gap_cols],
+        on=GROUP_KEYS,
+        how="left"
+    )
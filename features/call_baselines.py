@@ -0,0 +1,156 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import argparse
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from features.aggregation import GROUP_KEYS
+from utils.instrument import RunReport
+
+# Company baselines, momentum and quarter extremes for the Power BI tooltips,
+# precomputed from the v2 call-level table so the report only looks them up:
+#   python features/call_baselines.py --window 4
+#
+# Per call (powerbi_call_baselines_v2.csv):
+#   <metric>_baseline / _baseline_std   mean / std of the company's calls in the
+#                                       previous WINDOW calendar quarters (not this one)
+#   <metric>_delta, <metric>_z          difference from the baseline, in std units
+#   <metric>_pct_rank                   percentile rank among all calls of the quarter
+#   <metric>_qoq                        change vs the company's call one quarter earlier
+#   is_quarter_best / is_quarter_worst  highest / lowest finbert_mean of the quarter
+# Per quarter (powerbi_quarter_extremes_v2.csv): calls, blocks, average tone,
+# QoQ change and the best / worst call.
+
+IN_PATH = Path("data/processed/powerbi_call_level_metrics_v2.csv")
+OUT_PATH = Path("data/processed/powerbi_call_baselines_v2.csv")
+EXTREMES_OUT = Path("data/processed/powerbi_quarter_extremes_v2.csv")
+
+WINDOW = 4               # trailing calendar quarters in a baseline
+MIN_PERIODS = 2          # calls needed in the window for a baseline (and a std)
+
+METRICS = [
+    "vader_mean", "finbert_mean",
+    "vader_gap_mgmt_minus_analyst_v2", "finbert_gap_mgmt_minus_analyst_v2",
+]
+MIX = ["finbert_pos", "finbert_neg", "finbert_neu"]     # baseline + delta only (Δ vs company baseline)
+QUARTER = ["year", "quarter"]
+
+def call_keys(df):
+    """"ADBE-20211216-2021Q4", the CallKey the report shows."""
+    dates = pd.to_datetime(df["date"], errors="coerce")
+    day = dates.dt.strftime("%Y%m%d").fillna(df["date"].astype(str).str.replace("-", "", regex=False))
+    return df["symbol"].astype(str) + "-" + day + "-" + df["year"].astype(str) + "Q" + df["quarter"].astype(str)
+
+def trailing_windows(symbols, quarter_index, window):
+    """
+    [start, end) row range of each call's baseline window in a table sorted by
+    (symbol, quarter): the same symbol's calls in the `window` quarters before.
+    """
+    codes = pd.factorize(symbols)[0].astype(np.int64)
+    key = codes * (quarter_index.max() + window + 2) + quarter_index
+    return np.searchsorted(key, key - window, side="left"), np.searchsorted(key, key, side="left")
+
+def window_stats(values, start, end, min_periods):
+    """Mean, sample std and count of `values[start:end]` per row, via prefix sums."""
+    def window_sum(a):
+        prefix = np.concatenate([[0.0], np.cumsum(a)])
+        return prefix[end] - prefix[start]
+
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    n, s, ss = window_sum(valid), window_sum(x), window_sum(x * x)
+
+    enough = n >= min_periods
+    mean = np.divide(s, n, out=np.full(len(x), np.nan), where=enough)
+    var = np.divide(ss - s * mean, n - 1, out=np.full(len(x), np.nan), where=enough & (n > 1))
+    return mean, np.sqrt(np.clip(var, 0, None)), n
+
+def previous_quarter(df, quarter_index, col):
+    """The same symbol's value one calendar quarter earlier (NaN if it has no call then)."""
+    prev = df.groupby("symbol", sort=False)[col].shift(1)
+    prev_q = pd.Series(quarter_index, index=df.index).groupby(df["symbol"], sort=False).shift(1)
+    return prev.where(prev_q == quarter_index - 1)
+
+def baselines(calls, window=WINDOW, min_periods=MIN_PERIODS):
+    df = calls.sort_values(["symbol", "year", "quarter", "date"], kind="stable").reset_index(drop=True)
+    df.insert(len(GROUP_KEYS), "call_key", call_keys(df))
+    qi = (df["year"].astype(np.int64) * 4 + df["quarter"].astype(np.int64) - 1).to_numpy()
+    start, end = trailing_windows(df["symbol"].astype(str), qi, window)
+    df["baseline_calls"] = end - start
+
+    out = {}
+    for col in METRICS + MIX:
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        mean, std, _ = window_stats(values, start, end, min_periods)
+        out[f"{col}_baseline"] = mean
+        out[f"{col}_delta"] = values - mean
+        if col in MIX:
+            continue
+        out[f"{col}_baseline_std"] = std
+        out[f"{col}_z"] = np.divide(values - mean, std, out=np.full(len(values), np.nan), where=std > 0)
+        out[f"{col}_pct_rank"] = df.groupby(QUARTER)[col].rank(pct=True).to_numpy()
+        out[f"{col}_qoq"] = values - previous_quarter(df, qi, col).to_numpy(dtype=float)
+    df = pd.concat([df, pd.DataFrame(out, index=df.index)], axis=1)
+
+    # Ties go to the call that sorts first (symbol order)
+    scored = df.dropna(subset=["finbert_mean"]).groupby(QUARTER)["finbert_mean"]
+    best, worst = scored.idxmax(), scored.idxmin()
+    df["is_quarter_best"] = df.index.isin(best)
+    df["is_quarter_worst"] = df.index.isin(worst)
+    return df.sort_values(GROUP_KEYS, kind="stable").reset_index(drop=True)
+
+def quarter_extremes(df):
+    quarters = df.groupby(QUARTER).agg(
+        calls=("call_key", "size"),
+        blocks=("total_blocks", "sum"),
+        vader_mean=("vader_mean", "mean"),
+        finbert_mean=("finbert_mean", "mean"),
+    ).reset_index()
+    qi = quarters["year"] * 4 + quarters["quarter"] - 1
+    prev = qi.shift(1) == qi - 1
+    for col in ["vader_mean", "finbert_mean"]:
+        quarters[f"{col}_qoq"] = (quarters[col] - quarters[col].shift(1)).where(prev)
+
+    for flag, name in [("is_quarter_best", "best"), ("is_quarter_worst", "worst")]:
+        picked = df.loc[df[flag], QUARTER + ["call_key", "finbert_mean", "vader_mean"]].rename(columns={
+            "call_key": f"{name}_call_key",
+            "finbert_mean": f"{name}_finbert_mean",
+            "vader_mean": f"{name}_vader_mean",
+        })
+        quarters = quarters.merge(picked, on=QUARTER, how="left")
+    return quarters
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Company baselines, percentile ranks and quarter extremes (v2).")
+    parser.add_argument("--window", type=int, default=WINDOW, help="Trailing calendar quarters per baseline.")
+    parser.add_argument("--min-periods", type=int, default=MIN_PERIODS, help="Calls needed for a baseline.")
+    args = parser.parse_args()
+    if args.window < 1 or args.min_periods < 1:
+        parser.error("--window and --min-periods must be at least 1")
+    report = RunReport("call_baselines", vars(args))
+
+    if not IN_PATH.exists():
+        raise FileNotFoundError(f"Missing {IN_PATH}. Run relabeled_roles_aggregation.py first.")
+
+    with report.stage("read", reads=[IN_PATH]) as read:
+        calls = pd.read_csv(IN_PATH)
+        read.rows_out = len(calls)
+
+    with report.stage("compute") as compute:
+        compute.rows_in = len(calls)
+        table = baselines(calls, args.window, args.min_periods)
+        extremes = quarter_extremes(table)
+        compute.rows_out = len(table) + len(extremes)
+
+    with report.stage("write", rewrites=[OUT_PATH, EXTREMES_OUT]) as write:
+        table.to_csv(OUT_PATH, index=False)
+        extremes.to_csv(EXTREMES_OUT, index=False)
+        write.rows_in = write.rows_out = len(table) + len(extremes)
+
+    with_baseline = int(table["finbert_mean_baseline"].notna().sum())
+    print(f"✅ {len(table):,} calls, {with_baseline:,} with a {args.window}-quarter baseline "
+          f"(>= {args.min_periods} earlier calls), {len(extremes):,} quarters")
+    print("Saved ->", OUT_PATH.resolve())
+    print("Saved ->", EXTREMES_OUT.resolve())
+    report.finish()
@@ -0,0 +1,357 @@
+"""
+Out-of-core Power BI aggregation (`--chunked` in aggregate_for_powerbi.py
+and relabeled_roles_aggregation.py).
+
+The merged file is read CHUNK_ROWS rows at a time with categorical text
+columns and downcast integers, and every chunk is folded into per-group
+state that merges by addition: block counts, integer sums, FinBERT label
+counts and the VADER / confidence float sums (per role group, plus the two
+float sums per call, like aggregation.py). Memory grows with the number of
+groups, not with the input.
+
+Medians (and optional percentiles) of sentiment_vader come from one
+merging t-digest for all groups at once, stored as a centroid table sorted
+by (group, mean). New values are buffered, merged in, and a group whose
+centroid count passes `compression` is re-clustered with the k1 scale
+function, which keeps the tails fine and the middle coarse. Equal values
+always share one centroid, so a group with at most `compression` distinct
+values keeps its exact distribution and its median is exactly pandas'.
+`median="exact"` never compresses (for comparison; memory then grows with
+distinct values per group).
+
+When the state passes the memory ceiling, the sketch is re-compressed at
+half the compression (down to MIN_COMPRESSION); exact mode stops instead.
+Float sums are added chunk by chunk, so means can differ from the in-memory
+path in the last digit or two.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from features.aggregation import GROUP_KEYS, _finish, call_level_metrics, prepare
+from utils import storage
+from utils.checkpoint import Checkpoint
+
+CHUNK_ROWS = 200_000
+COMPRESSION = 200           # t-digest delta: ~COMPRESSION / 2 centroids per compressed group
+MIN_COMPRESSION = 20
+MEMORY_MB = 1024            # aggregation state ceiling (chunks in flight come on top)
+BUFFER_ROWS = 1_000_000     # values buffered before they are merged into the sketch
+GROUP_BYTES = 200           # rough per-group cost of the key dict + tuple
+
+# Text columns as categories (they repeat), integers downcast. The scores stay
+# float64: they are summed into published means.
+READ_DTYPES = {
+    "symbol": "category",
+    "company_name": "category",
+    "date": "category",
+    "speaker": "category",
+    "speaker_role": "category",
+    "finbert_sentiment": "category",
+    "year": "int16",
+    "quarter": "int8",
+    "block_length": "int32",
+}
+
+SUM_COLS = [
+    ("blocks", None), ("len_sum", "block_length"), ("vader_sum", "sentiment_vader"),
+    ("score_sum", "finbert_score"), ("positive_sum", "is_positive"), ("negative_sum", "is_negative"),
+    ("neutral_sum", "is_neutral"), ("conf_sum", "finbert_confidence"),
+]
+INT_SUMS = {"blocks", "len_sum", "score_sum", "positive_sum", "negative_sum", "neutral_sum"}
+
+def parse_percentiles(text):
+    """"10,90" -> [0.1, 0.9]."""
+    if not text:
+        return []
+    values = [float(p) for p in text.split(",")]
+    if not all(0 <= p <= 100 for p in values):
+        raise ValueError(f"Percentiles must be in [0, 100], got {text!r}")
+    return [p / 100 for p in values]
+
+def percentile_column(q):
+    return f"vader_p{q * 100:g}".replace(".", "_")
+
+class GroupIndex:
+    """Dense ids for group key tuples, stable across chunks."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.ids = {}
+        self.tuples = []
+
+    def __len__(self):
+        return len(self.tuples)
+
+    def lookup(self, chunk):
+        """Group id per row; -1 where a key is missing (groupby drops those rows)."""
+        frame = chunk[self.keys]
+        valid = frame.notna().all(axis=1).to_numpy()
+        out = np.full(len(chunk), -1, dtype=np.int64)
+        if not valid.any():
+            return out
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(frame[valid]))
+        table = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques):
+            table[i] = self.ids.get(key, -1)
+            if table[i] < 0:
+                table[i] = self.ids[key] = len(self.tuples)
+                self.tuples.append(key)
+        out[valid] = table[codes]
+        return out
+
+    def index(self):
+        return pd.MultiIndex.from_tuples(self.tuples, names=self.keys)
+
+class GroupSums:
+    """Column sums per group id, grown as groups appear."""
+
+    def __init__(self, columns):
+        self.values = {c: np.zeros(0) for c in columns}
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self.values.values())
+
+    def add(self, ids, n_groups, columns):
+        keep = ids >= 0
+        for name, weights in columns.items():
+            w = None if weights is None else np.asarray(weights, dtype=float)[keep]
+            counts = np.bincount(ids[keep], weights=w, minlength=n_groups)
+            old = self.values[name]
+            self.values[name] = np.concatenate([old, np.zeros(n_groups - len(old))]) + counts
+
+    def frame(self, index):
+        order = index.argsort() if len(index) else []
+        out = pd.DataFrame({c: v for c, v in self.values.items()}, index=index)
+        for c in out.columns:
+            if c in INT_SUMS:
+                out[c] = out[c].round().astype("int64")
+        return out.iloc[order]
+
+def _group_starts(gid):
+    return np.r_[True, gid[1:] != gid[:-1]] if len(gid) else np.zeros(0, dtype=bool)
+
+def _before_in_group(gid, weight):
+    """Weight of the earlier centroids of the same group, per centroid (gid sorted)."""
+    cum = np.cumsum(weight)
+    group_start = np.maximum.accumulate(np.where(_group_starts(gid), cum - weight, 0))
+    return cum - weight - group_start
+
+class QuantileSketch:
+    """Merging t-digest for many groups, as one centroid table sorted by (group, mean)."""
+
+    def __init__(self, compression=COMPRESSION, exact=False):
+        self.compression = compression
+        self.exact = exact
+        self.gid = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.weight = np.zeros(0)
+        self.pure = np.zeros(0, dtype=bool)         # every value in the centroid is `mean`
+        self.buffer = []
+        self.buffered = 0
+
+    @property
+    def nbytes(self):
+        arrays = [self.gid, self.mean, self.weight, self.pure]
+        return sum(a.nbytes for a in arrays) + self.buffered * 16
+
+    def add(self, ids, values):
+        keep = ids >= 0
+        self.buffer.append((ids[keep], np.asarray(values, dtype=float)[keep]))
+        self.buffered += int(keep.sum())
+        if self.buffered >= max(BUFFER_ROWS, len(self.gid)):
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        ids = np.concatenate([b[0] for b in self.buffer])
+        values = np.concatenate([b[1] for b in self.buffer])
+        self.buffer, self.buffered = [], 0
+        self._set(
+            np.concatenate([self.gid, ids]),
+            np.concatenate([self.mean, values]),
+            np.concatenate([self.weight, np.ones(len(ids))]),
+            np.concatenate([self.pure, np.ones(len(ids), dtype=bool)]),
+        )
+        if not self.exact:
+            self.compress()
+
+    def _set(self, gid, mean, weight, pure):
+        """Sort by (group, mean) and fold equal values into one pure centroid."""
+        if not len(gid):
+            return
+        order = np.lexsort((mean, gid))
+        gid, mean, weight, pure = gid[order], mean[order], weight[order], pure[order]
+        starts = np.r_[True, (gid[1:] != gid[:-1]) | (mean[1:] != mean[:-1]) | ~pure[1:] | ~pure[:-1]]
+        first = np.flatnonzero(starts)
+        self.gid, self.mean, self.pure = gid[first], mean[first], pure[first]
+        self.weight = np.add.reduceat(weight, first) if len(first) else weight
+
+    def compress(self, compression=None):
+        """Re-cluster groups with more than `compression` centroids (k1 scale function)."""
+        self.compression = compression or self.compression
+        self.flush()
+        counts = np.bincount(self.gid)
+        big = counts[self.gid] > self.compression if len(self.gid) else np.zeros(0, dtype=bool)
+        if not big.any():
+            return
+        g, m, w, p = self.gid[big], self.mean[big], self.weight[big], self.pure[big]
+
+        total = np.bincount(g, weights=w)[g]
+        q = (_before_in_group(g, w) + w / 2) / total
+        k = np.floor(self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)).astype(np.int64)
+        starts = _group_starts(g) | np.r_[True, k[1:] != k[:-1]]
+        first = np.flatnonzero(starts)
+        last = np.r_[first[1:], len(g)] - 1
+
+        weight = np.add.reduceat(w, first)
+        mean = np.add.reduceat(m * w, first) / weight
+        pure = (np.add.reduceat((~p).astype(np.int64), first) == 0) & (m[first] == m[last])
+        mean = np.where(pure, m[first], mean)
+
+        self._set(
+            np.concatenate([self.gid[~big], g[first]]),
+            np.concatenate([self.mean[~big], mean]),
+            np.concatenate([self.weight[~big], weight]),
+            np.concatenate([self.pure[~big], pure]),
+        )
+
+    def quantiles(self, qs, n_groups):
+        """{q: value per group id} with pandas' linear interpolation; NaN for empty groups."""
+        self.flush()
+        g, m, w, p = self.gid, self.mean, self.weight, self.pure
+        out = {q: np.full(n_groups, np.nan) for q in qs}
+        if not len(g):
+            return out
+
+        # Anchors (rank, value): a pure centroid spans the ranks of its values, a mixed one sits at its center
+        before = _before_in_group(g, w)
+        x = np.column_stack([np.where(p, before + 0.5, before + w / 2), np.where(p, before + w - 0.5, before + w / 2)]).ravel()
+        y = np.repeat(m, 2)
+        ag = np.repeat(g, 2)
+
+        total = np.bincount(g, weights=w, minlength=n_groups)
+        base = np.concatenate([[0.0], np.cumsum(total + 1)[:-1]])     # groups laid end to end
+        gx = x + base[ag]
+        present = np.flatnonzero(total > 0)
+        first_anchor = np.searchsorted(ag, present, side="left")
+        last_anchor = np.searchsorted(ag, present, side="right") - 1
+
+        for q in qs:
+            t = q * (total[present] - 1) + 0.5 + base[present]
+            j = np.clip(np.searchsorted(gx, t, side="right") - 1, first_anchor, last_anchor)
+            k = np.minimum(j + 1, last_anchor)
+            span = gx[k] - gx[j]
+            frac = np.clip(np.divide(t - gx[j], span, out=np.zeros(len(t)), where=span > 0), 0, 1)
+            out[q][present] = y[j] * (1 - frac) + y[k] * frac
+        return out
+
+class ChunkedAggregation:
+    """Mergeable per-group state for role_level_metrics / call_level_metrics."""
+
+    def __init__(self, role_cols, median="sketch", compression=COMPRESSION, memory_mb=MEMORY_MB, percentiles=()):
+        self.role_cols = role_cols
+        self.roles = GroupIndex(GROUP_KEYS + role_cols)
+        self.calls = GroupIndex(GROUP_KEYS)
+        self.role_sums = GroupSums([name for name, _ in SUM_COLS])
+        self.call_sums = GroupSums(["vader_sum", "conf_sum"])
+        self.sketch = QuantileSketch(compression, exact=(median == "exact"))
+        self.memory_mb = memory_mb
+        self.percentiles = list(percentiles)
+        self.rows = 0
+
+    def state_mb(self):
+        groups = (len(self.roles) + len(self.calls)) * GROUP_BYTES
+        return (self.role_sums.nbytes + self.call_sums.nbytes + self.sketch.nbytes + groups) / 2**20
+
+    def add(self, df):
+        """Fold one prepared chunk (see aggregation.prepare) into the state."""
+        role_ids = self.roles.lookup(df)
+        self.role_sums.add(role_ids, len(self.roles), {
+            name: None if col is None else df[col].to_numpy() for name, col in SUM_COLS
+        })
+        call_ids = self.calls.lookup(df)
+        self.call_sums.add(call_ids, len(self.calls), {
+            "vader_sum": df["sentiment_vader"].to_numpy(), "conf_sum": df["finbert_confidence"].to_numpy()
+        })
+        self.sketch.add(role_ids, df["sentiment_vader"].to_numpy())
+        self.rows += len(df)
+        self.enforce_ceiling()
+
+    def enforce_ceiling(self):
+        while self.state_mb() > self.memory_mb:
+            if self.sketch.exact:
+                raise SystemExit(
+                    f"Exact medians need more than --memory-mb {self.memory_mb} "
+                    f"({self.state_mb():.1f} MB after {self.rows:,} rows). Raise it or use --median sketch."
+                )
+            if self.sketch.compression <= MIN_COMPRESSION:
+                raise SystemExit(
+                    f"Aggregation state is {self.state_mb():.1f} MB with the sketch at its minimum "
+                    f"compression ({MIN_COMPRESSION}); raise --memory-mb."
+                )
+            self.sketch.compress(max(MIN_COMPRESSION, self.sketch.compression // 2))
+            print(f"⚠️ Over {self.memory_mb} MB: median sketch compression lowered to {self.sketch.compression}")
+
+    def finish(self):
+        """(role_level, call_level) shaped exactly like the in-memory path (+ percentile columns)."""
+        stats = self.sketch.quantiles([0.5] + self.percentiles, len(self.roles))
+        sums = self.role_sums.frame(self.roles.index())
+        order = self.roles.index().argsort() if len(self.roles) else []
+        sums.insert(3, "vader_median", stats[0.5][order])
+        role_level = _finish(sums, "blocks")
+        at = role_level.columns.get_loc("vader_median") + 1
+        for i, q in enumerate(self.percentiles):
+            role_level.insert(at + i, percentile_column(q), stats[q][order])
+
+        float_sums = self.call_sums.frame(self.calls.index())
+        call_level = call_level_metrics(None, sums, float_sums)
+        return role_level, call_level
+
+def add_arguments(parser):
+    parser.add_argument("--chunked", action="store_true",
+                        help="Stream the input in bounded chunks into mergeable per-group state (inputs larger than RAM).")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="--chunked: rows read at a time.")
+    parser.add_argument("--median", choices=["sketch", "exact"], default="sketch",
+                        help="--chunked: t-digest medians, or exact ones (memory grows with distinct values).")
+    parser.add_argument("--compression", type=int, default=COMPRESSION,
+                        help="--chunked: t-digest compression (higher = more accurate, more memory).")
+    parser.add_argument("--memory-mb", type=float, default=MEMORY_MB, help="--chunked: aggregation state ceiling.")
+    parser.add_argument("--percentiles", default="",
+                        help='--chunked: extra sentiment_vader percentile columns, e.g. "10,90".')
+
+def check_arguments(parser, args):
+    if args.chunked and args.incremental:
+        parser.error("--chunked rebuilds everything; it can't be combined with --incremental")
+    if args.percentiles and not args.chunked:
+        parser.error("--percentiles needs --chunked")
+    try:
+        args.percentiles = parse_percentiles(args.percentiles)
+    except ValueError as e:
+        parser.error(str(e))
+
+def run(in_path, columns, role_cols, args, transform=None, record=None):
+    """
+    Stream `in_path` through a ChunkedAggregation built from the script
+    arguments; `transform(df)` runs on every prepared chunk before it is
+    folded in (the v2 script relabels roles there).
+
+    Returns (role_level, call_level, rows read).
+    """
+    agg = ChunkedAggregation(role_cols, args.median, args.compression, args.memory_mb, args.percentiles)
+    dtype = {c: t for c, t in READ_DTYPES.items() if c in columns}
+    for chunk, _ in storage.iter_chunks(in_path, args.chunk_rows, Checkpoint(), columns=columns, dtype=dtype):
+        df = prepare(chunk)
+        if transform is not None:
+            df = transform(df)
+        agg.add(df)
+        if record is not None:
+            record.chunk(len(chunk))
+    role_level, call_level = agg.finish()
+    compressed = "" if agg.sketch.exact else f", sketch compression {agg.sketch.compression}"
+    print(f"🧮 Chunked aggregation: {agg.rows:,} rows, state {agg.state_mb():.1f} MB{compressed}")
+    return role_level, call_level, agg.rows
@@ -0,0 +1,198 @@
+"""
+Incremental refresh for the Power BI aggregations.
+
+Each run leaves a small JSON state next to its outputs: where the input
+ended and, for every (symbol, year, quarter), which pieces of the input hold
+its rows. Pieces are CHUNK_ROWS-record byte ranges for CSV and part files for
+Parquet. A refresh reads only what was appended since the last run, collects
+the keys it touches, re-reads the older pieces of just those keys and returns
+all of their rows; the caller recomputes them and upserts the result into the
+existing outputs.
+
+Anything that isn't a pure append (bytes before the old end of the CSV
+changed, a Parquet part rewritten or removed, a different storage format)
+falls back to a full rebuild.
+"""
+
+import hashlib
+import io
+import json
+import os
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+
+import pandas as pd
+
+from utils import storage
+from utils.checkpoint import Checkpoint, iter_csv_chunks
+
+CHUNK_ROWS = 50_000
+TAIL_BYTES = 4096       # bytes before the old end of the CSV that must be unchanged
+
+@dataclass
+class RefreshState:
+    fmt: str = ""
+    rows: int = 0
+    in_offset: int | None = None                  # CSV: end of the rows already aggregated
+    tail: str | None = None                       # CSV: digest of the TAIL_BYTES before in_offset
+    files: dict = field(default_factory=dict)     # Parquet: part -> size
+    keys: dict = field(default_factory=dict)      # "symbol|year|quarter" -> [piece, ...]
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            return cls(**json.loads(path.read_text()))
+        except (ValueError, TypeError):
+            print(f"⚠️ Unreadable refresh state {path}, ignoring it.")
+            return None
+
+    def save(self, path):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self)))
+        os.replace(tmp, path)
+
+def key_strings(df):
+    """"symbol|year|quarter" per row, the unit a refresh recomputes."""
+    return df["symbol"].astype(str) + "|" + df["year"].astype(str) + "|" + df["quarter"].astype(str)
+
+def _tail_digest(path, offset):
+    start = max(0, offset - TAIL_BYTES)
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        return hashlib.blake2b(fh.read(offset - start), digest_size=16).hexdigest()
+
+def _is_append(in_path, state):
+    if state.fmt != storage.STORAGE_FORMAT:
+        return False
+    if state.fmt == "parquet":
+        files = storage.part_files(in_path)
+        return all(files.get(part) == size for part, size in state.files.items())
+
+    path = storage.dataset_path(in_path)
+    return (
+        state.in_offset is not None
+        and path.stat().st_size >= state.in_offset
+        and _tail_digest(path, state.in_offset) == state.tail
+    )
+
+# ---------------- pieces ----------------
+def _csv_header(path):
+    with open(path, "rb") as fh:
+        return fh.readline()
+
+def _scan_csv(path, columns, state):
+    """Yield ('start-end', chunk) for the records after state.in_offset."""
+    start = state.in_offset if state.in_offset is not None else len(_csv_header(path))
+    state.in_offset = start
+    for chunk, end in iter_csv_chunks(path, CHUNK_ROWS, Checkpoint(state.rows, start), columns=columns):
+        yield f"{start}-{end}", chunk
+        start = end
+        state.in_offset = end
+
+def _read_csv_piece(path, piece, columns):
+    start, end = (int(x) for x in piece.split("-"))
+    with open(path, "rb") as fh:
+        header = fh.readline()
+        fh.seek(start)
+        data = fh.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), usecols=columns)
+
+def _scan_parquet(in_path, columns, state):
+    """Yield (part, rows) for part files the state hasn't seen."""
+    for part, size in storage.part_files(in_path).items():
+        if part not in state.files:
+            yield part, storage.read_part(in_path, part, columns)
+            state.files[part] = size
+
+def _read_piece(in_path, piece, columns):
+    if storage.STORAGE_FORMAT == "parquet":
+        return storage.read_part(in_path, piece, columns)
+    return _read_csv_piece(storage.dataset_path(in_path), piece, columns)
+
+def _piece_order(piece):
+    # File order: byte offset for CSV, path for Parquet (same order the scans use)
+    if storage.STORAGE_FORMAT == "parquet":
+        return (0, piece)
+    return (int(piece.split("-")[0]), "")
+
+def _concat(frames, columns):
+    # A header-only input yields no chunks; pd.concat([]) would raise
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+# ---------------- public API ----------------
+def read_changes(in_path, columns, state_path, outputs, incremental):
+    """
+    Returns (rows, touched, state); save `state` once the outputs are written.
+
+    touched is None for a full rebuild and rows is then the whole input.
+    Otherwise touched holds the keys that got new rows and rows every row
+    (old and new, in file order) of those keys; an empty set means nothing
+    was appended since the last run.
+    """
+    old = None
+    if incremental:
+        old = RefreshState.load(state_path)
+        if old is None or not all(Path(p).exists() for p in outputs):
+            print("ℹ️ No previous refresh state/outputs, doing a full build.")
+            old = None
+        elif not _is_append(in_path, old):
+            print("⚠️ Input changed in place since the last run, doing a full build.")
+            old = None
+
+    if old is None:
+        state = RefreshState(fmt=storage.STORAGE_FORMAT)
+    else:
+        state = RefreshState(
+            old.fmt, old.rows, old.in_offset, old.tail, dict(old.files),
+            {k: list(v) for k, v in old.keys.items()}
+        )
+
+    path = storage.dataset_path(in_path)
+    if state.fmt == "parquet":
+        scan = _scan_parquet(in_path, columns, state)
+    else:
+        scan = _scan_csv(path, columns, state)
+
+    new_chunks = []
+    for piece, chunk in scan:
+        for key in key_strings(chunk).unique():
+            state.keys.setdefault(key, []).append(piece)
+        state.rows += len(chunk)
+        new_chunks.append(chunk)
+
+    if state.fmt != "parquet":
+        state.tail = _tail_digest(path, state.in_offset)
+
+    if old is None:
+        return _concat(new_chunks, columns), None, state
+    if not new_chunks:
+        return None, set(), state
+
+    touched = set()
+    for chunk in new_chunks:
+        touched.update(key_strings(chunk).unique())
+
+    old_pieces = sorted({p for k in touched for p in old.keys.get(k, [])}, key=_piece_order)
+    old_rows = []
+    for piece in old_pieces:
+        rows = _read_piece(in_path, piece, columns)
+        old_rows.append(rows[key_strings(rows).isin(touched)])
+
+    print(f"🔁 {len(touched)} (symbol, year, quarter) keys touched, re-reading {len(old_pieces)} older pieces.")
+    return _concat(old_rows + new_chunks, columns), touched, state
+
+def upsert(out_path, fresh, touched, sort_cols):
+    """Replace the rows of `touched` keys in an existing output with `fresh`."""
+    # round_trip so untouched floats are written back exactly as they were read
+    existing = pd.read_csv(out_path, float_precision="round_trip")
+    keep = existing[~key_strings(existing).isin(touched)]
+    if keep.empty:
+        return fresh
+    merged = pd.concat([keep, fresh], ignore_index=True)
+    return merged.sort_values(sort_cols, kind="stable").reset_index(drop=True)
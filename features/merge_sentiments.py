@@ -1,34 +1,183 @@
 import pandas as pd
 from pathlib import Path
+import argparse
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils import storage
+from utils.checkpoint import Checkpoint
+from utils.instrument import RunReport, byte_delta
 
 VADER_PATH = Path("data/processed/speaker_blocks_with_vader.csv")
 FINBERT_PATH = Path("data/processed/speaker_blocks_with_finbert.csv")
 OUT_PATH = Path("data/processed/speaker_blocks_with_sentiment.csv")
 
-# Join keys (must exist in BOTH files)
-KEYS = [
-    "symbol", "company_name", "year", "quarter", "date",
-    "speaker", "speaker_role", "clean_text", "block_length"
-]
+CHUNK_ROWS = 50_000
+
+# Join key: stable id assigned in preprocessing (transcript index + block ordinal).
+# Both scorers keep input order, so both files arrive sorted by it and can be
+# merged chunk by chunk instead of loading either file whole.
+KEY = "block_id"
+FINBERT_COLS = [KEY, "finbert_sentiment", "finbert_confidence"]
+
+# Each scorer's output follows the cleaning profile it scored (--profile), and
+# profiles keep different blocks (MIN_BLOCK_LEN applies after cleaning), so
+# only blocks both profiles kept are merged. clean_text / block_length come
+# from the VADER file unless --text-from finbert; the v2 aggregation detects
+# Q&A sections and analysts on that text.
+TEXT_COLS = ["clean_text", "block_length"]
+
+class SortedStream:
+    """Buffered view of a chunk iterator that checks sort order and drops duplicate ids."""
+
+    def __init__(self, name, chunks):
+        self.name = name
+        self.chunks = chunks
+        self.buf = None
+        self.done = False
+        self.last_key = None
+        self.rows = 0
+        self.duplicates = 0
+
+    def empty(self):
+        return self.buf is None or self.buf.empty
+
+    def fill(self):
+        while self.empty() and not self.done:
+            self.pull()
+
+    def pull(self):
+        item = next(self.chunks, None)
+        if item is None:
+            self.done = True
+            return
+
+        chunk, _ = item
+        if KEY not in chunk.columns:
+            raise SystemExit(f"{self.name} output has no {KEY} column. Re-run preprocessing and scoring.")
+
+        key = storage.order_key(chunk)
+        if not key.is_monotonic_increasing or (self.last_key is not None and key.iloc[0] < self.last_key):
+            raise ValueError(f"{self.name} output is not in {KEY} order; it cannot be stream-merged.")
+
+        dup = key.duplicated()
+        if self.last_key is not None:
+            dup |= key == self.last_key
+        self.rows += len(chunk)
+        self.duplicates += int(dup.sum())
+
+        chunk = chunk.assign(_key=key.values)[~dup.values]
+        if not chunk.empty:
+            self.last_key = chunk["_key"].iloc[-1]
+        self.buf = chunk if self.buf is None else pd.concat([self.buf, chunk], ignore_index=True)
+
+    def bound(self):
+        # Nothing this stream yields later can sort below its last buffered key
+        return float("inf") if self.done else self.buf["_key"].iloc[-1]
+
+    def take(self, bound):
+        if self.buf is None:
+            return None
+        ready = self.buf["_key"] <= bound
+        out = self.buf[ready]
+        self.buf = self.buf[~ready]
+        return out
+
+def sorted_merge(vader_chunks, finbert_chunks, stats, text_from="vader"):
+    """
+    Inner-join two block_id-sorted chunk streams, yielding merged chunks in order.
+
+    Rows without a partner on the other side are counted in `stats`. With
+    text_from="finbert" the TEXT_COLS come from the FinBERT stream (which
+    must carry them), in the same column positions.
+    """
+    right_cols = FINBERT_COLS + (TEXT_COLS if text_from == "finbert" else [])
+    vader = SortedStream("VADER", vader_chunks)
+    finbert = SortedStream("FinBERT", finbert_chunks)
+
+    while True:
+        vader.fill()
+        finbert.fill()
+        if vader.done and finbert.done and vader.empty() and finbert.empty():
+            break
+
+        bound = min(vader.bound(), finbert.bound())
+        left = vader.take(bound)
+        right = finbert.take(bound)
+        if left is None or right is None:
+            # One file has no rows at all: everything on the other side is unmatched
+            stats["vader_unmatched"] += 0 if left is None else len(left)
+            stats["finbert_unmatched"] += 0 if right is None else len(right)
+            continue
+
+        stats["vader_unmatched"] += int((~left[KEY].isin(right[KEY])).sum())
+        stats["finbert_unmatched"] += int((~right[KEY].isin(left[KEY])).sum())
+
+        left = left.drop(columns="_key")
+        columns = list(left.columns) + FINBERT_COLS[1:]
+        if text_from == "finbert":
+            left = left.drop(columns=TEXT_COLS)
+        merged = left.merge(right[right_cols], on=KEY, how="inner")[columns]
+        if not merged.empty:
+            yield merged
+
+    stats["vader_rows"] = vader.rows
+    stats["finbert_rows"] = finbert.rows
+    stats["vader_duplicates"] = vader.duplicates
+    stats["finbert_duplicates"] = finbert.duplicates
 
 if __name__ == "__main__":
-    if not VADER_PATH.exists():
+    parser = argparse.ArgumentParser(description="Merge the VADER and FinBERT outputs on block_id.")
+    parser.add_argument("--vader-profile", choices=storage.CLEANING_PROFILES, default="full",
+                        help="Cleaning profile VADER scored (picks its output file).")
+    parser.add_argument("--finbert-profile", choices=storage.CLEANING_PROFILES, default="full",
+                        help="Cleaning profile FinBERT scored (picks its output file).")
+    parser.add_argument("--text-from", choices=["vader", "finbert"], default="vader",
+                        help="Scorer output whose clean_text / block_length go into the merged file.")
+    args = parser.parse_args()
+    report = RunReport("merge_sentiments", vars(args))
+
+    VADER_PATH = storage.profile_path(VADER_PATH, args.vader_profile)
+    FINBERT_PATH = storage.profile_path(FINBERT_PATH, args.finbert_profile)
+    if not storage.exists(VADER_PATH):
         raise FileNotFoundError(f"Missing {VADER_PATH}")
-    if not FINBERT_PATH.exists():
+    if not storage.exists(FINBERT_PATH):
         raise FileNotFoundError(f"Missing {FINBERT_PATH}")
+    text_profile = args.vader_profile if args.text_from == "vader" else args.finbert_profile
+    if args.vader_profile != args.finbert_profile:
+        print(f"ℹ️ VADER scored '{args.vader_profile}', FinBERT '{args.finbert_profile}': only blocks kept by both "
+              f"are merged; clean_text is the '{text_profile}' text")
 
-    vader = pd.read_csv(VADER_PATH)
-    finbert = pd.read_csv(FINBERT_PATH)
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    storage.remove(OUT_PATH)
 
+    vader_chunks = storage.iter_chunks(VADER_PATH, CHUNK_ROWS, Checkpoint())
     # Keep only needed columns from finbert
-    finbert = finbert[KEYS + ["finbert_sentiment", "finbert_confidence"]]
-
-    merged = vader.merge(finbert, on=KEYS, how="inner")
+    finbert_cols = FINBERT_COLS + (TEXT_COLS if args.text_from == "finbert" else [])
+    finbert_chunks = storage.iter_chunks(
+        FINBERT_PATH, CHUNK_ROWS, Checkpoint(),
+        columns=list(dict.fromkeys(finbert_cols + storage.order_columns()))
+    )
 
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    merged.to_csv(OUT_PATH, index=False)
+    stats = {"vader_unmatched": 0, "finbert_unmatched": 0}
+    merged_rows = 0
+    out_offset = None
+    merge = report.stage("merge", reads=[VADER_PATH, FINBERT_PATH], writes=[OUT_PATH])
+    for merged in sorted_merge(vader_chunks, finbert_chunks, stats, args.text_from):
+        previous = out_offset
+        out_offset = storage.write_chunk(merged, OUT_PATH, part=merged_rows, header=merged_rows == 0)
+        merge.chunk(rows_in=0, rows_out=len(merged), bytes_written=byte_delta(out_offset, previous))
+        merged_rows += len(merged)
+    merge.rows_in = stats["vader_rows"] + stats["finbert_rows"]
+    merge.stop()
+    report.note(text_profile=text_profile, **stats)
 
-    print("VADER rows:", vader.shape)
-    print("FinBERT rows:", finbert.shape)
-    print("Merged rows:", merged.shape)
-    print("Saved ->", OUT_PATH.resolve())
\ No newline at end of file
+    print("VADER rows:", stats["vader_rows"])
+    print("FinBERT rows:", stats["finbert_rows"])
+    print("Merged rows:", merged_rows)
+    if stats["vader_unmatched"] or stats["finbert_unmatched"]:
+        print(f"⚠️ Unmatched rows: {stats['vader_unmatched']} VADER-only, {stats['finbert_unmatched']} FinBERT-only")
+    if stats["vader_duplicates"] or stats["finbert_duplicates"]:
+        print(f"⚠️ Duplicate block_ids dropped: {stats['vader_duplicates']} VADER, {stats['finbert_duplicates']} FinBERT")
+    print("Saved ->", storage.dataset_path(OUT_PATH).resolve())
+    report.finish()
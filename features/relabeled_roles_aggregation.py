@@ -1,11 +1,26 @@
 import pandas as pd
-import re
+import numpy as np
+import argparse
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from features import chunked_aggregation, incremental
+from features.aggregation import GROUP_KEYS, add_role_gaps, call_level_metrics, prepare, role_level_metrics
+from utils import storage
+from utils.instrument import RunReport
+from utils.keywords import KeywordMatcher
+
 IN_PATH = Path("data/processed/speaker_blocks_with_sentiment.csv")
 
 ROLE_OUT = Path("data/processed/powerbi_role_level_metrics_v2.csv")
 CALL_OUT = Path("data/processed/powerbi_call_level_metrics_v2.csv")
+STATE_PATH = Path("data/processed/powerbi_refresh_state_v2.json")
+
+COLUMNS = [
+    "symbol", "company_name", "year", "quarter", "date", "speaker", "speaker_role",
+    "clean_text", "block_length", "sentiment_vader", "finbert_sentiment", "finbert_confidence"
+]
 
 # --- Stronger heuristics for finance earnings calls ---
 BANK_FIRMS = [
@@ -29,38 +44,33 @@ QA_CUES = [
     "thank you for taking", "i have a question"
 ]
 
-def finbert_to_score(label: str) -> int:
-    if label == "positive":
-        return 1
-    if label == "negative":
-        return -1
-    return 0
+# Each keyword set compiled once (same substring semantics as any(k in s ...))
+BANK_MATCH = KeywordMatcher(BANK_FIRMS)
+MGMT_MATCH = KeywordMatcher(MGMT_TITLES)
+OPERATOR_MATCH = KeywordMatcher(OPERATOR_WORDS)
+QA_MATCH = KeywordMatcher(QA_CUES)
 
 def looks_like_analyst(speaker: str, text: str) -> bool:
     s = (speaker or "").lower()
     t = (text or "").lower()
 
-    # Bank/firm name in speaker line (very common)
-    if any(f in s for f in BANK_FIRMS):
+    # Bank/firm name in speaker line (very common; also covers "Name - Firm")
+    if BANK_MATCH.search(s):
         return True
 
     # Analyst-y cues in the text
-    if any(cue in t for cue in QA_CUES) and len(t.split()) > 20:
-        return True
-
-    # Typical pattern: "Name - Firm"
-    if re.search(r"\s-\s", speaker or "") and any(f in s for f in BANK_FIRMS):
+    if QA_MATCH.search(t) and len(t.split()) > 20:
         return True
 
     return False
 
 def looks_like_management(speaker: str) -> bool:
     s = (speaker or "").lower()
-    return any(k in s for k in MGMT_TITLES)
+    return MGMT_MATCH.search(s)
 
 def looks_like_operator(speaker: str) -> bool:
     s = (speaker or "").lower()
-    return any(k in s for k in OPERATOR_WORDS)
+    return OPERATOR_MATCH.search(s)
 
 def detect_section(text: str) -> str:
     """
@@ -69,114 +79,129 @@ def detect_section(text: str) -> str:
     - otherwise Prepared Remarks
     """
     t = (text or "").lower()
-    if any(cue in t for cue in QA_CUES):
+    if QA_MATCH.search(t):
         return "Q&A"
     return "Prepared Remarks"
 
-if __name__ == "__main__":
-    if not IN_PATH.exists():
-        raise FileNotFoundError(f"Missing {IN_PATH}. Run merge first.")
-
-    df = pd.read_csv(IN_PATH)
-
-    # Ensure columns exist
-    for c in ["speaker", "clean_text", "speaker_role", "sentiment_vader", "finbert_sentiment", "finbert_confidence"]:
-        if c not in df.columns:
-            raise ValueError(f"Missing column: {c}")
-
-    # Normalize
-    df["clean_text"] = df["clean_text"].fillna("").astype(str)
-    df["sentiment_vader"] = pd.to_numeric(df["sentiment_vader"], errors="coerce").fillna(0.0)
-    df["finbert_confidence"] = pd.to_numeric(df["finbert_confidence"], errors="coerce").fillna(0.0)
-    df["finbert_score"] = df["finbert_sentiment"].astype(str).apply(finbert_to_score)
-
-    # --- relabel roles ---
-    new_roles = []
-    for sp, tx in zip(df["speaker"].astype(str), df["clean_text"]):
-        if looks_like_operator(sp):
-            new_roles.append("operator")
-        elif looks_like_management(sp):
-            new_roles.append("management")
-        elif looks_like_analyst(sp, tx):
-            new_roles.append("analyst")
-        else:
-            new_roles.append("other")
-
-    df["speaker_role_v2"] = new_roles
-
-    # --- detect section ---
-    df["section"] = df["clean_text"].apply(detect_section)
-
-    group_keys = ["symbol", "company_name", "year", "quarter", "date"]
-
-    # ROLE-LEVEL with section split
-    role_level = (
-        df.groupby(group_keys + ["speaker_role_v2", "section"])
-          .agg(
-              blocks=("clean_text", "count"),
-              avg_block_len=("block_length", "mean"),
-              vader_mean=("sentiment_vader", "mean"),
-              vader_median=("sentiment_vader", "median"),
-              finbert_mean=("finbert_score", "mean"),
-              finbert_pos=("finbert_sentiment", lambda x: (x == "positive").mean()),
-              finbert_neg=("finbert_sentiment", lambda x: (x == "negative").mean()),
-              finbert_neu=("finbert_sentiment", lambda x: (x == "neutral").mean()),
-              finbert_avg_conf=("finbert_confidence", "mean"),
-          )
-          .reset_index()
-    )
-
-    # CALL-LEVEL overall
-    call_level = (
-        df.groupby(group_keys)
-          .agg(
-              total_blocks=("clean_text", "count"),
-              avg_block_len=("block_length", "mean"),
-              vader_mean=("sentiment_vader", "mean"),
-              finbert_mean=("finbert_score", "mean"),
-              finbert_pos=("finbert_sentiment", lambda x: (x == "positive").mean()),
-              finbert_neg=("finbert_sentiment", lambda x: (x == "negative").mean()),
-              finbert_neu=("finbert_sentiment", lambda x: (x == "neutral").mean()),
-              finbert_avg_conf=("finbert_confidence", "mean"),
-          )
-          .reset_index()
-    )
-
-    # Management vs Analyst gap (v2)
-    pivot = role_level.pivot_table(
-        index=group_keys,
-        columns="speaker_role_v2",
-        values=["vader_mean", "finbert_mean"],
-        aggfunc="mean"
+def speaker_flags(speakers):
+    """
+    Operator / management / bank-firm flags per row. Speakers repeat across
+    many blocks, so each distinct speaker string is matched only once.
+    """
+    codes, uniques = pd.factorize(speakers, use_na_sentinel=False)
+    lowered = pd.Series(uniques, dtype=object).str.lower()
+    return {
+        "operator": OPERATOR_MATCH.contains(lowered).to_numpy()[codes],
+        "management": MGMT_MATCH.contains(lowered).to_numpy()[codes],
+        "bank": BANK_MATCH.contains(lowered).to_numpy()[codes],
+    }
+
+def relabel_roles_and_sections(speakers, texts):
+    """
+    Vectorized looks_like_* / detect_section over whole columns.
+    QA cues are scanned once and shared by the analyst rule and the section split.
+    """
+    flags = speaker_flags(speakers)
+    t = texts.str.lower()
+    qa = QA_MATCH.contains(t).to_numpy()
+    long_enough = (t.str.split().str.len() > 20).to_numpy()
+
+    roles = np.select(
+        [flags["operator"], flags["management"], flags["bank"] | (qa & long_enough)],
+        ["operator", "management", "analyst"],
+        default="other"
     )
+    sections = np.where(qa, "Q&A", "Prepared Remarks")
+    return roles, sections
 
-    pivot.columns = [f"{a}__{b}" for a, b in pivot.columns]
-    pivot = pivot.reset_index()
+def add_roles_and_sections(df):
+    """speaker_role_v2 + section columns (needs speaker and clean_text)."""
+    df["clean_text"] = df["clean_text"].fillna("").astype(str)
+    roles, sections = relabel_roles_and_sections(df["speaker"].astype(str), df["clean_text"])
+    df["speaker_role_v2"] = roles
+    df["section"] = sections
+    return df
 
-    if "vader_mean__management" in pivot.columns and "vader_mean__analyst" in pivot.columns:
-        pivot["vader_gap_mgmt_minus_analyst_v2"] = pivot["vader_mean__management"] - pivot["vader_mean__analyst"]
-    else:
-        pivot["vader_gap_mgmt_minus_analyst_v2"] = None
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Power BI tables with relabeled roles and sections (v2).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only recompute calls with rows appended since the last run.")
+    chunked_aggregation.add_arguments(parser)
+    args = parser.parse_args()
+    chunked_aggregation.check_arguments(parser, args)
+    report = RunReport("relabeled_roles_aggregation", vars(args))
+
+    if not storage.exists(IN_PATH):
+        raise FileNotFoundError(f"Missing {IN_PATH}. Run merge first.")
 
-    if "finbert_mean__management" in pivot.columns and "finbert_mean__analyst" in pivot.columns:
-        pivot["finbert_gap_mgmt_minus_analyst_v2"] = pivot["finbert_mean__management"] - pivot["finbert_mean__analyst"]
+    if args.chunked:
+        # Out of core: roles are relabeled chunk by chunk, then folded into per-group state
+        with report.stage("aggregate", reads=[IN_PATH]) as aggregate:
+            role_level, call_level, rows = chunked_aggregation.run(
+                IN_PATH, COLUMNS, ["speaker_role_v2", "section"], args,
+                transform=add_roles_and_sections, record=aggregate
+            )
+            call_level = add_role_gaps(call_level, role_level, "speaker_role_v2", aggfunc="mean", suffix="_v2")
+            aggregate.rows_out = len(role_level) + len(call_level)
+        touched, state = None, None
+        role_counts = role_level.groupby("speaker_role_v2")["blocks"].sum().sort_values(ascending=False, kind="stable")
+        section_counts = role_level.groupby("section")["blocks"].sum().sort_values(ascending=False, kind="stable")
     else:
-        pivot["finbert_gap_mgmt_minus_analyst_v2"] = None
-
-    call_level = call_level.merge(
-        pivot[group_keys + ["vader_gap_mgmt_minus_analyst_v2", "finbert_gap_mgmt_minus_analyst_v2"]],
-        on=group_keys,
-        how="left"
-    )
+        with report.stage("read", reads=[IN_PATH]) as read:
+            df, touched, state = incremental.read_changes(
+                IN_PATH, COLUMNS, STATE_PATH, [ROLE_OUT, CALL_OUT], args.incremental
+            )
+            read.rows_out = 0 if df is None else len(df)
+        if touched is not None and not touched:
+            state.save(STATE_PATH)
+            print("✅ No new rows since the last run, outputs are up to date.")
+            report.finish("up-to-date")
+            sys.exit(0)
+
+        aggregate = report.stage("aggregate")
+        aggregate.rows_in = len(df)
+
+        # Ensure columns exist
+        for c in ["speaker", "clean_text", "speaker_role", "sentiment_vader", "finbert_sentiment", "finbert_confidence"]:
+            if c not in df.columns:
+                raise ValueError(f"Missing column: {c}")
+
+        # Normalize + relabel roles + detect section
+        df = add_roles_and_sections(prepare(df))
+
+        # ROLE-LEVEL with section split
+        role_level, role_sums = role_level_metrics(df, ["speaker_role_v2", "section"])
+
+        # CALL-LEVEL overall
+        call_level = call_level_metrics(df, role_sums)
+
+        # Management vs Analyst gap (v2)
+        call_level = add_role_gaps(call_level, role_level, "speaker_role_v2", aggfunc="mean", suffix="_v2")
+
+        if touched is not None:
+            role_level = incremental.upsert(ROLE_OUT, role_level, touched, GROUP_KEYS + ["speaker_role_v2", "section"])
+            call_level = incremental.upsert(CALL_OUT, call_level, touched, GROUP_KEYS)
+
+        aggregate.rows_out = len(role_level) + len(call_level)
+        aggregate.stop()
+        role_counts = df["speaker_role_v2"].value_counts()
+        section_counts = df["section"].value_counts()
 
     ROLE_OUT.parent.mkdir(parents=True, exist_ok=True)
-    role_level.to_csv(ROLE_OUT, index=False)
-    call_level.to_csv(CALL_OUT, index=False)
+    with report.stage("write", rewrites=[ROLE_OUT, CALL_OUT]) as write:
+        role_level.to_csv(ROLE_OUT, index=False)
+        call_level.to_csv(CALL_OUT, index=False)
+        write.rows_in = write.rows_out = len(role_level) + len(call_level)
+    if state is not None:
+        state.save(STATE_PATH)
+    else:
+        STATE_PATH.unlink(missing_ok=True)      # the next --incremental run starts from a full build
 
-    print("✅ Relabeled roles distribution (v2):")
-    print(df["speaker_role_v2"].value_counts().to_string())
+    print("✅ Relabeled roles distribution (v2" + (", touched calls" if touched else "") + "):")
+    print(role_counts.to_string())
     print("\n✅ Section distribution:")
-    print(df["section"].value_counts().to_string())
+    print(section_counts.to_string())
 
     print("\nSaved ->", ROLE_OUT.resolve())
-    print("Saved ->", CALL_OUT.resolve())
\ No newline at end of file
+    print("Saved ->", CALL_OUT.resolve())
+    report.finish()
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Batch planning for transformer inference over variable-length texts.
+
+Every batch is padded to its longest member, so packing rows of similar
+length together (and sizing batches by tokens instead of rows) removes most
+of the padding work. Planners return lists of row indices; callers run the
+batches in any order and scatter results back by index.
+"""
+
+def fixed_batches(n_rows, batch_size):
+    """Contiguous slices of `batch_size` rows in input order (the old behaviour)."""
+    return [list(range(i, min(i + batch_size, n_rows))) for i in range(0, n_rows, batch_size)]
+
+def token_budget_batches(lengths, token_budget, max_batch_size=None):
+    """
+    Sort rows by token length (longest first) and greedily pack them so that
+    rows_in_batch * longest_in_batch stays within `token_budget`.
+
+    A single row longer than the budget still gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+
+    batches = []
+    current = []
+    current_max = 0
+    for i in order:
+        longest = max(current_max, lengths[i])
+        too_many_tokens = longest * (len(current) + 1) > token_budget
+        too_many_rows = max_batch_size is not None and len(current) >= max_batch_size
+        if current and (too_many_tokens or too_many_rows):
+            batches.append(current)
+            current = []
+            longest = lengths[i]
+        current.append(i)
+        current_max = longest
+
+    if current:
+        batches.append(current)
+    return batches
+
+def padding_stats(batches, lengths):
+    """Real tokens vs padded token slots for a batch plan."""
+    real = 0
+    slots = 0
+    for batch in batches:
+        batch_lengths = [lengths[i] for i in batch]
+        real += sum(batch_lengths)
+        slots += len(batch_lengths) * max(batch_lengths)
+    return {
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_slots": slots,
+        "padding_ratio": 1 - real / slots if slots else 0.0,
+    }
@@ -0,0 +1,98 @@
+"""
+ONNX Runtime backend for FinBERT on CPU.
+
+The torch model is exported to ONNX once (ONNX_DIR, keyed by the weights
+revision that sentiment_finbert.load_model puts on `model.revision`) and,
+for "onnx-int8", a dynamically int8-quantized copy is written next to it.
+OnnxFinBERT stands in for the torch model in
+sentiment_finbert.finbert_predict_inputs: it is called with the tokenizer's
+tensors and returns an object with `.logits`, so batching, caching and
+checkpointing don't change.
+
+Needs `onnxruntime` and `onnx` (only imported when an ONNX backend is used).
+"""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import torch
+
+ONNX_DIR = Path("data/models/finbert_onnx")
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+OPSET = 14
+
+class _LogitsOnly(torch.nn.Module):
+    """Plain-tensor forward for the exporter (no ModelOutput)."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(
+            input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+        ).logits
+
+def export_onnx(model, path):
+    """Export with dynamic batch and sequence axes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dummy = tuple(torch.ones((2, 8), dtype=torch.long) for _ in INPUT_NAMES)
+    axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES}
+    axes["logits"] = {0: "batch"}
+
+    wrapper = _LogitsOnly(model.cpu()).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper, dummy, str(path),
+            input_names=INPUT_NAMES,
+            output_names=["logits"],
+            dynamic_axes=axes,
+            opset_version=OPSET,
+        )
+
+def quantize_onnx(fp32_path, int8_path):
+    """Dynamic quantization: int8 weights, activations quantized at run time."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+class OnnxFinBERT:
+    def __init__(self, path, config, backend, revision, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.config = config
+        self.revision = revision    # cache_namespace keys the cache on this
+        self.backend = backend
+
+    def __call__(self, **inputs):
+        feed = {}
+        for name in self.input_names:
+            if name in inputs:
+                feed[name] = inputs[name].cpu().numpy()
+            else:
+                feed[name] = torch.zeros_like(inputs["input_ids"]).cpu().numpy()
+        logits = self.session.run(["logits"], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+def load_onnx_model(model, quantize=False, threads=None):
+    """Export (and quantize) on first use, then open an ONNX Runtime session."""
+    revision = model.revision    # commit hash or "sd-" weights digest, see sentiment_finbert.weights_revision
+    fp32_path = ONNX_DIR / f"finbert-{revision[:12]}.onnx"
+    int8_path = ONNX_DIR / f"finbert-{revision[:12]}-int8.onnx"
+
+    if not fp32_path.exists():
+        print(f"📦 Exporting FinBERT to ONNX -> {fp32_path}")
+        export_onnx(model, fp32_path)
+    if quantize and not int8_path.exists():
+        print(f"📦 Quantizing to int8 -> {int8_path}")
+        quantize_onnx(fp32_path, int8_path)
+
+    if quantize:
+        return OnnxFinBERT(int8_path, model.config, "onnx-int8", revision, threads)
+    return OnnxFinBERT(fp32_path, model.config, "onnx", revision, threads)
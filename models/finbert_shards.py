@@ -0,0 +1,239 @@
+"""
+Sharded FinBERT scoring (`sentiment_finbert.py --shards N`).
+
+The input is split once into N contiguous row ranges (recorded in a
+manifest, so resumes see the same split). Each range is scored by its own
+worker process with its own torch thread count, output file and byte-offset
+checkpoint under the profile's SHARD_DIR; a crashed or interrupted worker
+resumes from its own checkpoint without touching the others. When every
+shard is complete the outputs are concatenated in shard order, which is
+input order, into the profile's normal FinBERT output.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from models import sentiment_finbert as fb
+from utils import storage
+from utils.checkpoint import Checkpoint, reconcile_output
+from utils.instrument import TimedModel
+
+SHARD_DIR = Path("data/processed/finbert_shards")
+MERGE_ROWS = 50_000
+
+def shard_dir(profile="full"):
+    return storage.profile_path(SHARD_DIR, profile)
+
+def manifest_path(shards_dir):
+    return shards_dir / "manifest.json"
+
+def shard_paths(shards_dir, shard):
+    return shards_dir / f"shard-{shard:03d}.csv", shards_dir / f"shard-{shard:03d}.ckpt"
+
+def load_plan(n_shards, in_path, shards_dir):
+    """Reuse the manifest from an earlier run, or split the input now."""
+    manifest = manifest_path(shards_dir)
+    if manifest.exists():
+        plan = json.loads(manifest.read_text())
+        if plan["shards"] != n_shards or plan["format"] != storage.STORAGE_FORMAT:
+            raise SystemExit(
+                f"{manifest} was made for {plan['shards']} {plan['format']} shards. "
+                f"Rerun with --shards {plan['shards']}, or delete {shards_dir} to start over."
+            )
+        return plan
+
+    ranges, input_size = storage.split_rows(in_path, n_shards)
+    plan = {
+        "shards": n_shards,
+        "format": storage.STORAGE_FORMAT,
+        "input_size": input_size,
+        "ranges": [list(r) for r in ranges],
+    }
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    manifest.write_text(json.dumps(plan))
+    return plan
+
+def shard_done(shards_dir, shard, row_start, row_end):
+    _, ckpt_path = shard_paths(shards_dir, shard)
+    return row_end <= row_start or Checkpoint.load(ckpt_path).rows >= row_end
+
+def score_shard(shard, row_start, row_end, byte_start, options):
+    """
+    Worker process: score rows [row_start, row_end) with its own checkpoint.
+    Returns (shard, model batch latencies in seconds) for the run report.
+    """
+    import torch
+    from transformers import AutoTokenizer
+    from models.sentiment_cache import SentimentCache
+    from utils.near_duplicates import Propagation
+
+    torch.set_num_threads(options["threads"])
+    out_path, ckpt_path = shard_paths(options["shard_dir"], shard)
+
+    ckpt = reconcile_output(Checkpoint.load(ckpt_path), storage.dataset_path(out_path))
+    if ckpt.rows < row_start:
+        # Fresh shard (or its output went missing): start at the range start
+        storage.remove(out_path)
+        ckpt = Checkpoint(row_start, byte_start)
+
+    device = torch.device("cpu")
+    tokenizer = AutoTokenizer.from_pretrained(fb.MODEL_NAME)
+    latencies = []
+    model = TimedModel(fb.load_model(device, options["backend"]), latencies.append)
+    cache = None
+    if not options["no_cache"]:
+        cache = SentimentCache(fb.cache_namespace(model, options["long_blocks"], options["window_agg"]))
+    # Members whose representative is in an earlier shard are scored here
+    dedup = None
+    if options["dedup"]:
+        dedup = Propagation(options["in_path"], first_row=row_start, summary=options["dedup_summary"])
+    if dedup is not None and ckpt.rows > row_start:
+        dedup.preload(out_path)
+
+    first_write = not storage.exists(out_path)
+    remaining = row_end - ckpt.rows
+    for chunk, in_offset in storage.iter_chunks(options["in_path"], fb.CHUNK_ROWS, ckpt):
+        if remaining <= 0:
+            break
+        chunk = chunk.iloc[:remaining].copy()
+        texts = chunk["clean_text"].fillna("").astype(str).tolist()
+        if dedup is not None:
+            texts = dedup.skip(chunk, texts)
+        labels_out, confs_out = fb.finbert_score_texts(
+            texts, tokenizer, model, device, scheduler=options["scheduler"], cache=cache,
+            long_blocks=options["long_blocks"], window_agg=options["window_agg"]
+        )
+        if dedup is not None:
+            labels_out, confs_out = dedup.fill(chunk, labels_out, confs_out)
+        chunk["finbert_sentiment"] = labels_out
+        chunk["finbert_confidence"] = confs_out
+
+        out_offset = storage.write_chunk(chunk, out_path, part=ckpt.rows, header=first_write)
+        first_write = False
+
+        # in_offset is only wrong for a chunk cut at row_end, and the shard is done then
+        ckpt = ckpt.advance(len(chunk), in_offset, out_offset)
+        ckpt.save(ckpt_path)
+        remaining -= len(chunk)
+        print(f"✅ [shard {shard}] rows {ckpt.rows - row_start}/{row_end - row_start}", flush=True)
+
+    if dedup is not None:
+        print(f"[shard {shard}] {dedup.report()}", flush=True)
+    return shard, latencies
+
+def merge_shards(plan, shards_dir, final_path):
+    """Concatenate shard outputs in shard order into `final_path`; returns (rows, out_offset)."""
+    rows = 0
+    out_offset = None
+    first_write = True
+    for shard, (row_start, row_end, _) in enumerate(plan["ranges"]):
+        out_path, _ = shard_paths(shards_dir, shard)
+        if row_end == row_start or not storage.exists(out_path):
+            continue
+
+        if storage.STORAGE_FORMAT == "parquet":
+            for chunk, _ in storage.iter_chunks(out_path, MERGE_ROWS, Checkpoint()):
+                storage.write_chunk(chunk, final_path, part=rows, header=first_write)
+                rows += len(chunk)
+        else:
+            # Plain byte copy (minus repeated headers) keeps the CSV exactly as written
+            with open(out_path, "rb") as src, open(final_path, "ab") as dst:
+                header = src.readline()
+                if first_write:
+                    dst.write(header)
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+                out_offset = dst.tell()
+            rows += row_end - row_start
+        first_write = False
+    return rows, out_offset
+
+def run_sharded(args, in_path, report):
+    out_path = storage.profile_path(fb.OUT_PATH, args.profile)
+    ckpt_path = storage.profile_path(fb.CHECKPOINT_PATH, args.profile)
+    shards_dir = shard_dir(args.profile)
+    if storage.exists(out_path) and not manifest_path(shards_dir).exists():
+        raise SystemExit(
+            f"{storage.dataset_path(out_path)} already exists. "
+            "Delete it (and the FinBERT checkpoint) to rebuild with --shards."
+        )
+
+    dedup_summary = None
+    if args.dedup:
+        # Checked (and the input hashed) once here rather than in every worker
+        from utils.near_duplicates import load_summary
+        dedup_summary = load_summary(in_path)
+    plan = load_plan(args.shards, in_path, shards_dir)
+    threads = args.threads_per_shard or max(1, (os.cpu_count() or 1) // args.shards)
+    options = {
+        "in_path": in_path,
+        "shard_dir": shards_dir,
+        "threads": threads,
+        "scheduler": args.scheduler,
+        "backend": args.backend,
+        "long_blocks": args.long_blocks,
+        "window_agg": args.window_agg,
+        "no_cache": args.no_cache,
+        "dedup": args.dedup,
+        "dedup_summary": dedup_summary,
+    }
+
+    todo = [
+        (shard, *rng) for shard, rng in enumerate(plan["ranges"])
+        if not shard_done(shards_dir, shard, rng[0], rng[1])
+    ]
+    print(
+        f"▶️ FinBERT sharded: {args.shards} shards x {threads} threads, "
+        f"{len(todo)} to run, {args.shards - len(todo)} already complete"
+    )
+
+    failed = []
+    scoring = report.stage("shards", reads=[in_path])
+    if todo:
+        # spawn: forking a process that already loaded torch isn't safe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(todo), mp_context=context) as pool:
+            futures = {pool.submit(score_shard, *job, options): job[0] for job in todo}
+            try:
+                for future in as_completed(futures):
+                    shard = futures[future]
+                    try:
+                        _, latencies = future.result()
+                        report.latency("finbert_batch", *latencies)
+                        row_start, row_end, _ = plan["ranges"][shard]
+                        scoring.chunk(row_end - row_start)
+                        print(f"🏁 shard {shard} complete")
+                    except Exception as e:
+                        failed.append(shard)
+                        print(f"❌ shard {shard} failed: {e!r}")
+            except KeyboardInterrupt:
+                print("\n🛑 Stopped by user (CTRL+C). Each shard resumes from its own checkpoint.")
+                pool.shutdown(cancel_futures=True)
+                report.finish("interrupted")
+                sys.exit(0)
+
+    if failed:
+        raise SystemExit(
+            f"Shards {failed} failed; rerun with --shards {args.shards} to resume them "
+            "(completed shards are not re-scored)."
+        )
+
+    scoring.stop()
+
+    storage.remove(out_path)      # partial output of an interrupted merge
+    with report.stage("merge", writes=[out_path]) as merging:
+        rows, out_offset = merge_shards(plan, shards_dir, out_path)
+        merging.chunk(rows)
+
+    # Leave a finished single-run checkpoint so a plain rerun has nothing to do
+    Checkpoint(rows, plan["input_size"], out_offset).save(ckpt_path)
+    shutil.rmtree(shards_dir)
+    print(f"🧩 Merged {args.shards} shards -> {rows} rows in input order")
+    print("🎉 DONE. Saved ->", storage.dataset_path(out_path).resolve())
+    report.finish()
@@ -0,0 +1,129 @@
+"""
+Persistent sentiment cache shared by the VADER and FinBERT scorers.
+
+Entries are keyed by a hash of the model namespace (name/version/MAX_LEN...)
+plus the exact clean_text, so boilerplate blocks that repeat across calls and
+rows already scored by an earlier (partial) run are looked up instead of
+re-scored. The SQLite file is capped at MAX_ENTRIES rows; the least recently
+used entries are evicted first. Rows are counted once on open and then kept
+as a running count, so puts don't pay for a COUNT(*) over millions of rows;
+only when the running count passes the cap is the table counted again (other
+processes write to it too) and trimmed to EVICT_TO of the cap.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+CACHE_PATH = Path("data/processed/sentiment_cache.sqlite")
+MAX_ENTRIES = 5_000_000
+SQL_BATCH = 500          # keys per IN (...) query, below SQLite's variable limit
+EVICT_TO = 0.9           # share of max_entries left after an eviction
+
+class SentimentCache:
+    def __init__(self, namespace, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.namespace = namespace
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # VADER and FinBERT may run at the same time against the same file
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key BLOB PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " last_used INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores(last_used)")
+        self.conn.commit()
+        (self.count,) = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+
+    def key(self, text):
+        payload = f"{self.namespace}\x00{text}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def get_many(self, texts):
+        """Return cached values aligned with `texts` (None for misses)."""
+        keys = [self.key(t) for t in texts]
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), SQL_BATCH):
+            part = unique[i:i + SQL_BATCH]
+            marks = ",".join("?" * len(part))
+            rows = self.conn.execute(
+                f"SELECT key, value FROM scores WHERE key IN ({marks})", part
+            ).fetchall()
+            found.update((k, json.loads(v)) for k, v in rows)
+
+        if found:
+            now = time.time_ns()
+            self.conn.executemany(
+                "UPDATE scores SET last_used = ? WHERE key = ?",
+                [(now, k) for k in found]
+            )
+            self.conn.commit()
+
+        values = [found.get(k) for k in keys]
+        hits = sum(v is not None for v in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    def put_many(self, texts, values):
+        now = time.time_ns()
+        cur = self.conn.executemany(
+            "INSERT OR REPLACE INTO scores (key, value, last_used) VALUES (?, ?, ?)",
+            [(self.key(t), json.dumps(v), now) for t, v in zip(texts, values)]
+        )
+        self.conn.commit()
+        # Replaced rows count as added too: an overestimate only brings the exact count forward
+        self.count += max(cur.rowcount, 0)
+        if self.count > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+        excess = count - int(self.max_entries * EVICT_TO) if count > self.max_entries else 0
+        if excess > 0:
+            cur = self.conn.execute(
+                "DELETE FROM scores WHERE key IN "
+                "(SELECT key FROM scores ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            self.conn.commit()
+            count -= max(cur.rowcount, 0)
+        self.count = count
+
+    def cached_call(self, texts, compute):
+        """
+        Look `texts` up, run `compute(list_of_missing_texts)` once on the
+        distinct misses, store the new values and return all values in order.
+        """
+        values = self.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, values) if v is None))
+        if missing:
+            computed = dict(zip(missing, compute(missing)))
+            self.put_many(missing, [computed[t] for t in missing])
+            values = [computed[t] if v is None else v for t, v in zip(texts, values)]
+        return values
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        return (
+            f"🗃️ Cache [{self.namespace}]: {self.hits} hits / {self.misses} misses "
+            f"({self.hit_rate():.1%} hit rate)"
+        )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,176 @@
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import sys
+import torch
+from transformers import AutoTokenizer
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from models import sentiment_finbert as fb
+from models import sentiment_vader as vd
+from models.sentiment_cache import SentimentCache
+from utils import storage
+from utils.checkpoint import Checkpoint, reconcile_output
+from utils.instrument import RunReport, byte_delta
+from utils.near_duplicates import Propagation
+
+# Single pass over the cleaned blocks: VADER runs in a process pool while the
+# FinBERT batches for the same chunk go through the model on the main thread.
+# Writes the merged file directly, replacing sentiment_vader.py +
+# sentiment_finbert.py + merge_sentiments.py.
+
+IN_PATH = Path("data/processed/speaker_blocks_cleaned.csv")
+OUT_PATH = Path("data/processed/speaker_blocks_with_sentiment.csv")
+CHECKPOINT_PATH = Path("data/processed/sentiment_checkpoint.txt")
+
+CHUNK_ROWS = 2000
+VADER_WORKERS = 2        # leave the rest of the cores to torch
+
+def submit_vader(pool, texts, cache, workers, engine=vd.ENGINE):
+    """
+    Start VADER for one chunk on the pool and return a function that waits
+    for it and returns compound scores in input order (blank texts -> 0.0).
+
+    Cache lookups/stores happen here in the main process; only distinct
+    misses are shipped to the workers, split into `workers` slices.
+    """
+    rows = [i for i, t in enumerate(texts) if t.strip()]
+    todo = [texts[i] for i in rows]
+    cached = cache.get_many(todo) if cache is not None else [None] * len(todo)
+    missing = list(dict.fromkeys(t for t, v in zip(todo, cached) if v is None))
+
+    step = max(1, -(-len(missing) // workers))
+    jobs = [
+        (missing[i:i + step], pool.submit(vd.vader_score_texts, missing[i:i + step], None, engine))
+        for i in range(0, len(missing), step)
+    ]
+
+    def collect():
+        computed = {}
+        for part, future in jobs:
+            computed.update(zip(part, future.result()))
+        if cache is not None and missing:
+            cache.put_many(missing, [computed[t] for t in missing])
+
+        scores = [0.0] * len(texts)
+        for i, t, v in zip(rows, todo, cached):
+            scores[i] = computed[t] if v is None else v
+        return scores
+
+    return collect
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score speaker blocks with VADER and FinBERT in one pass.")
+    parser.add_argument("--scheduler", choices=["token_budget", "fixed"], default=fb.SCHEDULER)
+    parser.add_argument("--backend", choices=fb.BACKENDS, default=fb.BACKEND)
+    parser.add_argument("--long-blocks", choices=["truncate", "window"], default=fb.LONG_BLOCKS)
+    parser.add_argument("--window-agg", choices=["mean", "length"], default=fb.WINDOW_AGG)
+    parser.add_argument("--vader-workers", type=int, default=VADER_WORKERS)
+    parser.add_argument("--vader-engine", choices=vd.ENGINES, default=vd.ENGINE)
+    parser.add_argument("--no-cache", action="store_true", help="Score every row, skip the sentiment cache.")
+    parser.add_argument("--profile", choices=storage.CLEANING_PROFILES, default="full",
+                        help="Cleaned input to score (see etl/preprocess_speaker_blocks.py --profiles).")
+    parser.add_argument("--dedup", action="store_true",
+                        help="FinBERT scores one block per near-duplicate cluster (etl/dedup_blocks.py).")
+    args = parser.parse_args()
+    report = RunReport("sentiment_combined", vars(args))
+
+    IN_PATH = storage.cleaned_path(args.profile)
+    if not storage.exists(IN_PATH):
+        raise FileNotFoundError(f"Missing {IN_PATH}. Run preprocessing first.")
+    # The output is the merged file the aggregations read, so it keeps its name; the checkpoint
+    # is per profile, so a run on another profile stops at the existing output instead of resuming
+    CHECKPOINT_PATH = storage.profile_path(CHECKPOINT_PATH, args.profile)
+
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    # Resume support (byte offsets into input and output)
+    ckpt = reconcile_output(Checkpoint.load(CHECKPOINT_PATH), storage.dataset_path(OUT_PATH))
+
+    if ckpt.rows == 0 and storage.exists(OUT_PATH):
+        print("⚠️ Output file already exists and checkpoint is 0.")
+        print(f"   Delete {storage.dataset_path(OUT_PATH)} if you want a clean rebuild.")
+        print(f"   OR delete {CHECKPOINT_PATH} to force rebuild.")
+        raise SystemExit("Stopping to prevent duplicate append. Clean the output/checkpoint and rerun.")
+
+    dedup = Propagation(IN_PATH) if args.dedup else None
+    if dedup is not None and ckpt.rows:
+        dedup.preload(OUT_PATH)
+
+    device = torch.device("cuda" if torch.cuda.is_available() and args.backend == "torch" else "cpu")
+    print("Using device:", device)
+    print(
+        f"▶️ VADER + FinBERT starting from row {ckpt.rows} "
+        f"(scheduler={args.scheduler}, backend={args.backend}, vader_workers={args.vader_workers})"
+    )
+
+    tokenizer = AutoTokenizer.from_pretrained(fb.MODEL_NAME)
+    model = report.timed(
+        fb.load_model(device, args.backend), "finbert_batch",
+        sync=torch.cuda.synchronize if device.type == "cuda" else None
+    )
+
+    vader_cache = None if args.no_cache else SentimentCache(vd.cache_namespace(args.vader_engine))
+    finbert_cache = None if args.no_cache else SentimentCache(
+        fb.cache_namespace(model, args.long_blocks, args.window_agg)
+    )
+    window_stats = Counter()
+
+    first_write = not storage.exists(OUT_PATH)
+
+    score = report.stage("score", reads=[IN_PATH], writes=[OUT_PATH])
+    with ProcessPoolExecutor(max_workers=args.vader_workers) as pool:
+        try:
+            for chunk, in_offset in storage.iter_chunks(IN_PATH, CHUNK_ROWS, ckpt):
+                chunk["clean_text"] = chunk["clean_text"].fillna("").astype(str)
+                texts = chunk["clean_text"].tolist()
+
+                # VADER runs in the pool while FinBERT works on the same chunk
+                vader_scores = submit_vader(pool, texts, vader_cache, args.vader_workers, args.vader_engine)
+                labels_out, confs_out = fb.finbert_score_texts(
+                    dedup.skip(chunk, texts) if dedup is not None else texts, tokenizer, model, device,
+                    scheduler=args.scheduler, cache=finbert_cache,
+                    long_blocks=args.long_blocks, window_agg=args.window_agg, stats=window_stats
+                )
+                if dedup is not None:
+                    labels_out, confs_out = dedup.fill(chunk, labels_out, confs_out)
+
+                chunk["sentiment_vader"] = vader_scores()
+                chunk["finbert_sentiment"] = labels_out
+                chunk["finbert_confidence"] = confs_out
+
+                out_offset = storage.write_chunk(chunk, OUT_PATH, part=ckpt.rows, header=first_write)
+                first_write = False
+                score.chunk(
+                    len(chunk),
+                    bytes_read=byte_delta(in_offset, ckpt.in_offset),
+                    bytes_written=byte_delta(out_offset, ckpt.out_offset)
+                )
+
+                # Advance the checkpoint only after the chunk is on disk
+                ckpt = ckpt.advance(len(chunk), in_offset, out_offset)
+                ckpt.save(CHECKPOINT_PATH)
+                print(f"✅ VADER + FinBERT processed rows: {ckpt.rows}")
+
+        except KeyboardInterrupt:
+            print("\n🛑 Stopped by user (CTRL+C).")
+            print(f"✅ Progress saved. Next run will resume from row {ckpt.rows}.")
+            pool.shutdown(cancel_futures=True)
+            report.finish("interrupted")
+            sys.exit(0)
+
+    score.stop()
+
+    for name, cache in [("vader", vader_cache), ("finbert", finbert_cache)]:
+        if cache is not None:
+            print(cache.summary())
+            report.note(**{f"{name}_cache_hits": cache.hits, f"{name}_cache_misses": cache.misses})
+    if args.long_blocks == "window":
+        print(fb.window_report(window_stats))
+        report.note(windows=dict(window_stats))
+    if dedup is not None:
+        print(dedup.report())
+        report.note(dedup_propagated=dedup.propagated)
+    print("🎉 DONE. Saved ->", storage.dataset_path(OUT_PATH).resolve())
+    report.finish()
@@ -1,9 +1,26 @@
-import pandas as pd
+import numpy as np
 from pathlib import Path
+import argparse
 import sys
+import copy
+import hashlib
+import itertools
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from models.batching import fixed_batches, token_budget_batches
+from models.sentiment_cache import SentimentCache
+from utils import storage
+from utils.checkpoint import Checkpoint, reconcile_output
+from utils.instrument import RunReport, byte_delta
+from utils.near_duplicates import Propagation
+from utils.stages import DONE, Stage, StageQueue, run_in_thread, stage_report
+
 IN_PATH = Path("data/processed/speaker_blocks_cleaned.csv")
 OUT_PATH = Path("data/processed/speaker_blocks_with_finbert.csv")
 CHECKPOINT_PATH = Path("data/processed/finbert_checkpoint.txt")
@@ -12,9 +29,30 @@ MODEL_NAME = "ProsusAI/finbert"
 LABELS = ["negative", "neutral", "positive"]
 
 CHUNK_ROWS = 500         # read CSV in chunks
+QUEUE_DEPTH = 2          # chunks buffered between pipeline stages
+TOKENIZER_WORKERS = 2
 BATCH_SIZE = 16          # CPU-safe
 MAX_LEN = 256            # keep smaller for speed
 
+# "token_budget": sort each chunk by token length and pack batches up to
+# TOKEN_BUDGET padded tokens; "fixed": the original reference batching, the
+# non-blank rows of each BATCH_SIZE-row slice of the chunk in one batch.
+SCHEDULER = "token_budget"
+TOKEN_BUDGET = BATCH_SIZE * MAX_LEN   # same peak memory as a full fixed batch
+MAX_BATCH_ROWS = 128
+
+# "torch": eager PyTorch; "onnx" / "onnx-int8": ONNX Runtime on CPU
+# (fp32 / dynamically quantized int8), see models/finbert_onnx.py
+BACKEND = "torch"
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+# Blocks longer than MAX_LEN tokens: "truncate" scores the first MAX_LEN only;
+# "window" scores overlapping MAX_LEN windows and aggregates their probabilities
+# ("mean", or "length" = weighted by tokens per window).
+LONG_BLOCKS = "truncate"
+WINDOW_OVERLAP = 64      # tokens shared by consecutive windows
+WINDOW_AGG = "mean"
+
 def finbert_predict_batch(texts, tokenizer, model, device):
     # Tokenize
     inputs = tokenizer(
@@ -23,152 +61,403 @@ def finbert_predict_batch(texts, tokenizer, model, device):
         truncation=True,
         padding=True,
         max_length=MAX_LEN
-    ).to(device)
+    )
+    return finbert_predict_inputs(inputs, model, device)
 
+def finbert_predict_probs(inputs, model, device):
+    inputs = inputs.to(device)
     with torch.no_grad():
         outputs = model(**inputs)
-        probs = torch.softmax(outputs.logits, dim=1)
+        return torch.softmax(outputs.logits, dim=1)
+
+def finbert_predict_inputs(inputs, model, device):
+    probs = finbert_predict_probs(inputs, model, device)
 
     conf, idx = torch.max(probs, dim=1)
     labels = [LABELS[i] for i in idx.cpu().numpy().tolist()]
     confs = conf.cpu().numpy().tolist()
     return labels, confs
 
-if __name__ == "__main__":
-    if not IN_PATH.exists():
-        raise FileNotFoundError(f"Missing {IN_PATH}. Run preprocessing first.")
-
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    # Resume support
-    start_row = 0
-    if CHECKPOINT_PATH.exists():
-        val = CHECKPOINT_PATH.read_text().strip()
-        if val.isdigit():
-            start_row = int(val)
-
-    if start_row > 0 and not OUT_PATH.exists():
-        print("⚠️ Checkpoint exists but output file missing. Restarting from 0.")
-        start_row = 0
-
-    if start_row == 0 and OUT_PATH.exists():
-        print("⚠️ Output file already exists and checkpoint is 0.")
-        print("   Delete data/processed/speaker_blocks_with_finbert.csv if you want a clean rebuild.")
-        print("   OR delete data/processed/finbert_checkpoint.txt to force rebuild.")
-        raise SystemExit("Stopping to prevent duplicate append. Clean the output/checkpoint and rerun.")
-
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print("Using device:", device)
-    print(f"▶️ FinBERT starting from row {start_row}")
-
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+def plan_batches(lengths, scheduler=SCHEDULER):
+    if scheduler == "fixed":
+        return fixed_batches(len(lengths), BATCH_SIZE)
+    return token_budget_batches(lengths, TOKEN_BUDGET, MAX_BATCH_ROWS)
+
+def encode_texts(texts, tokenizer, long_blocks=LONG_BLOCKS):
+    """
+    Tokenize distinct texts in one batch call (no padding).
+
+    Returns {text: [features per window]}; "truncate" gives every text a
+    single window.
+    """
+    texts = list(dict.fromkeys(texts))
+    if long_blocks == "window":
+        enc = tokenizer(
+            texts,
+            truncation=True,
+            max_length=MAX_LEN,
+            stride=WINDOW_OVERLAP,
+            return_overflowing_tokens=True
+        )
+        owners = enc.pop("overflow_to_sample_mapping")
+    else:
+        enc = tokenizer(texts, truncation=True, max_length=MAX_LEN)
+        owners = range(len(texts))
+
+    keys = list(enc.keys())
+    encoded = {}
+    for w, owner in enumerate(owners):
+        encoded.setdefault(texts[owner], []).append({k: enc[k][w] for k in keys})
+    return encoded
+
+def finbert_score_texts(texts, tokenizer, model, device, scheduler=SCHEDULER, cache=None,
+                        long_blocks=LONG_BLOCKS, window_agg=WINDOW_AGG, stats=None, encoded=None):
+    """
+    Score a chunk of texts, returning labels/confidences in input order.
+
+    Blank texts are forced to neutral with 0.0 confidence. With a `cache`,
+    only texts not scored before (under this model/MAX_LEN) reach the model.
+    In "window" mode, window counts of every non-blank text (cache hits
+    included) are added to `stats` (a Counter). The "fixed" scheduler
+    scores each BATCH_SIZE-row slice of `texts` on its own, so its batches
+    line up with the rows exactly as they always did.
+    `encoded` is an optional encode_texts() result computed ahead of time.
+    """
+    labels_out = ["neutral"] * len(texts)
+    confs_out = [0.0] * len(texts)
+
+    rows = [i for i, t in enumerate(texts) if t.strip()]
+    if not rows:
+        return labels_out, confs_out
+
+    if long_blocks == "window" and stats is not None:
+        if encoded is None:
+            encoded = encode_texts([texts[i] for i in rows], tokenizer, "window")
+        count_windows(stats, [encoded[texts[i]] for i in rows])
+
+    def score(batch_texts):
+        if long_blocks == "window":
+            return finbert_score_windows(batch_texts, tokenizer, model, device, scheduler, window_agg, encoded)
+        return finbert_score_nonblank(batch_texts, tokenizer, model, device, scheduler, encoded)
+
+    if scheduler == "fixed":
+        groups = [list(g) for _, g in itertools.groupby(rows, key=lambda i: i // BATCH_SIZE)]
+    else:
+        groups = [rows]
+
+    for group in groups:
+        todo = [texts[i] for i in group]
+        preds = cache.cached_call(todo, score) if cache is not None else score(todo)
+        for i, (lab, cf) in zip(group, preds):
+            labels_out[i] = lab
+            confs_out[i] = cf
+
+    return labels_out, confs_out
+
+def finbert_score_nonblank(texts, tokenizer, model, device, scheduler=SCHEDULER, encoded=None):
+    """
+    Model pass over non-blank texts: the chunk is tokenized once (no padding),
+    batches are planned by `scheduler`, padded per batch and scattered back
+    by row index. Returns [label, confidence] pairs in input order.
+    """
+    preds = [None] * len(texts)
+
+    if encoded is None:
+        encoded = encode_texts(texts, tokenizer, "truncate")
+    features = [encoded[t][0] for t in texts]
+    lengths = [len(f["input_ids"]) for f in features]
+
+    for batch in plan_batches(lengths, scheduler):
+        inputs = tokenizer.pad([features[j] for j in batch], return_tensors="pt")
+        pred_labels, pred_confs = finbert_predict_inputs(inputs, model, device)
+
+        for j, lab, cf in zip(batch, pred_labels, pred_confs):
+            preds[j] = [lab, cf]
+
+    return preds
+
+def weights_revision(model):
+    """
+    The Hub commit of the weights or, for local / offline checkpoints without
+    one, a digest of the config and every weight tensor, so different weights
+    never share an ONNX export or a cache namespace.
+    """
+    commit = getattr(model.config, "_commit_hash", None)
+    if commit:
+        return commit
+    h = hashlib.blake2b(digest_size=16)
+    config = {k: v for k, v in model.config.to_dict().items() if k != "transformers_version"}
+    h.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    for name, tensor in model.state_dict().items():
+        h.update(name.encode("utf-8"))
+        h.update(tensor.detach().cpu().contiguous().flatten().view(torch.uint8).numpy().tobytes())
+    return "sd-" + h.hexdigest()
+
+def load_model(device, backend=BACKEND):
+    """Torch model on `device`, or an ONNX Runtime stand-in for it (CPU only)."""
     model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).to(device)
     model.eval()
-
-    total_processed = start_row
-    first_write = not OUT_PATH.exists()
-
-    reader = pd.read_csv(IN_PATH, chunksize=CHUNK_ROWS)
-
-    # Skip already processed rows (chunk skipping)
-    rows_to_skip = start_row
-    while rows_to_skip > 0:
-        try:
-            chunk = next(reader)
-        except StopIteration:
-            print("✅ Nothing left to process.")
-            raise SystemExit(0)
-
-        if len(chunk) <= rows_to_skip:
-            rows_to_skip -= len(chunk)
-            continue
+    model.revision = weights_revision(model)
+    if backend == "torch":
+        return model
+
+    from models.finbert_onnx import load_onnx_model
+    return load_onnx_model(model, quantize=(backend == "onnx-int8"))
+
+def finbert_score_windows(texts, tokenizer, model, device, scheduler=SCHEDULER,
+                          window_agg=WINDOW_AGG, encoded=None):
+    """
+    Like finbert_score_nonblank, but blocks over MAX_LEN tokens are split into
+    MAX_LEN windows overlapping by WINDOW_OVERLAP instead of being truncated.
+    Windows from the whole chunk share batches; blocks that fit in one window
+    keep that window's prediction, longer ones get the mean (or length-weighted
+    mean) of their window probabilities.
+    """
+    if encoded is None:
+        encoded = encode_texts(texts, tokenizer, "window")
+    features = []
+    owners = []
+    for i, t in enumerate(texts):
+        features.extend(encoded[t])
+        owners.extend([i] * len(encoded[t]))
+    lengths = [len(f["input_ids"]) for f in features]
+
+    probs = np.zeros((len(lengths), len(LABELS)), dtype=np.float32)
+    for batch in plan_batches(lengths, scheduler):
+        inputs = tokenizer.pad([features[j] for j in batch], return_tensors="pt")
+        probs[batch] = finbert_predict_probs(inputs, model, device).cpu().numpy()
+
+    windows = [[] for _ in texts]
+    for w, owner in enumerate(owners):
+        windows[owner].append(w)
+
+    preds = []
+    for ws in windows:
+        if len(ws) == 1:
+            p = probs[ws[0]]
         else:
-            chunk = chunk.iloc[rows_to_skip:].copy()
-            rows_to_skip = 0
+            weights = [lengths[w] for w in ws] if window_agg == "length" else None
+            p = np.average(probs[ws], axis=0, weights=weights)
+        k = int(p.argmax())
+        preds.append([LABELS[k], float(p[k])])
+
+    return preds
+
+def count_windows(stats, windows):
+    """Add blocks / windows / tokens to `stats`; `windows` holds each block's window features."""
+    lengths = [[len(f["input_ids"]) for f in ws] for ws in windows]
+    stats["blocks"] += len(lengths)
+    stats["windowed"] += sum(len(ls) > 1 for ls in lengths)
+    stats["windows"] += sum(len(ls) for ls in lengths)
+    stats["tokens"] += sum(sum(ls) for ls in lengths)
+    stats["truncated_tokens"] += sum(ls[0] for ls in lengths)
+
+def window_report(stats):
+    """
+    One-line summary of what window mode costs compared with truncation, over
+    every non-blank block (cached or not): not the rows that reached the model.
+    """
+    if not stats["blocks"]:
+        return "🪟 Window mode: no non-blank blocks."
+    extra = stats["tokens"] / max(stats["truncated_tokens"], 1) - 1
+    return (
+        f"🪟 Windowed {stats['windowed']}/{stats['blocks']} blocks "
+        f"({stats['windowed'] / stats['blocks']:.1%}) | "
+        f"{stats['windows']} windows (+{stats['windows'] - stats['blocks']} extra vs truncation) | "
+        f"+{extra:.1%} tokens vs truncation"
+    )
+
+# ---------------- staged pipeline (main) ----------------
+def read_stage(stage, out_q, ckpt):
+    """Prefetch input chunks from the checkpoint on."""
+    try:
+        for chunk, in_offset in storage.iter_chunks(IN_PATH, CHUNK_ROWS, ckpt):
+            stage.put(out_q, (chunk, in_offset))
+    finally:
+        stage.put(out_q, DONE)
 
-            # Process this partial chunk
-            texts = chunk["clean_text"].fillna("").astype(str).tolist()
+def tokenize_stage(stage, in_q, out_q, pool, tokenizer, long_blocks, dedup=None):
+    """Hand each chunk's non-blank texts to the tokenizer pool, keeping chunk order."""
+    local = threading.local()
 
-            labels_out = []
-            confs_out = []
-
-            for i in range(0, len(texts), BATCH_SIZE):
-                batch = texts[i:i + BATCH_SIZE]
-
-                # If blank text, force neutral with low confidence
-                cleaned_batch = [b for b in batch if b.strip()]
-                if not cleaned_batch:
-                    labels_out.extend(["neutral"] * len(batch))
-                    confs_out.extend([0.0] * len(batch))
-                    continue
-
-                # Predict only on non-empty, then map back
-                pred_labels, pred_confs = finbert_predict_batch(cleaned_batch, tokenizer, model, device)
-
-                # Map predictions back to original batch shape
-                it = iter(zip(pred_labels, pred_confs))
-                for b in batch:
-                    if b.strip():
-                        lab, cf = next(it)
-                        labels_out.append(lab)
-                        confs_out.append(cf)
-                    else:
-                        labels_out.append("neutral")
-                        confs_out.append(0.0)
+    def encode(texts):
+        # A fast tokenizer can't be called from several threads at once
+        if not hasattr(local, "tokenizer"):
+            local.tokenizer = copy.deepcopy(tokenizer)
+        return encode_texts(texts, local.tokenizer, long_blocks)
 
-            chunk["finbert_sentiment"] = labels_out
-            chunk["finbert_confidence"] = confs_out
+    try:
+        while (item := stage.get(in_q)) is not DONE:
+            chunk, in_offset = item
+            texts = chunk["clean_text"].fillna("").astype(str).tolist()
+            if dedup is not None:
+                texts = dedup.skip(chunk, texts)
+            future = pool.submit(encode, [t for t in texts if t.strip()])
+            stage.put(out_q, (chunk, in_offset, texts, future))
+    finally:
+        stage.put(out_q, DONE)
+
+def write_stage(stage, in_q, progress, queues, record):
+    """Append scored chunks; the checkpoint only moves once a chunk is flushed."""
+    try:
+        while (item := stage.get(in_q)) is not DONE:
+            chunk, in_offset = item
+            ckpt = progress["ckpt"]
+            out_offset = storage.write_chunk(chunk, OUT_PATH, part=ckpt.rows, header=progress["first_write"])
+            progress["first_write"] = False
+            record.chunk(
+                len(chunk),
+                bytes_read=byte_delta(in_offset, ckpt.in_offset),
+                bytes_written=byte_delta(out_offset, ckpt.out_offset)
+            )
+
+            progress["ckpt"] = ckpt.advance(len(chunk), in_offset, out_offset)
+            progress["ckpt"].save(CHECKPOINT_PATH)
+            depths = " ".join(f"{q.name}={q.qsize()}" for q in queues)
+            print(f"✅ FinBERT processed rows: {progress['ckpt'].rows} | queued: {depths}")
+    except BaseException as e:
+        # Keep draining so the model stage never blocks on a full queue
+        stage.error = e
+        while stage.get(in_q) is not DONE:
+            pass
+
+def cache_namespace(model, long_blocks=LONG_BLOCKS, window_agg=WINDOW_AGG):
+    # Weights revision + truncation length + backend + long-block mode all change the prediction
+    revision = getattr(model, "revision", None) or weights_revision(model)
+    namespace = f"{MODEL_NAME}@{revision}|max_len={MAX_LEN}"
+    backend = getattr(model, "backend", "torch")
+    if backend != "torch":
+        namespace += f"|{backend}"
+    if long_blocks == "window":
+        namespace += f"|window={WINDOW_OVERLAP},{window_agg}"
+    return namespace
 
-            chunk.to_csv(OUT_PATH, mode="a", header=first_write, index=False)
-            first_write = False
-            total_processed += len(chunk)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score speaker blocks with FinBERT.")
+    parser.add_argument("--scheduler", choices=["token_budget", "fixed"], default=SCHEDULER)
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND)
+    parser.add_argument("--long-blocks", choices=["truncate", "window"], default=LONG_BLOCKS)
+    parser.add_argument("--window-agg", choices=["mean", "length"], default=WINDOW_AGG)
+    parser.add_argument("--no-cache", action="store_true", help="Score every row, skip the sentiment cache.")
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH, help="Chunks buffered between stages.")
+    parser.add_argument("--tokenizer-workers", type=int, default=TOKENIZER_WORKERS)
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Score with N worker processes (per-shard outputs/checkpoints), then merge.")
+    parser.add_argument("--threads-per-shard", type=int, default=None,
+                        help="torch threads per shard worker (default: cores / shards).")
+    parser.add_argument("--profile", choices=storage.CLEANING_PROFILES, default="full",
+                        help="Cleaned input to score (see etl/preprocess_speaker_blocks.py --profiles).")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Score one block per near-duplicate cluster (etl/dedup_blocks.py) and copy it to the rest.")
+    args = parser.parse_args()
+    report = RunReport("sentiment_finbert", vars(args))
+
+    IN_PATH = storage.cleaned_path(args.profile)
+    if not storage.exists(IN_PATH):
+        raise FileNotFoundError(f"Missing {IN_PATH}. Run preprocessing first.")
+    # Each profile has its own output and checkpoint (byte offsets only fit their own input)
+    OUT_PATH = storage.profile_path(OUT_PATH, args.profile)
+    CHECKPOINT_PATH = storage.profile_path(CHECKPOINT_PATH, args.profile)
 
-            CHECKPOINT_PATH.write_text(str(total_processed))
-            print(f"✅ FinBERT processed rows: {total_processed}")
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    # Process remaining chunks
-    try:
-        for chunk in reader:
-            chunk = chunk.copy()
-            texts = chunk["clean_text"].fillna("").astype(str).tolist()
+    if args.shards:
+        from models.finbert_shards import run_sharded
+        run_sharded(args, IN_PATH, report)
+        sys.exit(0)
 
-            labels_out = []
-            confs_out = []
+    # Resume support (byte offsets into input and output)
+    ckpt = reconcile_output(Checkpoint.load(CHECKPOINT_PATH), storage.dataset_path(OUT_PATH))
 
-            for i in range(0, len(texts), BATCH_SIZE):
-                batch = texts[i:i + BATCH_SIZE]
+    if ckpt.rows == 0 and storage.exists(OUT_PATH):
+        print("⚠️ Output file already exists and checkpoint is 0.")
+        print(f"   Delete {storage.dataset_path(OUT_PATH)} if you want a clean rebuild.")
+        print(f"   OR delete {CHECKPOINT_PATH} to force rebuild.")
+        raise SystemExit("Stopping to prevent duplicate append. Clean the output/checkpoint and rerun.")
 
-                cleaned_batch = [b for b in batch if b.strip()]
-                if not cleaned_batch:
-                    labels_out.extend(["neutral"] * len(batch))
-                    confs_out.extend([0.0] * len(batch))
-                    continue
+    dedup = Propagation(IN_PATH) if args.dedup else None
+    if dedup is not None and ckpt.rows:
+        dedup.preload(OUT_PATH)
 
-                pred_labels, pred_confs = finbert_predict_batch(cleaned_batch, tokenizer, model, device)
+    device = torch.device("cuda" if torch.cuda.is_available() and args.backend == "torch" else "cpu")
+    print("Using device:", device)
+    print(f"▶️ FinBERT starting from row {ckpt.rows} (scheduler={args.scheduler}, backend={args.backend})")
 
-                it = iter(zip(pred_labels, pred_confs))
-                for b in batch:
-                    if b.strip():
-                        lab, cf = next(it)
-                        labels_out.append(lab)
-                        confs_out.append(cf)
-                    else:
-                        labels_out.append("neutral")
-                        confs_out.append(0.0)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = report.timed(
+        load_model(device, args.backend), "finbert_batch",
+        sync=torch.cuda.synchronize if device.type == "cuda" else None
+    )
+
+    cache = None if args.no_cache else SentimentCache(cache_namespace(model, args.long_blocks, args.window_agg))
+    window_stats = Counter()
+
+    # Staged pipeline: reader thread -> tokenizer pool -> model (this thread) -> writer thread
+    progress = {"ckpt": ckpt, "first_write": not storage.exists(OUT_PATH)}
+    read_q = StageQueue("read", args.queue_depth)
+    tokenize_q = StageQueue("tokenize", args.queue_depth)
+    write_q = StageQueue("write", args.queue_depth)
+    queues = [read_q, tokenize_q, write_q]
+
+    reader, tokenize, scorer, writer = Stage("read"), Stage("tokenize"), Stage("model"), Stage("write")
+    stages = [reader, tokenize, scorer, writer]
+
+    pool = ThreadPoolExecutor(max_workers=args.tokenizer_workers, thread_name_prefix="tokenize")
+    run_in_thread(reader, read_stage, read_q, ckpt)
+    run_in_thread(tokenize, tokenize_stage, read_q, tokenize_q, pool, tokenizer, args.long_blocks, dedup)
+    score = report.stage("score", reads=[IN_PATH], writes=[OUT_PATH])
+    writer_thread = run_in_thread(writer, write_stage, write_q, progress, queues, score)
+
+    scorer.start()
+    try:
+        while writer.error is None and (item := scorer.get(tokenize_q)) is not DONE:
+            chunk, in_offset, texts, future = item
+            encoded = scorer.wait(future)
+            labels_out, confs_out = finbert_score_texts(
+                texts, tokenizer, model, device, scheduler=args.scheduler, cache=cache,
+                long_blocks=args.long_blocks, window_agg=args.window_agg, stats=window_stats,
+                encoded=encoded
+            )
+            if dedup is not None:
+                labels_out, confs_out = dedup.fill(chunk, labels_out, confs_out)
 
             chunk["finbert_sentiment"] = labels_out
             chunk["finbert_confidence"] = confs_out
-
-            chunk.to_csv(OUT_PATH, mode="a", header=first_write, index=False)
-            first_write = False
-            total_processed += len(chunk)
-
-            CHECKPOINT_PATH.write_text(str(total_processed))
-            print(f"✅ FinBERT processed rows: {total_processed}")
+            scorer.put(write_q, (chunk, in_offset))
 
     except KeyboardInterrupt:
-        print("\n🛑 Stopped by user (CTRL+C).")
-        print(f"✅ Progress saved. Next run will resume from row {total_processed}.")
+        print("\n🛑 Stopped by user (CTRL+C). Flushing scored chunks...")
+        write_q.put(DONE)
+        writer_thread.join()
+        pool.shutdown(wait=False, cancel_futures=True)
+        print(f"✅ Progress saved. Next run will resume from row {progress['ckpt'].rows}.")
+        if cache is not None:
+            print(cache.summary())
+        report.finish("interrupted")
         sys.exit(0)
 
-    print("🎉 DONE. Saved ->", OUT_PATH.resolve())
\ No newline at end of file
+    scorer.stop()
+    scorer.put(write_q, DONE)
+    writer_thread.join()
+    pool.shutdown()
+    for stage in stages:
+        if stage.error is not None:
+            raise stage.error
+
+    score.stop()
+
+    print(stage_report(stages, queues))
+    report.note(threads={
+        s.name: {"busy": s.busy(), "wait_in": s.wait_in, "wait_out": s.wait_out} for s in stages
+    })
+    if cache is not None:
+        print(cache.summary())
+        report.note(cache_hits=cache.hits, cache_misses=cache.misses)
+    if args.long_blocks == "window":
+        print(window_report(window_stats))
+        report.note(windows=dict(window_stats))
+    if dedup is not None:
+        print(dedup.report())
+        report.note(dedup_propagated=dedup.propagated)
+    print("🎉 DONE. Saved ->", storage.dataset_path(OUT_PATH).resolve())
+    report.finish()
\ No newline at end of file
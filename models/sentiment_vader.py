@@ -1,98 +1,117 @@
-import pandas as pd
 from pathlib import Path
+import argparse
+import sys
+import time
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from models.sentiment_cache import SentimentCache
+from models.vader_batch import BatchVader
+from utils import storage
+from utils.checkpoint import Checkpoint, reconcile_output
+from utils.instrument import RunReport, byte_delta
+
 IN_PATH = Path("data/processed/speaker_blocks_cleaned.csv")
 OUT_PATH = Path("data/processed/speaker_blocks_with_vader.csv")
 CHECKPOINT_PATH = Path("data/processed/vader_checkpoint.txt")
 
 CHUNK_ROWS = 5000
+CACHE_NAMESPACE = f"vader|nltk-{nltk.__version__}"
+
+# "batch" scores a chunk at once (models/vader_batch.py); "nltk" is the
+# per-text reference it is checked against (benchmarks/vader_parity.py)
+ENGINES = ["batch", "nltk"]
+ENGINE = "batch"
 
 nltk.download("vader_lexicon", quiet=True)
 sid = SentimentIntensityAnalyzer()
+batch_vader = BatchVader(sid)
+
+def cache_namespace(engine=ENGINE):
+    return CACHE_NAMESPACE if engine == "nltk" else f"vader-{engine}|nltk-{nltk.__version__}"
 
 def vader_score(text: str) -> float:
     return sid.polarity_scores(text)["compound"]
 
+def vader_score_texts(texts, cache=None, engine=ENGINE):
+    """Compound scores in input order; blank texts score 0.0."""
+    scores = [0.0] * len(texts)
+    rows = [i for i, t in enumerate(texts) if t.strip()]
+
+    def score(batch_texts):
+        if engine == "batch":
+            return batch_vader.compound(batch_texts)
+        return [vader_score(t) for t in batch_texts]
+
+    todo = [texts[i] for i in rows]
+    values = cache.cached_call(todo, score) if cache is not None else score(todo)
+    for i, v in zip(rows, values):
+        scores[i] = v
+    return scores
+
 if __name__ == "__main__":
-    if not IN_PATH.exists():
+    parser = argparse.ArgumentParser(description="Score speaker blocks with VADER.")
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE,
+                        help="batch: NumPy over the whole chunk; nltk: per-text reference.")
+    parser.add_argument("--no-cache", action="store_true", help="Score every row, skip the sentiment cache.")
+    parser.add_argument("--profile", choices=storage.CLEANING_PROFILES, default="full",
+                        help="Cleaned input to score (see etl/preprocess_speaker_blocks.py --profiles).")
+    args = parser.parse_args()
+    report = RunReport("sentiment_vader", vars(args))
+
+    IN_PATH = storage.cleaned_path(args.profile)
+    if not storage.exists(IN_PATH):
         raise FileNotFoundError(f"Missing {IN_PATH}. Run preprocessing first.")
+    # Each profile has its own output and checkpoint (byte offsets only fit their own input)
+    OUT_PATH = storage.profile_path(OUT_PATH, args.profile)
+    CHECKPOINT_PATH = storage.profile_path(CHECKPOINT_PATH, args.profile)
 
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    # Resume support
-    start_row = 0
-    if CHECKPOINT_PATH.exists():
-        val = CHECKPOINT_PATH.read_text().strip()
-        if val.isdigit():
-            start_row = int(val)
-
-    # If resuming, ensure output exists; if not, start fresh
-    if start_row > 0 and not OUT_PATH.exists():
-        print("⚠️ Checkpoint exists but output file missing. Restarting from 0.")
-        start_row = 0
+    # Resume support (byte offsets into input and output)
+    ckpt = reconcile_output(Checkpoint.load(CHECKPOINT_PATH), storage.dataset_path(OUT_PATH))
 
-    if start_row == 0 and OUT_PATH.exists():
+    if ckpt.rows == 0 and storage.exists(OUT_PATH):
         # Safety: avoid accidental duplicates
         print("⚠️ Output file already exists and checkpoint is 0.")
-        print("   Delete data/processed/speaker_blocks_with_vader.csv if you want a clean rebuild.")
-        print("   OR delete data/processed/vader_checkpoint.txt to force rebuild.")
+        print(f"   Delete {storage.dataset_path(OUT_PATH)} if you want a clean rebuild.")
+        print(f"   OR delete {CHECKPOINT_PATH} to force rebuild.")
         # We'll still proceed by appending, but that can duplicate.
         # Safer: stop here.
         raise SystemExit("Stopping to prevent duplicate append. Clean the output/checkpoint and rerun.")
 
-    print(f"▶️ VADER starting from row {start_row}")
-
-    # Stream input, but skip already processed rows
-    total_processed = start_row
-    first_write = not OUT_PATH.exists()
-
-    reader = pd.read_csv(IN_PATH, chunksize=CHUNK_ROWS)
-
-    # Skip chunks until reaching start_row
-    rows_to_skip = start_row
-    while rows_to_skip > 0:
-        try:
-            chunk = next(reader)
-        except StopIteration:
-            print("✅ Nothing left to process.")
-            raise SystemExit(0)
-
-        if len(chunk) <= rows_to_skip:
-            rows_to_skip -= len(chunk)
-            continue
-        else:
-            # Partial skip inside this chunk
-            chunk = chunk.iloc[rows_to_skip:].copy()
-            rows_to_skip = 0
-
-            # Process this partial chunk and then continue normally
-            chunk["clean_text"] = chunk["clean_text"].fillna("").astype(str)
-            chunk["sentiment_vader"] = chunk["clean_text"].apply(
-                lambda t: vader_score(t) if t.strip() else 0.0
-            )
-
-            chunk.to_csv(OUT_PATH, mode="a", header=first_write, index=False)
-            first_write = False
-            total_processed += len(chunk)
-
-            CHECKPOINT_PATH.write_text(str(total_processed))
-            print(f"✅ VADER processed rows: {total_processed}")
-
-    # Process remaining chunks
-    for chunk in reader:
-        chunk = chunk.copy()
+    print(f"▶️ VADER ({args.engine}) starting from row {ckpt.rows}")
+
+    cache = None if args.no_cache else SentimentCache(cache_namespace(args.engine))
+
+    # Stream input from the checkpointed offset (no re-parsing of done rows)
+    first_write = not storage.exists(OUT_PATH)
+
+    score = report.stage("score", reads=[IN_PATH], writes=[OUT_PATH])
+    for chunk, in_offset in storage.iter_chunks(IN_PATH, CHUNK_ROWS, ckpt):
         chunk["clean_text"] = chunk["clean_text"].fillna("").astype(str)
-        chunk["sentiment_vader"] = chunk["clean_text"].apply(
-            lambda t: vader_score(t) if t.strip() else 0.0
-        )
+        t0 = time.perf_counter()
+        chunk["sentiment_vader"] = vader_score_texts(chunk["clean_text"].tolist(), cache, args.engine)
+        report.latency("vader_chunk", time.perf_counter() - t0)
 
-        chunk.to_csv(OUT_PATH, mode="a", header=first_write, index=False)
+        out_offset = storage.write_chunk(chunk, OUT_PATH, part=ckpt.rows, header=first_write)
         first_write = False
-        total_processed += len(chunk)
+        score.chunk(
+            len(chunk),
+            bytes_read=byte_delta(in_offset, ckpt.in_offset),
+            bytes_written=byte_delta(out_offset, ckpt.out_offset)
+        )
+
+        # Advance the checkpoint only after the chunk is on disk
+        ckpt = ckpt.advance(len(chunk), in_offset, out_offset)
+        ckpt.save(CHECKPOINT_PATH)
+        print(f"✅ VADER processed rows: {ckpt.rows}")
 
-        CHECKPOINT_PATH.write_text(str(total_processed))
-        print(f"✅ VADER processed rows: {total_processed}")
+    score.stop()
 
-    print("🎉 DONE. Saved ->", OUT_PATH.resolve())
\ No newline at end of file
+    if cache is not None:
+        print(cache.summary())
+        report.note(cache_hits=cache.hits, cache_misses=cache.misses)
+    print("🎉 DONE. Saved ->", storage.dataset_path(OUT_PATH).resolve())
+    report.finish()
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Batch VADER: NLTK's compound score for a whole chunk of texts at once.
+
+NLTK's SentimentIntensityAnalyzer walks every token of every text in
+Python. Here the chunk is split once, the distinct tokens are factorized
+into a vocabulary index and looked up against the lexicon, booster and
+negation lists in one pass, and every rule then runs as NumPy operations
+over the flat token stream (CSR layout: token ids + document offsets):
+
+- ALL-CAPS emphasis when a text mixes caps and non-caps tokens
+- boosters / dampeners up to three tokens back (scaled by distance)
+- negation ("not", "n't", "never so ..."), the "least" rule and idioms
+- "but": tokens before it x0.5, after it x1.5
+- "!" / "?" emphasis, then the normalized compound
+
+The rules follow nltk.sentiment.vader step for step, including its quirks
+(a repeated token is scored in the context of its first occurrence, the
+case-sensitive "never"/"so"/"this" checks), and the arithmetic is done in
+the same order, so scores match `polarity_scores(text)["compound"]`; see
+benchmarks/vader_parity.py. Lexicon and constants come from NLTK itself.
+"""
+
+import math
+import string
+
+import numpy as np
+import pandas as pd
+from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+
+C = VaderConstants
+PUNCT = set(string.punctuation)
+ALPHA = 15          # VaderConstants.normalize default
+
+class BatchVader:
+    def __init__(self, analyzer=None):
+        analyzer = analyzer or SentimentIntensityAnalyzer()
+        self.lexicon = analyzer.lexicon
+        self.idioms = [(tuple(k.split()), v) for k, v in C.SPECIAL_CASE_IDIOMS.items()]
+        self.booster_bigrams = [tuple(k.split()) for k in C.BOOSTER_DICT if " " in k]
+        self._normalized = {}       # raw token -> token after SentiText's punctuation strip
+
+    def normalize_token(self, raw):
+        """SentiText._words_and_emoticons for one whitespace token; None if it is dropped."""
+        if raw in self._normalized:
+            return self._normalized[raw]
+        token = raw if len(raw) > 1 else None
+        if token is not None:
+            # One leading or trailing PUNC_LIST item comes off a punctuation-free word
+            for p in C.PUNC_LIST:
+                for core in (raw[:-len(p)] if raw.endswith(p) else None, raw[len(p):] if raw.startswith(p) else None):
+                    if core and len(core) > 1 and not PUNCT.intersection(core):
+                        token = core
+        self._normalized[raw] = token
+        return token
+
+    def vocabulary(self, tokens):
+        """Per-token-type lookups for the distinct normalized tokens of a chunk."""
+        lower = [t.lower() for t in tokens]
+        lex = np.array([self.lexicon.get(w, np.nan) for w in lower], dtype=float)
+        return {
+            "exact": {t: i for i, t in enumerate(tokens)},
+            "valence": lex,
+            "in_lex": ~np.isnan(lex),
+            "boost": np.array([C.BOOSTER_DICT.get(w, 0.0) for w in lower]),
+            "is_boost": np.array([w in C.BOOSTER_DICT for w in lower], dtype=bool),
+            "negated": np.array([w in C.NEGATE or "n't" in w for w in lower], dtype=bool),
+            "upper": np.array([t.isupper() for t in tokens], dtype=bool),
+            "lower_words": np.array(lower, dtype=object),
+        }
+
+    def compound(self, texts):
+        """Compound scores (rounded to 4 places like NLTK) for a list of strings."""
+        n_docs = len(texts)
+        splits = [t.split() for t in texts]
+        lengths = np.fromiter((len(s) for s in splits), dtype=np.int64, count=n_docs)
+        flat = [w for s in splits for w in s]
+        if not flat:
+            return [0.0] * n_docs
+
+        # Raw tokens -> normalized vocabulary ids (Python work is per distinct token only)
+        codes, raw_types = pd.factorize(pd.Series(flat, dtype=object))
+        norm = [self.normalize_token(t) for t in raw_types]
+        norm_types, norm_ids = np.unique(np.array([t or "" for t in norm], dtype=object), return_inverse=True)
+        keep_type = np.array([t is not None for t in norm], dtype=bool)
+
+        keep = keep_type[codes]
+        ids = norm_ids.reshape(-1)[codes][keep]
+        doc = np.repeat(np.arange(n_docs), lengths)[keep]
+        voc = self.vocabulary(list(norm_types))
+
+        n = np.bincount(doc, minlength=n_docs)
+        starts = np.concatenate([[0], np.cumsum(n)[:-1]])
+        pos = np.arange(len(ids)) - starts[doc]
+        size = n[doc]
+
+        upper = voc["upper"][ids]
+        n_upper = np.bincount(doc, weights=upper, minlength=n_docs)
+        cap_diff = ((n - n_upper) > 0) & ((n - n_upper) < n)
+
+        valence = self.token_valence(ids, pos, size, doc, cap_diff, voc)
+
+        # Each occurrence is scored like the first occurrence of the same token in its text
+        key = doc * len(norm_types) + ids
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        sentiments = valence[first[inverse.reshape(-1)]]
+
+        # "but": halve what comes before the first one, boost what comes after
+        is_but = voc["lower_words"][ids] == "but"
+        but_at = np.full(n_docs, np.iinfo(np.int64).max)
+        np.minimum.at(but_at, doc[is_but], pos[is_but])
+        has_but = but_at[doc] != np.iinfo(np.int64).max
+        sentiments = np.where(has_but & (pos < but_at[doc]), sentiments * 0.5, sentiments)
+        sentiments = np.where(has_but & (pos > but_at[doc]), sentiments * 1.5, sentiments)
+
+        # bincount adds in token order, like sum() over NLTK's list
+        sums = np.bincount(doc, weights=sentiments, minlength=n_docs)
+        scores = []
+        for text, total, count in zip(texts, sums.tolist(), n.tolist()):
+            if count == 0:
+                scores.append(0.0)
+                continue
+            amplifier = self.punctuation_emphasis(text)
+            if total > 0:
+                total += amplifier
+            elif total < 0:
+                total -= amplifier
+            scores.append(round(total / math.sqrt(total * total + ALPHA), 4))
+        return scores
+
+    @staticmethod
+    def punctuation_emphasis(text):
+        ep = min(text.count("!"), 4) * 0.292
+        qm = text.count("?")
+        return ep + (0 if qm <= 1 else qm * 0.18 if qm <= 3 else 0.96)
+
+    def token_valence(self, ids, pos, size, doc, cap_diff, voc):
+        """SentimentIntensityAnalyzer.sentiment_valence for every token position."""
+        total = len(ids)
+
+        def at(offset, rows):
+            """Token ids `offset` positions away from `rows` (-1 outside the text)."""
+            j = rows + offset
+            inside = (pos[rows] + offset >= 0) & (pos[rows] + offset < size[rows])
+            return np.where(inside, ids[np.clip(j, 0, total - 1)], -1)
+
+        def word_is(word, neighbour_ids, lower=False):
+            if lower:
+                return (neighbour_ids >= 0) & (voc["lower_words"][neighbour_ids] == word)
+            target = voc["exact"].get(word, -2)
+            return neighbour_ids == target
+
+        def lookup(name, neighbour_ids, fill):
+            return np.where(neighbour_ids >= 0, voc[name][np.maximum(neighbour_ids, 0)], fill)
+
+        rows = np.flatnonzero(voc["in_lex"][ids])
+        v = voc["valence"][ids[rows]]
+        capd = cap_diff[doc[rows]]
+        p = pos[rows]
+
+        emphasized = voc["upper"][ids[rows]] & capd
+        v = np.where(emphasized, np.where(v > 0, v + C.C_INCR, v - C.C_INCR), v)
+
+        prev = {k: at(-k, rows) for k in (1, 2, 3)}
+        so_this = {k: word_is("so", prev[k]) | word_is("this", prev[k]) for k in (1, 2)}
+        for start_i in range(3):
+            k = start_i + 1
+            gate = (p > start_i) & ~lookup("in_lex", prev[k], True)
+
+            # Booster / dampener k tokens back; its sign follows the valence so far
+            b = lookup("boost", prev[k], 0.0)
+            s = np.where(v < 0, b * -1, b)
+            caps = lookup("is_boost", prev[k], False) & lookup("upper", prev[k], False) & capd
+            s = np.where(caps, np.where(v > 0, s + C.C_INCR, s - C.C_INCR), s)
+            if start_i == 1:
+                s = np.where(s != 0, s * 0.95, s)
+            if start_i == 2:
+                s = np.where(s != 0, s * 0.9, s)
+            v = np.where(gate, v + s, v)
+
+            negated = lookup("negated", prev[k], False)
+            if start_i == 0:
+                v = np.where(gate & negated, v * C.N_SCALAR, v)
+            elif start_i == 1:
+                never = word_is("never", prev[2]) & so_this[1]
+                v = np.where(gate & never, v * 1.5, np.where(gate & ~never & negated, v * C.N_SCALAR, v))
+            else:
+                never = (word_is("never", prev[3]) & so_this[2]) | so_this[1]
+                v = np.where(gate & never, v * 1.25, np.where(gate & ~never & negated, v * C.N_SCALAR, v))
+                v = np.where(gate, self.idioms_check(v, rows, at, word_is), v)
+
+        # "least" right before the word negates it (but not "at least" / "very least")
+        least = ~lookup("in_lex", prev[1], True) & word_is("least", prev[1], lower=True)
+        shielded = (p > 1) & (word_is("at", prev[2], lower=True) | word_is("very", prev[2], lower=True))
+        v = np.where((p > 0) & least & ~shielded, v * C.N_SCALAR, v)
+
+        valence = np.zeros(total)
+        valence[rows] = v
+
+        # Boosters and "kind" in "kind of" carry no valence of their own
+        skip = voc["is_boost"][ids]
+        skip |= (voc["lower_words"][ids] == "kind") & word_is("of", at(1, np.arange(total)), lower=True)
+        valence[skip] = 0.0
+        return valence
+
+    def idioms_check(self, v, rows, at, word_is):
+        """SentimentIntensityAnalyzer._idioms_check (reached at the third window step)."""
+        near = {k: at(k, rows) for k in (-3, -2, -1, 0, 1, 2)}
+
+        def seq(offsets, words):
+            return np.logical_and.reduce([word_is(w, near[o]) for o, w in zip(offsets, words)])
+
+        # Backward sequences in NLTK's order; the first one that is an idiom wins
+        backward = [(-1, 0), (-2, -1, 0), (-2, -1), (-3, -2, -1), (-3, -2)]
+        replaced = np.full(len(rows), np.nan)
+        for offsets in reversed(backward):
+            for words, value in self.idioms:
+                if len(words) == len(offsets):
+                    replaced = np.where(seq(offsets, words), value, replaced)
+        v = np.where(np.isnan(replaced), v, replaced)
+
+        # Forward sequences override (at() is -1 past the end, so they can't match there)
+        for offsets in [(0, 1), (0, 1, 2)]:
+            for words, value in self.idioms:
+                if len(words) == len(offsets):
+                    v = np.where(seq(offsets, words), value, v)
+
+        bigram = np.zeros(len(rows), dtype=bool)
+        for words in self.booster_bigrams:
+            bigram |= seq((-3, -2), words) | seq((-2, -1), words)
+        return np.where(bigram, v + C.B_DECR, v)
@@ -0,0 +1,172 @@
+from pathlib import Path
+import argparse
+import shlex
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from utils import dag, near_duplicates, storage
+from utils.instrument import RunReport
+
+# The whole pipeline as one command:
+#   python run_pipeline.py                       # everything that is out of date
+#   python run_pipeline.py --from vader --until merge
+#   python run_pipeline.py --args finbert="--backend onnx --shards 4"
+#
+# Stages are declared below with the files they read and write; the graph
+# follows from those. A stage is skipped when its inputs' contents, its code
+# (script + repo modules it imports), its arguments and PIPELINE_STORAGE are
+# what its last finished run saw and its outputs are unchanged. VADER and
+# FinBERT run side by side, and so do the two aggregations (--jobs). The
+# near-duplicate stage is only part of the graph when FinBERT runs with --dedup,
+# the warehouse load only with --warehouse.
+
+RAW_PATH = Path("data/raw/transcripts_raw.jsonl")
+VADER_PATH = Path("data/processed/speaker_blocks_with_vader.csv")
+FINBERT_PATH = Path("data/processed/speaker_blocks_with_finbert.csv")
+MERGED_PATH = Path("data/processed/speaker_blocks_with_sentiment.csv")
+STATE_PATH = Path("data/processed/pipeline_state.json")
+
+def option(extra, flag, default):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(flag, default=default)
+    return vars(parser.parse_known_args(extra)[0])[flag.lstrip("-").replace("-", "_")]
+
+def stages(extra, warehouse=False):
+    """The pipeline DAG; `extra` maps stage name -> extra script arguments."""
+    # Scorers read the cleaning profile they are given, so preprocess has to write it
+    vader_profile = option(extra["vader"], "--profile", "full")
+    vader_in = storage.cleaned_path(vader_profile)
+    finbert_profile = option(extra["finbert"], "--profile", "full")
+    finbert_in = storage.cleaned_path(finbert_profile)
+    profiles = [p for p in storage.CLEANING_PROFILES if storage.cleaned_path(p) in {vader_in, finbert_in}]
+    preprocess_args = extra["preprocess"]
+    if "--profiles" not in " ".join(preprocess_args):
+        preprocess_args = preprocess_args + ["--profiles", ",".join(profiles)]
+    cleaned = [storage.cleaned_path(p.strip()) for p in option(preprocess_args, "--profiles", "full").split(",")]
+
+    # Scorer outputs and checkpoints are per profile too; merge is told which ones to read
+    vader_out = storage.profile_path(VADER_PATH, vader_profile)
+    finbert_out = storage.profile_path(FINBERT_PATH, finbert_profile)
+    merge_args = extra["merge"]
+    if "--vader-profile" not in merge_args:
+        merge_args = merge_args + ["--vader-profile", vader_profile]
+    if "--finbert-profile" not in merge_args:
+        merge_args = merge_args + ["--finbert-profile", finbert_profile]
+
+    # `clean`: what a rebuild deletes first -- outputs the script appends to, and its checkpoint.
+    # Load and merge replace their outputs; the aggregations keep their --incremental state,
+    # which notices a rewritten input by itself.
+    tasks = [
+        dag.Task("load", "etl/load_transcripts.py", [], [RAW_PATH], args=extra["load"]),
+        dag.Task(
+            "preprocess", "etl/preprocess_speaker_blocks.py", [RAW_PATH],
+            cleaned, clean=cleaned + [Path("data/processed/preprocess_checkpoint.txt")], args=preprocess_args
+        ),
+        dag.Task(
+            "vader", "models/sentiment_vader.py", [vader_in], [vader_out],
+            clean=[vader_out, storage.profile_path(Path("data/processed/vader_checkpoint.txt"), vader_profile)],
+            args=extra["vader"]
+        ),
+        dag.Task(
+            "finbert", "models/sentiment_finbert.py", [finbert_in], [finbert_out],
+            clean=[
+                finbert_out,
+                storage.profile_path(Path("data/processed/finbert_checkpoint.txt"), finbert_profile),
+                storage.profile_path(Path("data/processed/finbert_shards"), finbert_profile),
+            ],
+            args=extra["finbert"]
+        ),
+        dag.Task("merge", "features/merge_sentiments.py", [vader_out, finbert_out], [MERGED_PATH], args=merge_args),
+        dag.Task(
+            "aggregate_v1", "features/aggregate_for_powerbi.py", [MERGED_PATH],
+            [Path("data/processed/powerbi_call_level_metrics.csv"), Path("data/processed/powerbi_role_level_metrics.csv")],
+            args=extra["aggregate_v1"]
+        ),
+        dag.Task(
+            "aggregate_v2", "features/relabeled_roles_aggregation.py", [MERGED_PATH],
+            [Path("data/processed/powerbi_call_level_metrics_v2.csv"), Path("data/processed/powerbi_role_level_metrics_v2.csv")],
+            args=extra["aggregate_v2"]
+        ),
+        dag.Task(
+            "baselines", "features/call_baselines.py", [Path("data/processed/powerbi_call_level_metrics_v2.csv")],
+            [Path("data/processed/powerbi_call_baselines_v2.csv"), Path("data/processed/powerbi_quarter_extremes_v2.csv")],
+            args=extra["baselines"]
+        ),
+    ]
+
+    if "--dedup" in extra["finbert"]:
+        near = [near_duplicates.map_path(finbert_in), near_duplicates.summary_path(finbert_in)]
+        dedup_args = extra["dedup"]
+        if "--profile" not in dedup_args:
+            dedup_args = dedup_args + ["--profile", finbert_profile]
+        tasks.insert(2, dag.Task("dedup", "etl/dedup_blocks.py", [finbert_in], near, args=dedup_args))
+        next(t for t in tasks if t.name == "finbert").inputs.extend(near)
+
+    if warehouse:
+        # The database itself may be remote; the load receipt stands in for it
+        tasks.append(dag.Task(
+            "warehouse", "etl/load_warehouse.py",
+            [
+                Path("data/processed/powerbi_call_level_metrics_v2.csv"),
+                Path("data/processed/powerbi_role_level_metrics_v2.csv"),
+                MERGED_PATH,
+            ],
+            [Path("data/warehouse/last_load.json")], args=extra["warehouse"]
+        ))
+    return tasks
+
+STAGE_NAMES = ["load", "preprocess", "dedup", "vader", "finbert", "merge", "aggregate_v1", "aggregate_v2", "baselines", "warehouse"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline stages that are out of date.")
+    parser.add_argument("--from", dest="start", choices=STAGE_NAMES,
+                        help="Only this stage and what depends on it.")
+    parser.add_argument("--until", choices=STAGE_NAMES, help="Only this stage and what it depends on.")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run at the same time.")
+    parser.add_argument("--force", action="store_true", help="Run the selected stages even if up to date.")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would run.")
+    parser.add_argument("--warehouse", action="store_true",
+                        help="Also load the warehouse (etl/load_warehouse.py, URL from $WAREHOUSE_URL).")
+    parser.add_argument("--adopt", action="store_true",
+                        help="Record outputs already on disk as up to date (first use on an existing data/).")
+    parser.add_argument("--args", action="append", default=[], metavar="STAGE=ARGS",
+                        help='Extra arguments for a stage script, e.g. finbert="--backend onnx".')
+    args = parser.parse_args()
+
+    extra = {name: [] for name in STAGE_NAMES}
+    for item in args.args:
+        name, sep, value = item.partition("=")
+        if not sep or name not in extra:
+            parser.error(f"--args takes STAGE=ARGS with STAGE one of {STAGE_NAMES}, got {item!r}")
+        extra[name] += shlex.split(value)
+
+    tasks = dag.select(stages(extra, args.warehouse), args.start, args.until)
+    runner = dag.Runner(tasks, STATE_PATH, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+
+    if args.adopt:
+        adopted = runner.adopt()
+        print(f"✅ Marked up to date: {', '.join(adopted) or 'nothing (no complete outputs)'}")
+        sys.exit(0)
+
+    report = RunReport("run_pipeline", vars(args)) if not args.dry_run else None
+    deps = dag.dependencies(tasks)
+    print(f"▶️ Stages: {' -> '.join(t.name for t in tasks)} (jobs={args.jobs}, storage={storage.STORAGE_FORMAT})")
+    t0 = time.perf_counter()
+    if report is None:
+        results = runner.run()
+    else:
+        with report.stage("run"):
+            results = runner.run()
+
+    print(f"\n{'stage':<14} {'after':<22} {'seconds':>9}  status")
+    for name, (status, seconds) in results.items():
+        print(f"{name:<14} {','.join(deps[name]) or '-':<22} {seconds:9.1f}  {status}")
+
+    failed = [name for name, (status, _) in results.items() if status.startswith(("failed", "blocked"))]
+    if report is not None:
+        report.note(stages={name: {"status": status, "seconds": round(seconds, 3)} for name, (status, seconds) in results.items()})
+        report.finish("failed" if failed else "ok")
+    if failed:
+        raise SystemExit(f"❌ Failed or blocked: {', '.join(failed)} (see the [stage] lines above)")
+    print(f"🎉 Pipeline done in {time.perf_counter() - t0:.1f}s")
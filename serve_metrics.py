@@ -0,0 +1,109 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from utils.metrics_query import CALL_PATH, ROLE_PATH, MetricsStore
+
+# Read-only JSON endpoint over the v2 call-level and role-level tables
+# (utils/metrics_query.py), for quick questions without the .pbix:
+#   python serve_metrics.py --port 8765
+#   curl "localhost:8765/history?symbol=AAPL&metrics=vader_gap_mgmt_minus_analyst_v2,finbert_gap_mgmt_minus_analyst_v2"
+#   curl "localhost:8765/top?table=role&metric=finbert_mean&k=20&section=Q%26A&quarter=latest"
+#   curl "localhost:8765/calls?year=2023&quarter=4"
+#   curl "localhost:8765/roles?symbol=MSFT&role=analyst"
+#   curl "localhost:8765/meta"
+# Every answer is {"rows": [...], "count": n, "ms": server time}; errors are 400 {"error": ...}.
+# The CSVs are reloaded when the aggregations rewrite them.
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+def params(query):
+    """Last value of each query parameter; `metrics` / `columns` are comma lists."""
+    out = {k: v[-1] for k, v in parse_qs(query, keep_blank_values=False).items()}
+    for key in ("metrics", "columns"):
+        if key in out:
+            out[key] = tuple(c.strip() for c in out[key].split(",") if c.strip())
+    return out
+
+def answer(store, path, p):
+    if path == "/meta":
+        return store.meta()
+    if path == "/history":
+        if "symbol" not in p:
+            raise ValueError("history needs ?symbol=")
+        return store.history(p["symbol"], p.get("metrics", ()))
+    if path == "/calls":
+        return store.calls(p.get("symbol"), p.get("year"), p.get("quarter"), p.get("columns", ()))
+    if path == "/roles":
+        return store.roles(p.get("symbol"), p.get("year"), p.get("quarter"), p.get("role"), p.get("section"),
+                           p.get("columns", ()))
+    if path == "/top":
+        if "metric" not in p:
+            raise ValueError("top needs ?metric=")
+        return store.top(
+            p["metric"], int(p.get("k", 20)), p.get("table", "call"), p.get("order", "asc") != "desc",
+            p.get("symbol"), p.get("year"), p.get("quarter"), p.get("role"), p.get("section"),
+            p.get("columns", ()),
+        )
+    raise LookupError(f"Unknown path {path!r}; try /history, /top, /calls, /roles or /meta")
+
+class Handler(BaseHTTPRequestHandler):
+    store = None        # set by main
+    quiet = False
+
+    def do_GET(self):
+        t0 = time.perf_counter()
+        url = urlparse(self.path)
+        try:
+            result = answer(self.store, url.path.rstrip("/") or "/", params(url.query))
+        except LookupError as e:
+            return self.send_json(404, {"error": str(e)})
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        ms = round((time.perf_counter() - t0) * 1000, 3)
+        if isinstance(result, list):
+            result = {"rows": result, "count": len(result), "ms": ms}
+        self.send_json(200, result)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only JSON queries over the v2 Power BI tables.")
+    parser.add_argument("--host", default=HOST, help="Interface to bind (default: localhost only).")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--calls", type=Path, default=CALL_PATH, help="Call-level metrics CSV.")
+    parser.add_argument("--roles", type=Path, default=ROLE_PATH, help="Role-level metrics CSV.")
+    parser.add_argument("--quiet", action="store_true", help="No access log.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    Handler.store = MetricsStore(args.calls, args.roles)
+    Handler.quiet = args.quiet
+    meta = Handler.store.meta()
+    print(f"✅ Loaded {meta['call_rows']:,} calls / {meta['role_rows']:,} role rows "
+          f"({meta['symbols']:,} symbols) in {time.perf_counter() - t0:.2f}s")
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"▶️ Serving on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,146 @@
+"""
+Byte-offset checkpoints for the chunked CSV scorers.
+
+A checkpoint records how many input rows are done, where the next unread
+input record starts and how long the output file was after the last chunk
+was flushed. Resuming seeks straight to `in_offset` instead of re-parsing
+the file, and truncates output bytes past `out_offset` left behind by a run
+that died halfway through a write.
+
+Older checkpoints that hold only a row count are still understood; those
+fall back to skipping records (without parsing them into DataFrames).
+"""
+
+import io
+import json
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import pandas as pd
+
+@dataclass
+class Checkpoint:
+    rows: int = 0
+    in_offset: int | None = None
+    out_offset: int | None = None
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        text = path.read_text().strip()
+        if text.isdigit():
+            return cls(rows=int(text))      # legacy row-count checkpoint
+        try:
+            return cls(**json.loads(text))
+        except (ValueError, TypeError):
+            print(f"⚠️ Unreadable checkpoint {path}, ignoring it.")
+            return cls()
+
+    def save(self, path):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self)))
+        os.replace(tmp, path)
+
+    def advance(self, rows, in_offset, out_offset):
+        return Checkpoint(self.rows + rows, in_offset, out_offset)
+
+def reconcile_output(ckpt, out_path):
+    """
+    Make the output file agree with the checkpoint before appending.
+
+    Returns the checkpoint to resume from (a fresh one if the output is gone).
+    """
+    out_path = Path(out_path)
+    if ckpt.rows > 0 and not out_path.exists():
+        print("⚠️ Checkpoint exists but output file missing. Restarting from 0.")
+        return Checkpoint()
+
+    if ckpt.out_offset is None or not out_path.exists():
+        return ckpt
+
+    size = out_path.stat().st_size
+    if size > ckpt.out_offset:
+        with open(out_path, "r+b") as fh:
+            fh.truncate(ckpt.out_offset)
+        print(f"✂️ Truncated {size - ckpt.out_offset} bytes of partial output from {out_path.name}.")
+    elif size < ckpt.out_offset:
+        raise SystemExit(
+            f"{out_path} is shorter than its checkpoint says ({size} < {ckpt.out_offset} bytes). "
+            "Delete the output and checkpoint to rebuild."
+        )
+    return ckpt
+
+def _iter_records(fh):
+    """Yield raw CSV records (quoted fields may span lines) from a binary file."""
+    record = b""
+    quotes = 0
+    for line in fh:
+        record += line
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield record
+            record = b""
+            quotes = 0
+    if record:
+        yield record
+
+def split_csv_records(path, n_parts):
+    """
+    Split a CSV into `n_parts` contiguous record ranges without parsing it.
+    Returns [(row_start, row_end, byte_start), ...] plus the file size.
+    """
+    with open(path, "rb") as fh:
+        offset = len(fh.readline())
+        offsets = [offset]
+        for record in _iter_records(fh):
+            offset += len(record)
+            offsets.append(offset)
+
+    n_rows = len(offsets) - 1
+    bounds = [n_rows * i // n_parts for i in range(n_parts + 1)]
+    ranges = [(bounds[i], bounds[i + 1], offsets[bounds[i]]) for i in range(n_parts)]
+    return ranges, offsets[-1]
+
+def iter_csv_chunks(path, chunksize, ckpt, columns=None, dtype=None):
+    """
+    Yield (chunk DataFrame, input byte offset after the chunk) starting at the
+    checkpoint. Each chunk is parsed on its own with the file's header line.
+    """
+    with open(path, "rb") as fh:
+        header = fh.readline()
+        offset = len(header)
+
+        if ckpt.in_offset is not None:
+            offset = max(ckpt.in_offset, offset)
+            fh.seek(offset)
+            records = _iter_records(fh)
+        else:
+            records = _iter_records(fh)
+            for _ in range(ckpt.rows):
+                skipped = next(records, None)
+                if skipped is None:
+                    return
+                offset += len(skipped)
+
+        batch = []
+        for record in records:
+            batch.append(record)
+            offset += len(record)
+            if len(batch) == chunksize:
+                yield pd.read_csv(io.BytesIO(header + b"".join(batch)), usecols=columns, dtype=dtype), offset
+                batch = []
+        if batch:
+            yield pd.read_csv(io.BytesIO(header + b"".join(batch)), usecols=columns, dtype=dtype), offset
+
+def append_csv(df, path, header):
+    """Append `df` to `path`, flush it to disk and return the new file size."""
+    with open(path, "ab") as fh:
+        df.to_csv(fh, header=header, index=False)
+        fh.flush()
+        os.fsync(fh.fileno())
+        return fh.tell()
@@ -0,0 +1,305 @@
+"""
+Dependency-graph runner for the pipeline scripts (stages are declared in
+run_pipeline.py).
+
+A Task is one script plus the files it reads and writes; a task depends on
+whichever tasks write its inputs. A task is up to date when its last run
+finished with the same fingerprint -- content hashes of its inputs, a hash
+of its code (the script and every repo module it imports, followed
+transitively), its arguments and the storage format -- and its outputs are
+still what that run left behind. File hashes are cached by (size, mtime),
+so unchanged multi-GB intermediates are not re-read on every run.
+
+Ready tasks run concurrently as subprocesses, output prefixed with the
+task name. A task whose last attempt stopped part-way under the same
+fingerprint is resumed through its own checkpoint; any other rerun first
+removes the task's `clean` files (outputs it appends to, its checkpoint) so
+it rebuilds from scratch. Scripts that rewrite their outputs need none.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from utils import storage
+
+ROOT = Path(__file__).resolve().parents[1]
+HASH_BLOCK = 1 << 20
+
+@dataclass
+class Task:
+    name: str
+    script: str
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    clean: list = field(default_factory=list)     # appended-to outputs + checkpoints, dropped on a rebuild
+    args: list = field(default_factory=list)
+
+def resolve(path):
+    """Where a path lives on disk: its Parquet dataset for pipeline tables in parquet mode, else itself."""
+    dpath = storage.dataset_path(path)
+    return dpath if dpath.exists() else Path(path)
+
+def remove(path):
+    # Only the current format's copy of a pipeline table; the other format's files stay
+    if Path(path).suffix == ".csv":
+        storage.remove(path)
+        return
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink(missing_ok=True)
+
+def dependencies(tasks):
+    """{task name: names of the tasks that write its inputs}"""
+    writers = {str(out): t.name for t in tasks for out in t.outputs}
+    return {t.name: sorted({writers[str(i)] for i in t.inputs if str(i) in writers}) for t in tasks}
+
+def select(tasks, start=None, until=None):
+    """Tasks downstream of `start` and upstream of `until` (both inclusive), in declaration order."""
+    deps = dependencies(tasks)
+    names = [t.name for t in tasks]
+    for name in [start, until]:
+        if name is not None and name not in names:
+            raise SystemExit(f"Unknown stage {name!r}; stages are {names}")
+
+    def closure(name, edges):
+        seen, todo = set(), [name]
+        while todo:
+            n = todo.pop()
+            if n not in seen:
+                seen.add(n)
+                todo.extend(edges[n])
+        return seen
+
+    keep = set(names)
+    if start is not None:
+        dependents = {n: [m for m in names if n in deps[m]] for n in names}
+        keep &= closure(start, dependents)
+    if until is not None:
+        keep &= closure(until, deps)
+    return [t for t in tasks if t.name in keep]
+
+# ---------------- fingerprints ----------------
+def local_imports(path):
+    """Repo modules imported anywhere in `path` (also lazy imports inside functions)."""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names = [node.module] + [f"{node.module}.{a.name}" for a in node.names]
+        else:
+            continue
+        for name in names:
+            module = ROOT / (name.replace(".", "/") + ".py")
+            if module.exists():
+                yield module
+
+def code_files(script):
+    seen, todo = set(), [ROOT / script]
+    while todo:
+        path = todo.pop()
+        if path not in seen:
+            seen.add(path)
+            todo.extend(local_imports(path))
+    return sorted(seen)
+
+def code_digest(script):
+    h = hashlib.sha256()
+    for path in code_files(script):
+        h.update(path.relative_to(ROOT).as_posix().encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+class Hasher:
+    """Content hashes of files / Parquet datasets, cached by (size, mtime_ns)."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.lock = threading.Lock()
+
+    def files(self, path):
+        path = resolve(path)
+        if path.is_dir():
+            return sorted(f for f in path.rglob("*") if f.is_file())
+        return [path] if path.exists() else []
+
+    def file_digest(self, path):
+        st = path.stat()
+        key = str(path)
+        entry = self.cache.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as fh:
+            while block := fh.read(HASH_BLOCK):
+                h.update(block)
+        self.cache[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+    def digest(self, path):
+        """sha256 of a file or dataset; None if it doesn't exist."""
+        files = self.files(path)
+        if not files:
+            return None
+        with self.lock:
+            base = resolve(path)
+            if files == [base]:
+                return self.file_digest(base)
+            h = hashlib.sha256()
+            for f in files:
+                h.update(f.relative_to(base).as_posix().encode())
+                h.update(self.file_digest(f).encode())
+            return h.hexdigest()
+
+def fingerprint(task, hasher):
+    return {
+        "code": code_digest(task.script),
+        "args": task.args,
+        "storage": storage.STORAGE_FORMAT,
+        "inputs": {str(p): hasher.digest(p) for p in task.inputs},
+    }
+
+# ---------------- state ----------------
+def load_state(path):
+    path = Path(path)
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"hashes": {}, "tasks": {}}
+
+def save_state(state, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=1))
+    os.replace(tmp, path)
+
+def up_to_date(task, record, fp, hasher):
+    if not record or record.get("status") != "done" or record.get("fingerprint") != fp:
+        return False
+    return all(hasher.digest(p) == record["outputs"].get(str(p)) for p in task.outputs)
+
+# ---------------- running ----------------
+class Runner:
+    def __init__(self, tasks, state_path, jobs=2, force=False, dry_run=False):
+        self.tasks = tasks
+        self.deps = dependencies(tasks)
+        self.state_path = state_path
+        self.state = load_state(state_path)
+        # Forget cached hashes of files that are gone (old Parquet parts, removed outputs)
+        self.state["hashes"] = {k: v for k, v in self.state["hashes"].items() if Path(k).exists()}
+        self.hasher = Hasher(self.state["hashes"])
+        self.jobs = jobs
+        self.force = force
+        self.dry_run = dry_run
+        self.lock = threading.Lock()
+        self.results = {}
+
+    def say(self, name, line):
+        with self.lock:
+            print(f"[{name}] {line}", flush=True)
+
+    def record(self, name, **values):
+        with self.lock:
+            self.state["tasks"].setdefault(name, {}).update(values)
+            save_state(self.state, self.state_path)
+
+    def missing_inputs(self, task, selected):
+        produced = {str(o) for t in selected for o in t.outputs}
+        return [p for p in task.inputs if str(p) not in produced and not resolve(p).exists()]
+
+    def execute(self, task):
+        """Skip, resume or rebuild one task; returns its status."""
+        fp = fingerprint(task, self.hasher)
+        record = self.state["tasks"].get(task.name)
+        if not self.force and up_to_date(task, record, fp, self.hasher):
+            return "up to date"
+        if self.dry_run:
+            return "would run"
+
+        # Same inputs and code as an attempt that didn't finish: let the script's checkpoint resume it
+        resume = record and record.get("status") != "done" and record.get("fingerprint") == fp
+        if resume:
+            self.say(task.name, "resuming the interrupted run (same inputs and code)")
+        else:
+            for path in task.clean:
+                remove(path)
+        self.record(task.name, status="started", fingerprint=fp)
+
+        t0 = time.perf_counter()
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        proc = subprocess.Popen(
+            [sys.executable, str(ROOT / task.script), *task.args],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8",
+            errors="replace", env=env
+        )
+        for line in proc.stdout:
+            self.say(task.name, line.rstrip())
+        code = proc.wait()
+        seconds = time.perf_counter() - t0
+
+        if code != 0:
+            self.record(task.name, status="failed", seconds=seconds)
+            return f"failed (exit {code})"
+        outputs = {str(p): self.hasher.digest(p) for p in task.outputs}
+        missing = [p for p, d in outputs.items() if d is None]
+        if missing:
+            self.record(task.name, status="failed", seconds=seconds)
+            return f"failed (no output {missing[0]})"
+        self.record(task.name, status="done", fingerprint=fp, outputs=outputs, seconds=seconds)
+        return "ran"
+
+    def adopt(self):
+        """Record outputs already on disk as up to date, without running anything."""
+        adopted = []
+        for task in self.tasks:
+            outputs = {str(p): self.hasher.digest(p) for p in task.outputs}
+            if all(outputs.values()) and all(resolve(p).exists() for p in task.inputs):
+                self.record(task.name, status="done", fingerprint=fingerprint(task, self.hasher), outputs=outputs)
+                adopted.append(task.name)
+        return adopted
+
+    def run(self):
+        names = [t.name for t in self.tasks]
+        by_name = {t.name: t for t in self.tasks}
+        for task in self.tasks:
+            missing = self.missing_inputs(task, self.tasks)
+            if missing:
+                raise SystemExit(f"Stage {task.name!r} needs {missing[0]}, which no selected stage writes.")
+
+        pending = list(names)
+        running = {}
+        started = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                for name in list(pending):
+                    upstream = [d for d in self.deps[name] if d in by_name]
+                    if any(self.results.get(d, "").startswith(("failed", "blocked", "would")) for d in upstream):
+                        pending.remove(name)
+                        self.results[name] = "blocked" if not self.dry_run else "would run"
+                    elif all(d in self.results for d in upstream) and len(running) < self.jobs:
+                        pending.remove(name)
+                        started[name] = time.perf_counter()
+                        running[pool.submit(self.execute, by_name[name])] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.results[name] = f"failed ({e!r})"
+                    self.results[name + "/seconds"] = time.perf_counter() - started[name]
+        return {n: (self.results[n], self.results.get(n + "/seconds", 0.0)) for n in names}
@@ -0,0 +1,262 @@
+"""
+Run reports for the pipeline scripts.
+
+Each script opens one RunReport and times its phases as stages; chunked
+stages also record every chunk (wall time, rows in/out and bytes when
+known), and model calls record per-batch latency. At the end a summary
+table is printed and the whole report is written as JSON to
+
+    data/reports/<script>/<YYYYmmdd-HHMMSS>.json   (+ latest.json)
+
+so two nightly runs can be diffed. A run that starts in the same second as
+an earlier one gets a -1, -2, ... suffix instead of overwriting it. PIPELINE_REPORT_DIR moves the reports.
+
+Peak RSS is the process high-water mark when a stage ends (it never goes
+down, so the stage where it jumps is the one that allocated); worker
+processes (spaCy n_process, VADER pool, FinBERT shards) are reported
+separately as the largest child.
+"""
+
+import atexit
+import json
+import os
+import platform
+import sys
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from utils import storage
+
+REPORT_DIR = Path(os.environ.get("PIPELINE_REPORT_DIR", "data/reports"))
+PERCENTILES = [50, 90, 99]
+
+def peak_rss_mb(children=False):
+    """High-water RSS in MB of this process (or its largest finished child); None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil (if installed) knows this process' peak working set
+        try:
+            import psutil
+        except ImportError:
+            return None
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)
+        return None if children or peak is None else peak / 2**20
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    scale = 1 if sys.platform == "darwin" else 1024      # ru_maxrss: bytes on macOS, KiB elsewhere
+    return usage.ru_maxrss * scale / 2**20
+
+def host_info():
+    return {
+        "python": platform.python_version(),
+        # platform.platform() may fork `uname`, which would show up as a child process
+        "platform": f"{platform.system()}-{platform.release()}-{platform.machine()}",
+        "cpus": os.cpu_count(),
+    }
+
+def size_of(path):
+    """Bytes on disk of an intermediate (CSV file or Parquet dataset directory); 0 if missing."""
+    path = storage.dataset_path(path) if Path(path).suffix == ".csv" else Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    summary = {"count": len(ms), "mean_ms": float(ms.mean()), "max_ms": float(ms.max())}
+    for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        summary[f"p{p}_ms"] = float(v)
+    return summary
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    peak_rss_mb: float | None = None
+    chunks: list = field(default_factory=list)
+
+    def __post_init__(self):
+        self._reads = []
+        self._writes = {}
+        self._started = time.perf_counter()
+        self._mark = self._started
+        self._stopped = False
+
+    def track(self, reads=(), writes=(), rewrites=()):
+        """
+        Count bytes from file sizes: all of `reads`, growth of `writes`
+        (appended to) and all of `rewrites` (replaced) while the stage runs.
+        """
+        self._reads.extend(reads)
+        for path in writes:
+            self._writes[path] = size_of(path)
+        for path in rewrites:
+            self._writes[path] = 0
+        return self
+
+    def chunk(self, rows_in=0, rows_out=None, bytes_read=None, bytes_written=None):
+        """Record one chunk; its wall time is the time since the previous chunk (or stage start)."""
+        now = time.perf_counter()
+        rows_out = rows_in if rows_out is None else rows_out
+        self.chunks.append({
+            "seconds": round(now - self._mark, 6),
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "bytes_read": bytes_read,
+            "bytes_written": bytes_written,
+        })
+        self._mark = now
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+
+    def stop(self):
+        if self._stopped:
+            return self
+        self._stopped = True
+        self.seconds = time.perf_counter() - self._started
+        # Chunk byte counts (exact offsets) win over file sizes when the stage has them
+        chunk_read = [c["bytes_read"] for c in self.chunks if c["bytes_read"] is not None]
+        chunk_written = [c["bytes_written"] for c in self.chunks if c["bytes_written"] is not None]
+        self.bytes_read = sum(chunk_read) if chunk_read else sum(size_of(p) for p in self._reads)
+        self.bytes_written = sum(chunk_written) if chunk_written else sum(
+            max(size_of(p) - before, 0) for p, before in self._writes.items()
+        )
+        self.peak_rss_mb = peak_rss_mb()
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def byte_delta(offset, previous):
+    """Bytes covered by a chunk from checkpoint offsets; None when offsets aren't tracked (Parquet)."""
+    return None if offset is None else offset - (previous or 0)
+
+class TimedModel:
+    """Wraps a model (or anything callable) and passes each call's latency to `record`."""
+
+    def __init__(self, model, record, sync=None):
+        self.model = model
+        self.record = record
+        self.sync = sync      # e.g. torch.cuda.synchronize, so GPU time isn't undercounted
+
+    def __call__(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = self.model(*args, **kwargs)
+        if self.sync is not None:
+            self.sync()
+        self.record(time.perf_counter() - t0)
+        return out
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+def write_report(out_dir, started, text):
+    """
+    Write `text` to out_dir/<started>.json and latest.json; returns the path.
+    The timestamped file is created exclusively, so concurrent runs started in
+    the same second get <started>-1.json, -2.json, ... instead of clobbering.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = f"{started:%Y%m%d-%H%M%S}"
+    n = 0
+    while True:
+        path = out_dir / (f"{stamp}.json" if n == 0 else f"{stamp}-{n}.json")
+        try:
+            with open(path, "x", encoding="utf-8") as fh:
+                fh.write(text)
+            break
+        except FileExistsError:
+            n += 1
+    (out_dir / "latest.json").write_text(text, encoding="utf-8")
+    return path
+
+class RunReport:
+    def __init__(self, script, params=None):
+        self.script = script
+        self.params = dict(params or {})      # usually vars(args)
+        self.started = datetime.now()
+        self.t0 = time.perf_counter()
+        self.stages = []
+        self.latencies = {}
+        self.notes = {}
+        self.finished = False
+        # A run that dies before finish() still leaves a report behind
+        atexit.register(self.finish, "incomplete")
+
+    def stage(self, name, reads=(), writes=(), rewrites=()):
+        """Start a stage; stop it with .stop() or use it as a context manager."""
+        stage = StageStats(name).track(reads, writes, rewrites)
+        self.stages.append(stage)
+        return stage
+
+    def latency(self, name, *seconds):
+        self.latencies.setdefault(name, []).extend(seconds)
+
+    def timed(self, model, name, sync=None):
+        return TimedModel(model, lambda seconds: self.latency(name, seconds), sync)
+
+    def note(self, **values):
+        """Extra counters for the report (cache hits, unmatched rows, ...)."""
+        self.notes.update(values)
+
+    def to_dict(self, status):
+        return {
+            "script": self.script,
+            "status": status,
+            "started": self.started.isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self.t0, 3),
+            "params": self.params,
+            "storage": storage.STORAGE_FORMAT,
+            "host": host_info(),
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(children=True),
+            "stages": [asdict(s) for s in self.stages],
+            "latency": {name: latency_summary(v) for name, v in self.latencies.items() if v},
+            "notes": self.notes,
+        }
+
+    def summary(self, report):
+        lines = [
+            f"📊 Run report: {self.script} ({report['status']}, {report['wall_seconds']:.1f}s)",
+            f"   {'stage':<14} {'seconds':>9} {'rows in':>10} {'rows out':>10} {'MB read':>9} {'MB written':>10} {'peak MB':>8}",
+        ]
+        for s in report["stages"]:
+            peak = "" if s["peak_rss_mb"] is None else f"{s['peak_rss_mb']:.0f}"
+            lines.append(
+                f"   {s['name']:<14} {s['seconds']:9.2f} {s['rows_in']:>10,} {s['rows_out']:>10,} "
+                f"{s['bytes_read'] / 1e6:9.1f} {s['bytes_written'] / 1e6:10.1f} {peak:>8}"
+            )
+        for name, lat in report["latency"].items():
+            lines.append(
+                f"   {name}: {lat['count']} calls, p50 {lat['p50_ms']:.1f} ms, "
+                f"p90 {lat['p90_ms']:.1f} ms, p99 {lat['p99_ms']:.1f} ms, max {lat['max_ms']:.1f} ms"
+            )
+        return "\n".join(lines)
+
+    def finish(self, status="ok"):
+        """Write the JSON report and print the summary table (once); returns the report path."""
+        if self.finished:
+            return None
+        self.finished = True
+        for stage in self.stages:
+            stage.stop()
+        report = self.to_dict(status)
+
+        text = json.dumps(report, indent=2, default=str)
+        path = write_report(REPORT_DIR / self.script, self.started, text)
+
+        print(self.summary(report))
+        print(f"   report -> {path}")
+        return path
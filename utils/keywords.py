@@ -0,0 +1,26 @@
+"""
+Keyword-set matching for the speaker-role and section heuristics.
+
+`any(k in s for k in KEYWORDS)` loops over every keyword in Python for every
+row. A KeywordMatcher compiles the set once into a single regex alternation
+with the same substring semantics, and can test a whole pandas Series in one
+vectorized `str.contains` call.
+"""
+
+import re
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        # Longest first so overlapping keywords ("chair"/"chairman") stay
+        # unambiguous; for a yes/no match the order doesn't change the result.
+        unique = sorted(set(keywords), key=len, reverse=True)
+        self.pattern = "|".join(re.escape(k) for k in unique)
+        self.regex = re.compile(self.pattern)
+
+    def search(self, s):
+        """True if any keyword occurs in `s` (same as any(k in s ...))."""
+        return self.regex.search(s) is not None
+
+    def contains(self, series):
+        """Vectorized search over a Series of strings (NaN -> False)."""
+        return series.str.contains(self.pattern, regex=True, na=False)
@@ -0,0 +1,248 @@
+"""
+Read-only lookups over the v2 Power BI tables, for analysts who want an
+answer without opening the .pbix:
+
+    store = MetricsStore()
+    store.history("AAPL", ["vader_gap_mgmt_minus_analyst_v2", "finbert_gap_mgmt_minus_analyst_v2"])
+    store.top("finbert_mean", k=20, table="role", section="Q&A", quarter="latest")
+
+Each CSV is loaded once into one NumPy array per column, sorted by
+(symbol, year, quarter, date), with three indexes:
+    by symbol              row positions of each symbol's calls, in time order
+    by (year, quarter)     row positions of each quarter
+    per numeric metric     ascending sort order and each row's rank in it
+Equality filters start from the smaller index and narrow it down; top-k over
+a filtered set is an argpartition on the precomputed ranks (no sort of the
+candidates), and an unfiltered top-k is a slice of the sort order.
+
+Results (lists of dicts, NaN as None) go through an LRU cache. Treat them as
+read-only: repeated queries return the same objects. The files are checked
+at most every CHECK_SECONDS; a changed file is reloaded once its size and
+mtime have held still for one check (the aggregations rewrite it in place),
+and the new snapshot replaces the old one together with its cache.
+"""
+
+import functools
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CALL_PATH = Path("data/processed/powerbi_call_level_metrics_v2.csv")
+ROLE_PATH = Path("data/processed/powerbi_role_level_metrics_v2.csv")
+
+SORT_KEYS = ["symbol", "year", "quarter", "date"]
+NOT_METRICS = {"year", "quarter"}
+CACHE_SIZE = 4096          # query results kept per snapshot
+CHECK_SECONDS = 1.0        # how often a query may stat the files for changes
+
+def signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def plain(values):
+    """Python scalars for JSON; NaN becomes None."""
+    return [None if isinstance(v, float) and v != v else v for v in values.tolist()]
+
+class Table:
+    """One metrics CSV as columnar arrays plus its indexes."""
+
+    def __init__(self, path):
+        df = pd.read_csv(path).sort_values(SORT_KEYS, kind="stable").reset_index(drop=True)
+        self.names = list(df.columns)
+        self.columns = {c: df[c].to_numpy() for c in df.columns}
+        self.rows = len(df)
+
+        self.by_symbol = {str(k): v for k, v in df.groupby("symbol", sort=False).indices.items()}
+        self.by_quarter = {
+            (int(y), int(q)): v for (y, q), v in df.groupby(["year", "quarter"], sort=True).indices.items()
+        }
+
+        self.metrics = [c for c in df.columns if c not in NOT_METRICS and pd.api.types.is_numeric_dtype(df[c])]
+        self.order, self.rank, self.valid = {}, {}, {}
+        for c in self.metrics:
+            values = df[c].to_numpy(dtype=float)
+            order = np.argsort(values, kind="stable")       # NaN sorts last
+            rank = np.empty(self.rows, dtype=np.int64)
+            rank[order] = np.arange(self.rows)
+            self.order[c], self.rank[c] = order, rank
+            self.valid[c] = int((~np.isnan(values)).sum())
+
+    def check_columns(self, columns):
+        unknown = [c for c in columns if c not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s) {unknown}; columns are {self.names}")
+
+    def select(self, filters):
+        """Row positions matching every column == value filter (None means any)."""
+        filters = {c: v for c, v in filters.items() if v is not None}
+        self.check_columns(filters)
+        if "symbol" in filters:
+            rows = self.by_symbol.get(str(filters.pop("symbol")), np.zeros(0, dtype=np.int64))
+        elif "year" in filters and "quarter" in filters:
+            key = (int(filters.pop("year")), int(filters.pop("quarter")))
+            rows = self.by_quarter.get(key, np.zeros(0, dtype=np.int64))
+        else:
+            rows = None
+        for c, v in filters.items():
+            col = self.columns[c]
+            if col.dtype.kind in "iuf":
+                v = float(v)
+            mask = (col == v) if rows is None else (col[rows] == v)
+            rows = np.flatnonzero(mask) if rows is None else rows[mask]
+        return np.arange(self.rows) if rows is None else rows
+
+    def top(self, metric, k, ascending, rows=None):
+        """Positions of the k lowest (or highest) non-NaN `metric` values among `rows` (all if None)."""
+        if metric not in self.rank:
+            raise ValueError(f"{metric!r} is not a numeric metric; metrics are {self.metrics}")
+        if rows is None:
+            order = self.order[metric][:self.valid[metric]]
+            return order[:k] if ascending else order[::-1][:k]
+        ranks = self.rank[metric][rows]
+        keep = ranks < self.valid[metric]
+        rows, ranks = rows[keep], ranks[keep]
+        if not ascending:
+            ranks = -ranks
+        if len(rows) > k:
+            part = np.argpartition(ranks, k)[:k]
+            rows, ranks = rows[part], ranks[part]
+        return rows[np.argsort(ranks, kind="stable")]
+
+    def records(self, rows, columns=None):
+        columns = columns or self.names
+        self.check_columns(columns)
+        data = [plain(self.columns[c][rows]) for c in columns]
+        return [dict(zip(columns, values)) for values in zip(*data)]
+
+class Snapshot:
+    """Both tables as of one load, and the result cache that belongs to them."""
+
+    def __init__(self, call_path, role_path, cache_size):
+        self.signatures = (signature(call_path), signature(role_path))
+        self.calls = Table(call_path)
+        self.roles = Table(role_path)
+        self.loaded = time.time()
+        self.run = functools.lru_cache(maxsize=cache_size)(self._run)
+
+    def table(self, name):
+        if name not in ("call", "role"):
+            raise ValueError(f"table must be 'call' or 'role', got {name!r}")
+        return self.calls if name == "call" else self.roles
+
+    def latest_quarter(self):
+        return max(self.calls.by_quarter) if self.calls.by_quarter else None
+
+    def _run(self, query, *params):
+        return getattr(self, f"q_{query}")(*params)
+
+    def q_rows(self, table, columns, filters):
+        t = self.table(table)
+        return t.records(t.select(dict(filters)), list(columns) or None)
+
+    def q_top(self, table, metric, k, ascending, columns, filters):
+        t = self.table(table)
+        filters = dict(filters)
+        rows = t.select(filters) if any(v is not None for v in filters.values()) else None
+        return t.records(t.top(metric, k, ascending, rows), list(columns) or None)
+
+class MetricsStore:
+    """Thread-safe query entry point; reloads the CSVs when they change."""
+
+    def __init__(self, call_path=CALL_PATH, role_path=ROLE_PATH, cache_size=CACHE_SIZE,
+                 check_seconds=CHECK_SECONDS):
+        self.paths = (Path(call_path), Path(role_path))
+        for path in self.paths:
+            if not path.exists():
+                raise FileNotFoundError(f"Missing {path}. Run relabeled_roles_aggregation.py first.")
+        self.cache_size = cache_size
+        self.check_seconds = check_seconds
+        self.snapshot = Snapshot(*self.paths, cache_size)
+        self.reloads = 0
+        self.reload_error = None
+        self._seen = self.snapshot.signatures
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    # ---------------- hot reload ----------------
+    def current(self):
+        """The snapshot to answer from, after (at most every check_seconds) a look at the files."""
+        now = time.monotonic()
+        if now - self._checked < self.check_seconds or not self._lock.acquire(blocking=False):
+            return self.snapshot
+        try:
+            self._checked = now
+            try:
+                seen = tuple(signature(p) for p in self.paths)
+            except OSError:
+                return self.snapshot            # mid-rewrite; keep serving the old data
+            if seen != self.snapshot.signatures and seen == self._seen:
+                try:
+                    self.snapshot = Snapshot(*self.paths, self.cache_size)
+                    self.reloads += 1
+                    self.reload_error = None
+                except Exception as e:          # a half-written file; retry at the next check
+                    self.reload_error = f"{type(e).__name__}: {e}"
+            self._seen = seen
+        finally:
+            self._lock.release()
+        return self.snapshot
+
+    # ---------------- queries ----------------
+    @staticmethod
+    def _period(snap, year, quarter):
+        if quarter == "latest":
+            return snap.latest_quarter() or (None, None)
+        return (None if year is None else int(year)), (None if quarter is None else int(quarter))
+
+    def calls(self, symbol=None, year=None, quarter=None, columns=()):
+        snap = self.current()
+        year, quarter = self._period(snap, year, quarter)
+        filters = (("symbol", symbol), ("year", year), ("quarter", quarter))
+        return snap.run("rows", "call", tuple(columns), filters)
+
+    def roles(self, symbol=None, year=None, quarter=None, role=None, section=None, columns=()):
+        snap = self.current()
+        year, quarter = self._period(snap, year, quarter)
+        filters = (("symbol", symbol), ("year", year), ("quarter", quarter),
+                   ("speaker_role_v2", role), ("section", section))
+        return snap.run("rows", "role", tuple(columns), filters)
+
+    def history(self, symbol, metrics=()):
+        """A company's calls in time order (all columns, or the keys plus `metrics`)."""
+        columns = tuple(SORT_KEYS + list(metrics)) if metrics else ()
+        return self.calls(symbol=symbol, columns=columns)
+
+    def top(self, metric, k=20, table="call", ascending=True, symbol=None, year=None, quarter=None,
+            role=None, section=None, columns=()):
+        """The k rows with the lowest (ascending) or highest `metric`, NaN excluded."""
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        snap = self.current()
+        year, quarter = self._period(snap, year, quarter)
+        filters = [("symbol", symbol), ("year", year), ("quarter", quarter)]
+        if table == "role":
+            filters += [("speaker_role_v2", role), ("section", section)]
+        elif role is not None or section is not None:
+            raise ValueError("role / section filters need table='role'")
+        return snap.run("top", table, metric, int(k), bool(ascending), tuple(columns), tuple(filters))
+
+    def meta(self):
+        snap = self.current()
+        info = snap.run.cache_info()
+        return {
+            "files": [str(p) for p in self.paths],
+            "loaded": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snap.loaded)),
+            "reloads": self.reloads,
+            "reload_error": self.reload_error,
+            "call_rows": snap.calls.rows,
+            "role_rows": snap.roles.rows,
+            "symbols": len(snap.calls.by_symbol),
+            "latest_quarter": snap.latest_quarter(),
+            "call_metrics": snap.calls.metrics,
+            "role_metrics": snap.roles.metrics,
+            "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max": info.maxsize},
+        }
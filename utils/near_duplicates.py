@@ -0,0 +1,226 @@
+"""
+Near-duplicate speaker blocks (MinHash + LSH) and score propagation.
+
+etl/dedup_blocks.py signs every non-blank clean_text with a MinHash of its
+word 3-shingles, buckets the signatures with banded LSH and links each
+block to the earliest block in file order that it shares a bucket with and
+whose estimated Jaccard similarity is at least the threshold. Links are
+followed to their root, so every cluster is represented by its first
+block, and a member only stays in a cluster if it is itself similar enough
+to that representative (no chaining drift).
+
+The map (members only) goes next to the cleaned file:
+
+    <cleaned stem>_near_duplicates.csv    block_id, rep_block_id, row, rep_row, similarity
+    <cleaned stem>_near_duplicates.json   parameters, input size and sha256, counts
+
+Scorers run in file order, so a representative is always scored before its
+members; Propagation blanks members out of the model input and copies the
+representative's score to them.
+"""
+
+import json
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import storage
+from utils.checkpoint import Checkpoint
+from utils.dag import Hasher
+from utils.instrument import size_of
+
+THRESHOLD = 0.9
+NUM_PERM = 64
+SHINGLE_WORDS = 3
+SEED = 1
+MERSENNE = np.uint64((1 << 31) - 1)
+PERM_BLOCK = 16             # permutations evaluated per pass (bounds the shingles x perms buffer)
+SIM_BLOCK = 100_000         # blocks per similarity pass
+MIX = [np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(0x165667B19E3779F9)]
+
+def map_path(in_path):
+    in_path = Path(in_path)
+    return in_path.with_name(f"{in_path.stem}_near_duplicates.csv")
+
+def summary_path(in_path):
+    return map_path(in_path).with_suffix(".json")
+
+def input_digest(in_path):
+    """sha256 of the cleaned file (or Parquet dataset) the map is built from."""
+    return Hasher({}).digest(in_path)
+
+def lsh_params(threshold, num_perm):
+    """(bands, rows) with bands * rows == num_perm whose S-curve midpoint (1/b)^(1/r) is closest to threshold."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, shingle_words=SHINGLE_WORDS, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(MERSENNE), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(MERSENNE), size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.k = shingle_words
+        self._word_hash = {}        # stable across chunks and runs (crc32, not the salted hash())
+
+    def word_hashes(self, words):
+        codes, uniques = pd.factorize(pd.Series(words, dtype=object))
+        table = np.array(
+            [self._word_hash.setdefault(w, zlib.crc32(w.encode("utf-8"))) for w in uniques], dtype=np.uint64
+        )
+        return table[codes]
+
+    def shingles(self, texts):
+        """Flat 32-bit shingle hashes and the document each belongs to (blank texts get none)."""
+        splits = [t.split() for t in texts]
+        lengths = np.fromiter((len(s) for s in splits), dtype=np.int64, count=len(splits))
+        words = [w for s in splits for w in s]
+        if not words:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+
+        h = self.word_hashes(words)
+        doc = np.repeat(np.arange(len(texts)), lengths)
+        pos = np.arange(len(words)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        size = lengths[doc]
+
+        # Shingle = the k words starting here; texts shorter than k are one shingle
+        mixed = np.zeros(len(words), dtype=np.uint64)
+        for j in range(self.k):
+            shifted = np.zeros(len(words), dtype=np.uint64)
+            shifted[:len(words) - j] = h[j:]
+            mixed ^= np.where(pos + j < size, shifted, np.uint64(0)) * MIX[j]
+        starts = (pos + self.k <= size) | ((pos == 0) & (size < self.k))
+        return (mixed[starts] >> np.uint64(32)) ^ (mixed[starts] & np.uint64(0xFFFFFFFF)), doc[starts]
+
+    def signatures(self, texts):
+        """(len(texts), num_perm) uint32 MinHash signatures; blank texts are all-ones rows."""
+        values, doc = self.shingles(texts)
+        out = np.full((len(texts), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        if len(values) == 0:
+            return out
+        docs, starts = np.unique(doc, return_index=True)
+        for p in range(0, self.num_perm, PERM_BLOCK):
+            a, b = self.a[p:p + PERM_BLOCK], self.b[p:p + PERM_BLOCK]
+            permuted = (values[:, None] * a + b) % MERSENNE
+            out[docs, p:p + len(a)] = np.minimum.reduceat(permuted, starts, axis=0)
+        return out
+
+def band_buckets(signatures, bands, rows):
+    """For each band, the index of the first block sharing that band's bucket (<= own index)."""
+    first = np.empty((len(signatures), bands), dtype=np.int64)
+    for band in range(bands):
+        part = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = np.zeros(len(signatures), dtype=np.uint64)
+        for j in range(rows):
+            key = key * np.uint64(0x100000001B3) + part[:, j]      # wraps; collisions are re-checked
+        _, head, inverse = np.unique(key, return_index=True, return_inverse=True)
+        first[:, band] = head[inverse.reshape(-1)]
+    return first
+
+def similarity(signatures, i, j):
+    """Estimated Jaccard of blocks i[k] and j[k] (share of equal MinHash values)."""
+    return (signatures[i] == signatures[j]).mean(axis=1)
+
+def cluster(signatures, eligible, threshold=THRESHOLD):
+    """
+    Representative index per block (itself when it has no near-duplicate
+    earlier in the file) and the estimated similarity to it.
+    """
+    n = len(signatures)
+    bands, rows = lsh_params(threshold, signatures.shape[1])
+    first = band_buckets(signatures, bands, rows)
+
+    # Earliest earlier bucket-mate that is similar enough
+    parent = np.arange(n)
+    for lo in range(0, n, SIM_BLOCK):
+        idx = np.arange(lo, min(n, lo + SIM_BLOCK))
+        best = idx.copy()
+        for band in range(bands):
+            cand = first[idx, band]
+            ok = (cand < idx) & (cand < best) & eligible[idx] & eligible[cand]
+            if ok.any():
+                sims = similarity(signatures, idx[ok], cand[ok])
+                hit = np.flatnonzero(ok)[sims >= threshold]
+                best[hit] = cand[hit]
+        parent[idx] = best
+
+    # Follow links to the root, keep members that are close to the root itself
+    root = parent.copy()
+    while not np.array_equal(root, root[root]):
+        root = root[root]
+    sims = np.ones(n)
+    linked = np.flatnonzero(root != np.arange(n))
+    for lo in range(0, len(linked), SIM_BLOCK):
+        part = linked[lo:lo + SIM_BLOCK]
+        sims[part] = similarity(signatures, part, root[part])
+    drifted = sims < threshold
+    root[drifted] = np.flatnonzero(drifted)
+    sims[drifted] = 1.0
+    return root, sims
+
+def load_summary(in_path):
+    path = summary_path(in_path)
+    if not path.exists() or not map_path(in_path).exists():
+        raise SystemExit(f"Missing {map_path(in_path)}. Run etl/dedup_blocks.py first (or drop --dedup).")
+    summary = json.loads(path.read_text())
+    # Size first (free), then content: a rewrite of the same length must not reuse the map
+    if summary["input_bytes"] != size_of(in_path) or summary.get("input_sha256") != input_digest(in_path):
+        raise SystemExit(
+            f"{map_path(in_path)} was built for a different {storage.dataset_path(in_path)}. "
+            "Rerun etl/dedup_blocks.py."
+        )
+    return summary
+
+class Propagation:
+    """
+    Hands representatives' scores to their near-duplicates while a scorer
+    walks the cleaned blocks in file order from row `first_row` (a shard
+    start); members whose representative lies before it are scored normally.
+    `summary` is a load_summary() result the caller already checked (shard
+    workers get the parent's, so the input is hashed once per run).
+    """
+
+    def __init__(self, in_path, first_row=0, summary=None):
+        self.summary = summary or load_summary(in_path)
+        m = pd.read_csv(map_path(in_path), usecols=["block_id", "rep_block_id", "rep_row"])
+        m = m[m["rep_row"] >= first_row]
+        self.rep_of = dict(zip(m["block_id"].tolist(), m["rep_block_id"].tolist()))
+        self.reps = set(self.rep_of.values())
+        self.scores = {}
+        self.propagated = 0
+
+    def skip(self, chunk, texts):
+        """`texts` with members blanked, so they never reach the tokenizer, cache or model."""
+        return ["" if b in self.rep_of else t for b, t in zip(chunk["block_id"].tolist(), texts)]
+
+    def remember(self, block_ids, labels, confs):
+        for b, lab, cf in zip(block_ids, labels, confs):
+            if b in self.reps:
+                self.scores[b] = (lab, cf)
+
+    def fill(self, chunk, labels, confs):
+        """Store this chunk's representative scores, then copy them to its members."""
+        block_ids = chunk["block_id"].tolist()
+        self.remember(block_ids, labels, confs)
+        labels, confs = list(labels), list(confs)
+        for i, b in enumerate(block_ids):
+            if b in self.rep_of:
+                labels[i], confs[i] = self.scores[self.rep_of[b]]
+                self.propagated += 1
+        return labels, confs
+
+    def preload(self, out_path, label_col="finbert_sentiment", conf_col="finbert_confidence"):
+        """Representative scores already written by an interrupted run (resume)."""
+        if not storage.exists(out_path):
+            return
+        columns = ["block_id", label_col, conf_col]
+        for chunk, _ in storage.iter_chunks(out_path, 100_000, Checkpoint(), columns=columns):
+            self.remember(chunk["block_id"].tolist(), chunk[label_col].tolist(), chunk[conf_col].tolist())
+
+    def report(self):
+        return (
+            f"♻️ Near-duplicates: {self.propagated:,} rows took their representative's score "
+            f"(threshold {self.summary['threshold']}) instead of a model call"
+        )
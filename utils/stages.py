@@ -0,0 +1,108 @@
+"""
+Bounded queues and per-stage timing for the threaded scorers.
+
+Each Stage keeps three timers: time waiting for input (upstream is slower),
+time blocked handing off output (downstream is slower) and the rest, which
+is its own work. Every StageQueue samples its depth on each get, so a queue
+that sits full points at its consumer and one that sits empty at its
+producer.
+"""
+
+import queue
+import threading
+import time
+
+DONE = object()     # end-of-stream marker passed down the queues
+
+class StageQueue(queue.Queue):
+    def __init__(self, name, maxsize):
+        super().__init__(maxsize)
+        self.name = name
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.samples = 0
+
+    def sample(self):
+        depth = self.qsize()
+        self.depth_sum += depth
+        self.depth_max = max(self.depth_max, depth)
+        self.samples += 1
+        return depth
+
+    def summary(self):
+        mean = self.depth_sum / self.samples if self.samples else 0.0
+        return f"{self.name} queue depth mean {mean:.1f}, max {self.depth_max}/{self.maxsize}"
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.error = None
+        self.started = None
+        self.stopped = None
+
+    def get(self, q):
+        t0 = time.perf_counter()
+        q.sample()
+        item = q.get()
+        self.wait_in += time.perf_counter() - t0
+        if item is not DONE:
+            self.items_in += 1
+        return item
+
+    def wait(self, future):
+        """Block on a future produced upstream (counts as waiting for input)."""
+        t0 = time.perf_counter()
+        result = future.result()
+        self.wait_in += time.perf_counter() - t0
+        return result
+
+    def put(self, q, item):
+        t0 = time.perf_counter()
+        q.put(item)
+        self.wait_out += time.perf_counter() - t0
+        if item is not DONE:
+            self.items_out += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+
+    def busy(self):
+        end = self.stopped or time.perf_counter()
+        return max(0.0, end - (self.started or end) - self.wait_in - self.wait_out)
+
+def run_in_thread(stage, fn, *args):
+    """
+    Run `fn(stage, *args)` on a daemon thread. An exception is kept on
+    `stage.error` for the main thread to re-raise.
+    """
+    def target():
+        stage.start()
+        try:
+            fn(stage, *args)
+        except BaseException as e:
+            stage.error = e
+        finally:
+            stage.stop()
+
+    thread = threading.Thread(target=target, name=stage.name, daemon=True)
+    thread.start()
+    return thread
+
+def stage_report(stages, queues):
+    lines = ["⏱️ Stages (busy / waiting for input / blocked on output):"]
+    for s in stages:
+        lines.append(
+            f"   {s.name:<9}: {s.busy():7.1f}s / {s.wait_in:7.1f}s / {s.wait_out:7.1f}s ({max(s.items_in, s.items_out)} chunks)"
+        )
+    for q in queues:
+        lines.append(f"   {q.summary()}")
+    bottleneck = max(stages, key=lambda s: s.busy())
+    lines.append(f"   bottleneck: {bottleneck.name}")
+    return "\n".join(lines)
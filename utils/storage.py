@@ -0,0 +1,245 @@
+"""
+Storage for the speaker-block intermediates (cleaned, with_vader,
+with_finbert, with_sentiment).
+
+Paths are always given as the CSV path the stages have always used. With
+PIPELINE_STORAGE=parquet the same data lives in a Parquet dataset next to it
+(`speaker_blocks_cleaned.parquet/year=2020/quarter=1/part-....parquet`):
+partitioned by year/quarter, with symbol/company_name/speaker_role
+dictionary-encoded, and readers can load just the columns they need.
+
+Chunked writers name Parquet parts after the first row/transcript of the
+chunk, so re-running a chunk after a crash overwrites its files instead of
+duplicating them.
+
+Chunked reads come back in block_id order for CSV and in (year, quarter,
+block_id) order for Parquet; `order_key` gives that order as one integer.
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from utils.checkpoint import append_csv, iter_csv_chunks, split_csv_records
+
+STORAGE_FORMAT = os.environ.get("PIPELINE_STORAGE", "csv")     # "csv" | "parquet"
+
+PARTITION_COLS = ["year", "quarter"]
+DICTIONARY_COLS = ["symbol", "company_name", "speaker_role"]
+
+BLOCK_ID_SPAN = 10**12     # block_id < BLOCK_ID_SPAN, see preprocess_speaker_blocks
+
+CLEANED_PATH = Path("data/processed/speaker_blocks_cleaned.csv")
+CLEANING_PROFILES = ["raw", "light", "full"]      # see etl/cleaning.py
+
+def profile_path(path, profile="full"):
+    """Per-cleaning-profile variant of a path (`<stem>_<profile><suffix>`); "full" keeps the original name."""
+    path = Path(path)
+    if profile == "full":
+        return path
+    return path.with_name(f"{path.stem}_{profile}{path.suffix}")
+
+def cleaned_path(profile="full"):
+    """Cleaned blocks for a cleaning profile (etl/cleaning.py)."""
+    return profile_path(CLEANED_PATH, profile)
+
+def dataset_path(path, fmt=None):
+    path = Path(path)
+    if (fmt or STORAGE_FORMAT) == "parquet":
+        return path.with_suffix(".parquet")
+    return path
+
+def exists(path, fmt=None):
+    return dataset_path(path, fmt).exists()
+
+def remove(path, fmt=None):
+    dpath = dataset_path(path, fmt)
+    if dpath.is_dir():
+        shutil.rmtree(dpath)
+    elif dpath.exists():
+        dpath.unlink()
+
+def order_columns(fmt=None):
+    """Columns that determine the order chunked reads come back in."""
+    if (fmt or STORAGE_FORMAT) == "parquet":
+        return PARTITION_COLS + ["block_id"]
+    return ["block_id"]
+
+def order_key(df, fmt=None):
+    """Monotonic int64 key matching the chunked read order."""
+    key = df["block_id"].astype("int64")
+    if (fmt or STORAGE_FORMAT) == "parquet":
+        partition = df["year"].astype("int64") * 10 + df["quarter"].astype("int64")
+        key = partition * BLOCK_ID_SPAN + key
+    return key
+
+# ---------------- parquet helpers ----------------
+def _encode(df):
+    df = df.copy()
+    for col in DICTIONARY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+def _decode(df, column_order):
+    """Undo dictionary encoding and restore the CSV column order."""
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if col in PARTITION_COLS:
+                df[col] = df[col].astype("int64")
+            else:
+                df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df[[c for c in column_order if c in df.columns]]
+
+def _column_order(schema):
+    meta = schema.pandas_metadata or {}
+    return [c["name"] for c in meta.get("columns", [])] or schema.names
+
+def _parquet_files(dpath):
+    return sorted(Path(dpath).rglob("*.parquet"))
+
+def _partition_values(file, dpath):
+    values = {}
+    for part in file.relative_to(dpath).parent.parts:
+        key, _, value = part.partition("=")
+        values[key] = int(value)
+    return values
+
+# ---------------- public API ----------------
+def read_table(path, columns=None, fmt=None):
+    """Full read of an intermediate, optionally only `columns` (in file order)."""
+    fmt = fmt or STORAGE_FORMAT
+    if fmt != "parquet":
+        return pd.read_csv(path, usecols=columns)
+
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(dataset_path(path, fmt), columns=columns)
+    return _decode(table.to_pandas(), _column_order(table.schema))
+
+def write_table(df, path, fmt=None):
+    """Replace an intermediate with `df`."""
+    fmt = fmt or STORAGE_FORMAT
+    dpath = dataset_path(path, fmt)
+    if fmt != "parquet":
+        df.to_csv(dpath, index=False)
+        return
+    if dpath.exists():
+        shutil.rmtree(dpath)
+    write_chunk(df, path, part=0, header=True, fmt=fmt)
+
+def write_chunk(df, path, part, header, fmt=None):
+    """
+    Append one chunk. Returns the new CSV size (for byte-offset checkpoints),
+    or None for Parquet where `part` names the files instead.
+    """
+    fmt = fmt or STORAGE_FORMAT
+    if fmt != "parquet":
+        return append_csv(df, path, header=header)
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_to_dataset(
+        pa.Table.from_pandas(_encode(df), preserve_index=False),
+        dataset_path(path, fmt),
+        partition_cols=PARTITION_COLS,
+        basename_template=f"part-{part:09d}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return None
+
+def part_files(path):
+    """{part path relative to the dataset: size in bytes} for a Parquet dataset."""
+    dpath = dataset_path(path, "parquet")
+    return {f.relative_to(dpath).as_posix(): f.stat().st_size for f in _parquet_files(dpath)}
+
+def read_part(path, part, columns=None):
+    """One part file of a Parquet dataset, with its partition columns filled in."""
+    import pyarrow.parquet as pq
+
+    dpath = dataset_path(path, "parquet")
+    file = dpath / part
+    pf = pq.ParquetFile(file)
+
+    order = _column_order(pf.schema_arrow)
+    if columns is not None:
+        order = [c for c in order if c in columns]
+    file_columns = None if columns is None else [c for c in columns if c not in PARTITION_COLS]
+    df = pf.read(columns=file_columns).to_pandas()
+    for key, value in _partition_values(file, dpath).items():
+        if columns is None or key in columns:
+            df[key] = value
+    return _decode(df, order)
+
+def split_rows(path, n_parts, fmt=None):
+    """
+    Split an intermediate into `n_parts` contiguous row ranges.
+
+    Returns ([(row_start, row_end, byte_start), ...], CSV size); byte
+    offsets are None for Parquet, which resumes by row count.
+    """
+    fmt = fmt or STORAGE_FORMAT
+    if fmt != "parquet":
+        return split_csv_records(path, n_parts)
+
+    import pyarrow.parquet as pq
+
+    n_rows = sum(pq.ParquetFile(f).metadata.num_rows for f in _parquet_files(dataset_path(path, fmt)))
+    bounds = [n_rows * i // n_parts for i in range(n_parts + 1)]
+    return [(bounds[i], bounds[i + 1], None) for i in range(n_parts)], None
+
+def iter_chunks(path, chunksize, ckpt, columns=None, fmt=None, dtype=None):
+    """
+    Yield (chunk DataFrame, input byte offset or None) from the checkpoint on.
+
+    Parquet resumes by row count: whole files are skipped using their footer
+    row counts, so nothing before the checkpoint is decoded. `dtype` is a
+    read_csv-style {column: dtype} applied to every chunk.
+    """
+    fmt = fmt or STORAGE_FORMAT
+    if fmt != "parquet":
+        yield from iter_csv_chunks(path, chunksize, ckpt, columns=columns, dtype=dtype)
+        return
+
+    def cast(df):
+        return df.astype({c: t for c, t in dtype.items() if c in df.columns}) if dtype else df
+
+    import pyarrow.parquet as pq
+
+    dpath = dataset_path(path, fmt)
+    to_skip = ckpt.rows
+    pending = []
+    pending_rows = 0
+
+    for file in _parquet_files(dpath):
+        pf = pq.ParquetFile(file)
+        if to_skip >= pf.metadata.num_rows:
+            to_skip -= pf.metadata.num_rows
+            continue
+
+        order = _column_order(pf.schema_arrow)
+        if columns is not None:
+            order = [c for c in order if c in columns]
+        file_columns = None if columns is None else [c for c in columns if c not in PARTITION_COLS]
+        for batch in pf.iter_batches(batch_size=chunksize, columns=file_columns):
+            df = batch.to_pandas()
+            if to_skip:
+                df = df.iloc[to_skip:]
+                to_skip = 0
+            for key, value in _partition_values(file, dpath).items():
+                if columns is None or key in columns:
+                    df[key] = value
+            pending.append(_decode(df, order))
+            pending_rows += len(df)
+
+            while pending_rows >= chunksize:
+                merged = pd.concat(pending, ignore_index=True)
+                yield cast(merged.iloc[:chunksize].reset_index(drop=True)), None
+                pending = [merged.iloc[chunksize:]]
+                pending_rows = len(pending[0])
+
+    if pending_rows:
+        yield cast(pd.concat(pending, ignore_index=True)), None